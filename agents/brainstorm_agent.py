@@ -1,10 +1,19 @@
 from agents.state import EssayState
-from agents.ollama_helper import call_ollama, format_prompt
-from agents.prompts.brainstorm import BRAINSTORM_SYSTEM, BRAINSTORM_TEMPLATE
+from agents.console import say
+from agents.context_budget import budget_for
+from agents.cutoff import cutoff_for
+from agents.handoff import acall_handing_off, call_handing_off
+from agents.ollama_helper import shared_context
+from agents.outline_agent import outline_request
+from agents.prompts.brainstorm import BRAINSTORM_SYSTEM, BRAINSTORM_TEMPLATE, BRAINSTORM_JSON_TEMPLATE
+from agents.structured import BRAINSTORM_SCHEMA, parse_structured, render_idea, structured_output_for
 from langchain_core.messages import AIMessage
 import time
 import re
 
+IDEA_PATTERN = r'## IDEA \d+:.*?(?=## IDEA \d+:|## RECOMMENDATION|$)'
+RECOMMENDATION_PATTERN = r'## RECOMMENDATION\s+\*\*Best Idea:\*\*\s+(.*?)(?:\n|$)'
+
 def brainstorm_agent(state: EssayState) -> dict:
     """
     Agent 2: Brainstorm Agent
@@ -12,53 +21,109 @@ def brainstorm_agent(state: EssayState) -> dict:
     Generates 5 diverse essay ideas based on the prompt and research.
     
     Input: state['prompt'], state['research_analysis']
-    Output: state['brainstorm_ideas'], state['selected_idea']
+    Output: state['brainstorm_ideas'], state['selected_idea'], state['idea_details']
     """
-    print("\n" + "="*60)
-    print("💡 AGENT 2: BRAINSTORM AGENT")
-    print("="*60)
-    print("Generating creative essay ideas...")
-    
-    # Format the prompt
-    prompt = format_prompt(
-        BRAINSTORM_TEMPLATE,
-        prompt=state['prompt'],
-        research_analysis=state['research_analysis']
-    )
+    request = _prepare(state)
     
-    # Call Ollama with higher temperature for creativity
+    # Call Ollama with higher temperature for creativity; in overlap mode
+    # the outline starts as soon as the selected idea has streamed in
+    start_time = time.time()
+    ideas_text, generation_time = call_handing_off(request, _outline_handoff(state))
+    return _finish(state, ideas_text, generation_time, time.time() - start_time)
+
+async def abrainstorm_agent(state: EssayState) -> dict:
+    """Async version of brainstorm_agent (same request, non-blocking client)"""
+    request = _prepare(state)
     start_time = time.time()
-    ideas_text, generation_time = call_ollama(
+    ideas_text, generation_time = await acall_handing_off(request, _outline_handoff(state))
+    return _finish(state, ideas_text, generation_time, time.time() - start_time)
+
+def _outline_handoff(state: EssayState):
+    """Outline request for a partial reply, once the idea it will get is settled"""
+    def ready(ideas_text: str):
+        selected = _early_selection(state, ideas_text)
+        if selected is None:
+            return None
+        return outline_request({**state, "selected_idea": selected})
+    return ready
+
+def _early_selection(state: EssayState, ideas_text: str):
+    """
+    The idea the outline will be given, if the partial reply already fixes it
+    
+    Mirrors _finish and the workflow's select step: the student's chosen
+    idea is settled once the next heading starts, the recommendation once
+    its line ends.
+    """
+    choice = state.get("idea_choice")
+    if choice:
+        ideas = re.findall(IDEA_PATTERN, ideas_text, re.DOTALL)
+        if choice < len(ideas) or (choice == len(ideas) and "## RECOMMENDATION" in ideas_text):
+            return ideas[choice - 1].strip()
+        return None
+    recommendation = re.search(r'## RECOMMENDATION\s+\*\*Best Idea:\*\*\s+(\S.*?)\n', ideas_text, re.DOTALL)
+    return recommendation.group(1).strip() if recommendation else None
+
+def _prepare(state: EssayState) -> dict:
+    """Announce the agent and build its call_ollama arguments"""
+    say("\n" + "="*60)
+    say("💡 AGENT 2: BRAINSTORM AGENT")
+    say("="*60)
+    say("Generating creative essay ideas...")
+    
+    # Prompt and research go in the shared prefix
+    structured = structured_output_for("brainstorm")
+    prompt = BRAINSTORM_JSON_TEMPLATE if structured else BRAINSTORM_TEMPLATE
+    budget = budget_for("brainstorm")
+    
+    return dict(
         prompt=prompt,
         system_message=BRAINSTORM_SYSTEM,
+        shared_prefix=shared_context(state['prompt'], state['research_analysis']),
         temperature=0.85,  # Higher temperature for creative brainstorming
-        max_tokens=2000
+        max_tokens=budget.output,
+        agent="brainstorm",
+        cutoff=cutoff_for("brainstorm"),
+        json_schema=BRAINSTORM_SCHEMA if structured else None
     )
-    total_time = time.time() - start_time
-    
-    # Extract individual ideas (simple parsing)
-    ideas_list = re.findall(r'## IDEA \d+:.*?(?=## IDEA \d+:|## RECOMMENDATION|$)', ideas_text, re.DOTALL)
-    
-    # If parsing fails, just store the whole text
-    if not ideas_list:
-        ideas_list = [ideas_text]
-    
-    print(f"✅ Brainstorming complete ({generation_time:.1f}s)")
-    print(f"   Generated {len(ideas_list)} ideas")
-    
-    # For now, select the first idea (later we can add selection logic)
-    # Extract the recommendation if it exists
-    recommendation = re.search(r'## RECOMMENDATION\s+\*\*Best Idea:\*\*\s+(.*?)(?:\n|$)', ideas_text, re.DOTALL)
-    if recommendation:
-        selected = recommendation.group(1).strip()
+
+def _finish(state: EssayState, ideas_text: str, generation_time: float, total_time: float) -> dict:
+    """Parse the ideas, report them and build the state update"""
+    structured = structured_output_for("brainstorm")
+    details = parse_structured(ideas_text, BRAINSTORM_SCHEMA) if structured else None
+    if details and details['ideas']:
+        # Typed ideas: select the recommended idea itself, not just its number
+        idea_details = details['ideas']
+        ideas_list = [render_idea(i, idea) for i, idea in enumerate(idea_details, 1)]
+        best = details['recommendation']['idea_number']
+        best = best if 1 <= best <= len(ideas_list) else 1
+        selected = f"{ideas_list[best - 1]}\n**Why this idea:** {details['recommendation']['reason']}"
     else:
-        selected = ideas_list[0] if ideas_list else ideas_text
+        idea_details = []
+        
+        # Extract individual ideas (simple parsing)
+        ideas_list = re.findall(IDEA_PATTERN, ideas_text, re.DOTALL)
+        
+        # If parsing fails, just store the whole text
+        if not ideas_list:
+            ideas_list = [ideas_text]
+        
+        # Extract the recommendation if it exists
+        recommendation = re.search(RECOMMENDATION_PATTERN, ideas_text, re.DOTALL)
+        if recommendation:
+            selected = recommendation.group(1).strip()
+        else:
+            selected = ideas_list[0] if ideas_list else ideas_text
+    
+    say(f"✅ Brainstorming complete ({generation_time:.1f}s)")
+    say(f"   Generated {len(ideas_list)} ideas")
     
     # Update state
     return {
         "brainstorm_ideas": ideas_list,
         "selected_idea": selected,
+        "idea_details": idea_details,
         "current_agent": "outline",
-        "agent_times": {**state.get("agent_times", {}), "brainstorm": total_time},
+        "agent_times": {"brainstorm": total_time},
         "messages": [AIMessage(content=f"Brainstorm Agent: Generated {len(ideas_list)} essay ideas")]
     }
\ No newline at end of file
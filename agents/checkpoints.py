@@ -0,0 +1,349 @@
+import asyncio
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import xxhash
+import zstandard
+from langgraph.checkpoint.base.id import UUID as CheckpointId
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+from agents import config
+
+# Serialized values at least this large are zstd-compressed
+COMPRESS_MIN_BYTES = 512
+
+# Placeholder key for a text moved to the blob store
+BLOB_REF = "__blob__"
+
+# Unreferenced blobs written this recently are kept by prune(): a run may
+# have stored a text whose checkpoint isn't committed yet
+BLOB_PRUNE_GRACE = 3600
+
+
+def blob_key(text: str) -> str:
+    return xxhash.xxh3_128_hexdigest(text.encode("utf-8"))
+
+
+class BlobStore:
+    """
+    Content-addressed store for the long texts in checkpoints.
+
+    Each distinct text (research, outline, draft ...) is saved once,
+    zstd-compressed, however many snapshots and runs refer to it. It
+    lives in its own database so writing a blob never waits on the
+    checkpoint transaction that is serializing it.
+    """
+
+    def __init__(self, path: str, recent: int = 1024):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (key TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL,"
+            " created REAL NOT NULL DEFAULT 0)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(blobs)")}
+        if "created" not in columns:
+            # Stores from before pruning: their blobs count as old
+            self._conn.execute("ALTER TABLE blobs ADD COLUMN created REAL NOT NULL DEFAULT 0")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        # Recently seen texts: later snapshots of a run skip the write and the read
+        self._recent = OrderedDict()
+        self._recent_max = recent
+
+    def put(self, text: str) -> str:
+        key = blob_key(text)
+        with self._lock:
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                return key
+            data = zstandard.compress(text.encode("utf-8"), 3)
+            # An existing blob is touched, so prune() sees it as just written
+            self._conn.execute(
+                "INSERT INTO blobs (key, data, size, created) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET created = excluded.created",
+                (key, data, len(data), time.time())
+            )
+            self._conn.commit()
+            self._remember(key, text)
+        return key
+
+    def get(self, key: str) -> str:
+        with self._lock:
+            text = self._recent.get(key)
+            if text is not None:
+                self._recent.move_to_end(key)
+                return text
+            row = self._conn.execute("SELECT data FROM blobs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                raise KeyError(f"Checkpoint text {key} is missing from the blob store")
+            text = zstandard.decompress(row[0]).decode("utf-8")
+            self._remember(key, text)
+            return text
+
+    def stored_bytes(self, keys: Iterable[str]) -> int:
+        """Compressed size of the given blobs"""
+        keys = list(set(keys))
+        if not keys:
+            return 0
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT SUM(size) FROM blobs WHERE key IN ({','.join('?' * len(keys))})", keys
+            ).fetchone()
+        return row[0] or 0
+
+    def prune(self, referenced: set) -> int:
+        """Delete blobs outside `referenced` (except recent ones); returns how many"""
+        with self._lock:
+            keys = [
+                key for (key,) in self._conn.execute(
+                    "SELECT key FROM blobs WHERE created < ?", (time.time() - BLOB_PRUNE_GRACE,)
+                )
+                if key not in referenced and key not in self._recent
+            ]
+            self._conn.executemany("DELETE FROM blobs WHERE key = ?", [(key,) for key in keys])
+            self._conn.commit()
+        return len(keys)
+
+    def _remember(self, key: str, text: str):
+        self._recent[key] = text
+        while len(self._recent) > self._recent_max:
+            self._recent.popitem(last=False)
+
+
+class CompactSerializer(JsonPlusSerializer):
+    """
+    LangGraph's msgpack (ormsgpack) serializer plus zstd for large values.
+
+    Every checkpoint stores the full text fields written so far (research,
+    outline, draft ...). With a blob store, texts of at least
+    config.CHECKPOINT_BLOB_MIN_CHARS are replaced by a reference to
+    their single stored copy, so a snapshot only holds what changed
+    plus small fields such as `current_agent`. Whatever is left is
+    compressed once it is large enough. The one-shot zstd functions are
+    used because (de)compressor objects are not safe to share between
+    threads.
+    """
+
+    def __init__(self, blobs: Optional[BlobStore] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.blobs = blobs
+
+    def dumps_typed(self, obj: Any) -> tuple:
+        if self.blobs is not None:
+            obj = self._externalize(obj)
+        type_, data = super().dumps_typed(obj)
+        if len(data) >= COMPRESS_MIN_BYTES:
+            return f"{type_}+zstd", zstandard.compress(data, 3)
+        return type_, data
+
+    def loads_typed(self, data: tuple) -> Any:
+        type_, payload = data
+        if type_.endswith("+zstd"):
+            type_, payload = type_[:-len("+zstd")], zstandard.decompress(payload)
+        obj = super().loads_typed((type_, payload))
+        return self._internalize(obj) if self.blobs is not None else obj
+
+    def _externalize(self, obj):
+        """Copy of obj with long texts swapped for blob references"""
+        if isinstance(obj, str):
+            if len(obj) >= config.CHECKPOINT_BLOB_MIN_CHARS:
+                return {BLOB_REF: self.blobs.put(obj)}
+            return obj
+        # Plain containers only: named tuples and LangGraph types pass through
+        if type(obj) is dict:
+            return {k: self._externalize(v) for k, v in obj.items()}
+        if type(obj) in (list, tuple):
+            return type(obj)(self._externalize(v) for v in obj)
+        return obj
+
+    def blob_refs(self, data: tuple) -> set:
+        """Blob keys a serialized value refers to (the texts themselves aren't loaded)"""
+        type_, payload = data
+        if type_.endswith("+zstd"):
+            type_, payload = type_[:-len("+zstd")], zstandard.decompress(payload)
+        refs = set()
+        pending = [super().loads_typed((type_, payload))]
+        while pending:
+            obj = pending.pop()
+            if type(obj) is dict:
+                if len(obj) == 1 and BLOB_REF in obj:
+                    refs.add(obj[BLOB_REF])
+                else:
+                    pending.extend(obj.values())
+            elif type(obj) in (list, tuple):
+                pending.extend(obj)
+        return refs
+
+    def _internalize(self, obj):
+        if type(obj) is dict:
+            if len(obj) == 1 and BLOB_REF in obj:
+                return self.blobs.get(obj[BLOB_REF])
+            return {k: self._internalize(v) for k, v in obj.items()}
+        if type(obj) in (list, tuple):
+            return type(obj)(self._internalize(v) for v in obj)
+        return obj
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver usable from ainvoke: the async methods run the sync ones
+    in the default executor.
+
+    Every run in the process shares one connection (and the saver's
+    lock) instead of one aiosqlite connection and thread per event loop
+    or per run; checkpoint writes are small enough that the executor
+    hop is the only cost.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        saved = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in saved:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def new_thread_id() -> str:
+    """Sortable, human-typeable id for a workflow run"""
+    return f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+
+
+def thread_config(thread_id: str) -> dict:
+    """LangGraph run config that selects a checkpoint thread"""
+    return {"configurable": {"thread_id": thread_id}}
+
+
+_checkpointer: Optional[ThreadedSqliteSaver] = None
+_lock = threading.Lock()
+
+
+def get_checkpointer() -> Optional[ThreadedSqliteSaver]:
+    """Process-wide SQLite checkpointer, or None when checkpoints are disabled"""
+    global _checkpointer
+    if not config.CHECKPOINT_ENABLED:
+        return None
+    with _lock:
+        if _checkpointer is None:
+            path = Path(config.CHECKPOINT_DB)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # SqliteSaver serialises access with its own lock
+            conn = sqlite3.connect(str(path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            blobs = BlobStore(config.CHECKPOINT_BLOB_DB)
+            _checkpointer = ThreadedSqliteSaver(conn, serde=CompactSerializer(blobs))
+        return _checkpointer
+
+
+def _saved_at(checkpoint_id: str) -> float:
+    """Unix time a checkpoint was written (LangGraph ids are time-ordered UUIDv6)"""
+    # 100 ns intervals since the Gregorian epoch (1582-10-15)
+    return (CheckpointId(checkpoint_id).time - 0x01B21DD213814000) / 1e7
+
+
+def prune_runs(keep_runs: Optional[int] = None, keep_days: Optional[float] = None) -> dict:
+    """
+    Delete the checkpoints of runs outside the retention limits.
+
+    Keeps the newest keep_runs runs (config.CHECKPOINT_KEEP_RUNS) and
+    drops any run last saved more than keep_days ago
+    (config.CHECKPOINT_KEEP_DAYS); 0 disables a limit. Stored texts no
+    remaining checkpoint refers to are deleted afterwards. SQLite reuses
+    the freed pages, so the files stop growing rather than shrink.
+
+    Returns:
+        {"runs": deleted, "kept": n, "blobs": deleted}
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return {"runs": 0, "kept": 0, "blobs": 0}
+    keep_runs = config.CHECKPOINT_KEEP_RUNS if keep_runs is None else keep_runs
+    keep_days = config.CHECKPOINT_KEEP_DAYS if keep_days is None else keep_days
+
+    with checkpointer.cursor(transaction=False) as cur:
+        latest = cur.execute("SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id").fetchall()
+    runs = sorted(((_saved_at(checkpoint_id), thread_id) for thread_id, checkpoint_id in latest), reverse=True)
+    oldest = time.time() - keep_days * 86400 if keep_days else None
+    stale = [
+        thread_id for rank, (saved_at, thread_id) in enumerate(runs)
+        if (keep_runs and rank >= keep_runs) or (oldest is not None and saved_at < oldest)
+    ]
+    for thread_id in stale:
+        checkpointer.delete_thread(thread_id)
+
+    referenced = set()
+    serde = checkpointer.serde
+    with checkpointer.cursor(transaction=False) as cur:
+        for type_, data in cur.execute("SELECT type, checkpoint FROM checkpoints").fetchall():
+            referenced |= serde.blob_refs((type_, data))
+        for type_, data in cur.execute("SELECT type, value FROM writes WHERE type IS NOT NULL").fetchall():
+            referenced |= serde.blob_refs((type_, data))
+    return {"runs": len(stale), "kept": len(runs) - len(stale), "blobs": serde.blobs.prune(referenced)}
+
+
+def state_size(obj, seen: Optional[set] = None) -> int:
+    """Approximate bytes held by a state (objects shared between fields count once)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(state_size(k, seen) + state_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(state_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += state_size(vars(obj), seen)
+    return size
+
+
+def storage_report(thread_id: str, state: dict) -> Optional[dict]:
+    """
+    What one run costs: its state in memory and its checkpoints on disk.
+
+    checkpoint_bytes covers the run's snapshots and pending writes;
+    blob_bytes the stored texts its final state refers to (shared with
+    any other run that produced the same text).
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None or thread_id is None:
+        return None
+    with checkpointer.cursor(transaction=False) as cur:
+        snapshots, snapshot_bytes = cur.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints WHERE thread_id = ?",
+            (thread_id,),
+        ).fetchone()
+        write_bytes = cur.execute(
+            "SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE thread_id = ?", (thread_id,)
+        ).fetchone()[0]
+    texts = [
+        value for value in state.values()
+        if isinstance(value, str) and len(value) >= config.CHECKPOINT_BLOB_MIN_CHARS
+    ]
+    return {
+        "state_bytes": state_size(state),
+        "snapshots": snapshots,
+        "checkpoint_bytes": snapshot_bytes + write_bytes,
+        "blob_bytes": checkpointer.serde.blobs.stored_bytes(blob_key(t) for t in texts),
+    }
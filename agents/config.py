@@ -0,0 +1,122 @@
+import os
+
+def _host_url(value: str) -> str:
+    """Accept both 'host:port' (as `ollama serve` does) and full URLs"""
+    value = value.strip().rstrip("/")
+    if not value.startswith(("http://", "https://")):
+        value = f"http://{value}"
+    return value
+
+# Ollama backend
+OLLAMA_HOST = _host_url(os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+
+# Backend pool: comma-separated list of Ollama endpoints to balance across
+OLLAMA_HOSTS = [_host_url(h) for h in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if h.strip()]
+HEALTH_INTERVAL = float(os.getenv("ESSAY_HEALTH_INTERVAL", "10"))
+EJECT_SECONDS = float(os.getenv("ESSAY_EJECT_SECONDS", "30"))
+
+# Model residency: how long Ollama keeps the model loaded after a request,
+# which models to preload, and how often long-running modes re-ping them
+KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+WARMUP_ENABLED = os.getenv("ESSAY_WARMUP", "1") != "0"
+WARMUP_MODELS = [m for m in os.getenv("ESSAY_WARMUP_MODELS", MODEL).split(",") if m]
+KEEP_WARM_INTERVAL = float(os.getenv("ESSAY_KEEP_WARM_INTERVAL", "600"))
+
+# HTTP client
+CONNECT_TIMEOUT = float(os.getenv("ESSAY_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("ESSAY_READ_TIMEOUT", "180"))
+POOL_SIZE = int(os.getenv("ESSAY_POOL_SIZE", "16"))
+
+# Scheduler: concurrent requests allowed in flight per backend (match the
+# server's OLLAMA_NUM_PARALLEL), scaled by the number of backends, and
+# slots held back for interactive users
+MAX_CONCURRENCY = int(os.getenv("ESSAY_MAX_CONCURRENCY", os.getenv("OLLAMA_NUM_PARALLEL", "4"))) * len(OLLAMA_HOSTS)
+INTERACTIVE_RESERVE = int(os.getenv("ESSAY_INTERACTIVE_RESERVE", "0"))
+
+# Whole essay runs allowed at once per event loop (arun_essay_generation);
+# runs beyond this wait before starting rather than queueing LLM requests
+MAX_ACTIVE_RUNS = int(os.getenv("ESSAY_MAX_ACTIVE_RUNS", "256"))
+
+# Context budgets: tokens of research analysis shared with every agent, and
+# the range num_ctx is sized within (Ollama reloads the model when it changes)
+RESEARCH_CONTEXT_TOKENS = int(os.getenv("ESSAY_RESEARCH_CONTEXT_TOKENS", "700"))
+NUM_CTX_MIN = int(os.getenv("ESSAY_NUM_CTX_MIN", "4096"))
+NUM_CTX_MAX = int(os.getenv("ESSAY_NUM_CTX_MAX", "16384"))
+
+# Single-flight coalescing of identical in-flight requests. Only analytical
+# agents share a generation: concurrent brainstorm/outline/draft calls for the
+# same prompt must still give each student their own ideas and essay
+COALESCE_ENABLED = os.getenv("ESSAY_COALESCE", "1") != "0"
+COALESCE_AGENTS = set(
+    a for a in os.getenv("ESSAY_COALESCE_AGENTS", "research,critique,cli_critique").split(",") if a
+)
+
+# Hedged requests: duplicate a request to another backend when it has not
+# produced a first token within the agent's recent p95 time-to-first-token
+HEDGE_ENABLED = os.getenv("ESSAY_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("ESSAY_HEDGE_PERCENTILE", "0.95"))
+HEDGE_MIN_DELAY = float(os.getenv("ESSAY_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_FALLBACK_DELAY = float(os.getenv("ESSAY_HEDGE_FALLBACK_DELAY", "10"))
+
+# Agents that request schema-constrained JSON output (Ollama `format`)
+# instead of free-form markdown; currently brainstorm and critique support it
+STRUCTURED_AGENTS = set(a for a in os.getenv("ESSAY_STRUCTURED_AGENTS", "").split(",") if a)
+
+# Node memoization (opt-in): within one coaching session (runs given the same
+# session_id), reuse an agent's output when the state fields it reads are
+# unchanged (e.g. only the chosen brainstorm idea was edited)
+NODE_MEMO_ENABLED = os.getenv("ESSAY_NODE_MEMO", "0") == "1"
+
+# Overlapped pipeline: a downstream agent starts as soon as the part of the
+# upstream reply it needs has streamed in (e.g. outline once brainstorm's
+# selected idea is known); takes an extra parallel slot while both run
+OVERLAP_ENABLED = os.getenv("ESSAY_OVERLAP", "0") == "1"
+
+# Split critique: score, strengths/weaknesses, improvements and the revised
+# opening are requested concurrently (one parallel slot each) and merged
+CRITIQUE_SPLIT = os.getenv("ESSAY_CRITIQUE_SPLIT", "0") == "1"
+
+# Revise loop after critique (ESSAY_REVISE=1): rewrite the paragraphs the
+# critique's weaknesses quote and re-score, until the target score, a round
+# without improvement, or the budget (estimated output tokens / seconds)
+REVISE_ENABLED = os.getenv("ESSAY_REVISE", "0") == "1"
+REVISE_TARGET_SCORE = int(os.getenv("ESSAY_REVISE_TARGET_SCORE", "8"))
+REVISE_MAX_ROUNDS = int(os.getenv("ESSAY_REVISE_MAX_ROUNDS", "3"))
+REVISE_MAX_PARAGRAPHS = int(os.getenv("ESSAY_REVISE_MAX_PARAGRAPHS", "2"))
+REVISE_TOKEN_BUDGET = int(os.getenv("ESSAY_REVISE_TOKEN_BUDGET", "4000"))
+REVISE_TIME_BUDGET = float(os.getenv("ESSAY_REVISE_TIME_BUDGET", "180"))
+
+# Response cache
+CACHE_ENABLED = os.getenv("ESSAY_CACHE", "1") != "0"
+CACHE_DIR = os.getenv("ESSAY_CACHE_DIR", ".cache")
+CACHE_MAX_BYTES = int(float(os.getenv("ESSAY_CACHE_MAX_MB", "256")) * 1024 * 1024)
+CACHE_AGENTS = set(
+    os.getenv("ESSAY_CACHE_AGENTS", "research,outline,critique,cli_critique").split(",")
+)
+
+# Prompt library: research analyses precomputed offline for known prompts
+# (`essay_cli.py warm-library`); a run whose prompt is in it skips research
+PROMPT_LIBRARY_ENABLED = os.getenv("ESSAY_PROMPT_LIBRARY", "1") != "0"
+PROMPT_LIBRARY_PATH = os.getenv("ESSAY_PROMPT_LIBRARY_PATH", os.path.join(CACHE_DIR, "prompt_library.json"))
+
+# Workflow checkpoints: every finished agent is saved per run (thread id) so a
+# failed or interrupted run can resume at the failed node
+CHECKPOINT_ENABLED = os.getenv("ESSAY_CHECKPOINTS", "1") != "0"
+CHECKPOINT_DB = os.getenv("ESSAY_CHECKPOINT_DB", os.path.join(CACHE_DIR, "checkpoints.sqlite"))
+# Texts at least this long are saved once in a content-addressed blob store
+# and referenced from checkpoints, instead of being repeated in every snapshot
+CHECKPOINT_BLOB_DB = os.getenv("ESSAY_CHECKPOINT_BLOB_DB", os.path.join(CACHE_DIR, "checkpoint_blobs.sqlite"))
+CHECKPOINT_BLOB_MIN_CHARS = int(os.getenv("ESSAY_CHECKPOINT_BLOB_MIN_CHARS", "256"))
+# Retention applied by `essay_cli.py resume --prune` (e.g. after a nightly
+# batch): keep the newest N runs and drop runs older than N days (0: no limit)
+CHECKPOINT_KEEP_RUNS = int(os.getenv("ESSAY_CHECKPOINT_KEEP_RUNS", "500"))
+CHECKPOINT_KEEP_DAYS = float(os.getenv("ESSAY_CHECKPOINT_KEEP_DAYS", "30"))
+
+# Agent messages kept in the workflow state (older entries are dropped)
+MAX_STATE_MESSAGES = int(os.getenv("ESSAY_MAX_STATE_MESSAGES", "20"))
+
+# Per-call LLM metrics (agents/metrics.py): Prometheus text written to this
+# file after every run and/or served on http://127.0.0.1:<port>/metrics
+METRICS_FILE = os.getenv("ESSAY_METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("ESSAY_METRICS_PORT", "0"))
@@ -0,0 +1,26 @@
+import contextlib
+import contextvars
+
+# Off for runs whose progress would interleave with other runs' (batch workers)
+_verbose = contextvars.ContextVar("essay_verbose", default=True)
+
+
+def say(*args, **kwargs) -> None:
+    """print() for a run's progress output; silent inside quiet()"""
+    if _verbose.get():
+        print(*args, **kwargs)
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool = True):
+    """
+    Silence say() in this context.
+
+    Context variables follow the run into its worker threads and tasks
+    (copy_context), so concurrent runs can each be quiet or not.
+    """
+    token = _verbose.set(not enabled)
+    try:
+        yield
+    finally:
+        _verbose.reset(token)
@@ -0,0 +1,115 @@
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from agents import config
+from agents.console import say
+
+# Llama-family tokenizers average roughly 4 characters per English token
+CHARS_PER_TOKEN = 4
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Token budget for one agent's upstream context and its output"""
+    context: int
+    output: int
+
+
+# Upstream sections each agent receives beyond the shared prefix
+# (selected idea for outline, outline for draft, essay for critique and revise)
+# and how many tokens it may generate
+BUDGETS = {
+    "research": Budget(context=0, output=1200),
+    "brainstorm": Budget(context=0, output=1500),
+    "outline": Budget(context=400, output=1200),
+    "draft": Budget(context=900, output=1400),
+    "critique": Budget(context=1400, output=1500),
+    "revise": Budget(context=1400, output=600),
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count without loading a tokenizer"""
+    return max(1, len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def budget_for(agent: str) -> Budget:
+    """Budget for an agent (unknown agents get the draft budget)"""
+    return BUDGETS.get(agent, BUDGETS["draft"])
+
+
+def context_size(prompt: str, max_tokens: int) -> int:
+    """
+    num_ctx for a request: prompt plus output, rounded up to a power of two.
+
+    Ollama reloads the model whenever num_ctx changes, so sizes are
+    bucketed and never go below NUM_CTX_MIN; with the agent budgets
+    above every call of an essay run lands in the same bucket.
+    """
+    needed = estimate_tokens(prompt) + max_tokens
+    size = config.NUM_CTX_MIN
+    while size < needed and size < config.NUM_CTX_MAX:
+        size *= 2
+    return min(size, config.NUM_CTX_MAX)
+
+
+def _compact(text: str) -> str:
+    """Drop formatting that costs tokens but carries no content"""
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"^\s*(-{3,}|\*{3,}|_{3,})\s*$\n?", "", text, flags=re.MULTILINE)
+    return text.strip()
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """Cut text to max_tokens, preferring a line or sentence boundary"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text[:limit - 2]
+    boundary = max(cut.rfind("\n"), cut.rfind(". "))
+    if boundary <= limit // 2:
+        boundary = cut.rfind(" ")
+    if boundary > 0:
+        cut = cut[:boundary + 1]
+    return cut.rstrip() + " …"
+
+
+def fit_to_budget(text: str, max_tokens: int, label: str = "", verbose: bool = True) -> str:
+    """
+    Shrink an upstream section to at most max_tokens.
+
+    Formatting is compacted first. If that is not enough, every markdown
+    section keeps its heading and an equal share of the budget for its
+    opening lines, so the structure survives and only detail is lost.
+    """
+    before = estimate_tokens(text)
+    if before <= max_tokens:
+        return text
+
+    fitted = _compact(text)
+    if estimate_tokens(fitted) > max_tokens:
+        sections = re.split(r"\n(?=#{1,6} )", fitted)
+        # Leave room for the blank lines that rejoin the sections
+        share = max(1, max_tokens // len(sections) - 1)
+        fitted = _truncate(
+            "\n\n".join(_truncate(section, share) for section in sections), max_tokens
+        )
+
+    if verbose:
+        name = f"{label} " if label else ""
+        say(f"   ✂️  Trimmed {name}context: {before} → {estimate_tokens(fitted)} tokens")
+    return fitted
+
+
+@lru_cache(maxsize=64)
+def research_for_context(research_analysis: str) -> str:
+    """
+    Research analysis as it goes into the shared prefix.
+
+    Every agent gets the same trimmed text, so the prefix stays
+    byte-identical across the run (see shared_context); memoised so the
+    trim is computed and logged once per run rather than once per agent.
+    """
+    return fit_to_budget(research_analysis, config.RESEARCH_CONTEXT_TOKENS, "research")
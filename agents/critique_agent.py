@@ -1,7 +1,24 @@
 from agents.state import EssayState
-from agents.ollama_helper import call_ollama, format_prompt
-from agents.prompts.critique import CRITIQUE_SYSTEM, CRITIQUE_TEMPLATE
+from agents import config
+from agents.console import say
+from agents.context_budget import budget_for, fit_to_budget
+from agents.cutoff import cutoff_for
+from agents.handoff import acall_prefetched, call_prefetched
+from agents.ollama_helper import acall_ollama, call_ollama, format_prompt, shared_context
+from agents.prompts.critique import (
+    CRITIQUE_SYSTEM, CRITIQUE_TEMPLATE, CRITIQUE_JSON_TEMPLATE,
+    CRITIQUE_ESSAY_TEMPLATE, CRITIQUE_PART_TEMPLATES, CRITIQUE_PART_JSON_TEMPLATES
+)
+from agents.structured import (
+    CRITIQUE_PART_SCHEMAS, CRITIQUE_SCHEMA, parse_score, parse_structured, render_critique, structured_output_for
+)
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import AIMessage
+from typing import Optional
+import asyncio
+import contextvars
+import json
+import re
 import time
 
 def critique_agent(state: EssayState) -> dict:
@@ -12,36 +29,194 @@ def critique_agent(state: EssayState) -> dict:
     NOTE: In production (Week 6), this will use Claude API for highest quality.
     
     Input: state['prompt'], state['essay_draft']
-    Output: state['essay_critique']
+    Output: state['essay_critique'], state['critique_score'], state['critique_details']
     """
-    print("\n" + "="*60)
-    print("🔍 AGENT 5: CRITIQUE AGENT")
-    print("="*60)
-    print("Analyzing essay quality...")
+    request = _prepare(state)
+    
+    # Call Ollama with lower temperature for analytical task
+    start_time = time.time()
+    critique, generation_time = run_critique(request)
+    return _finish(state, critique, generation_time, time.time() - start_time)
+
+async def acritique_agent(state: EssayState) -> dict:
+    """Async version of critique_agent (same request, non-blocking client)"""
+    request = _prepare(state)
+    start_time = time.time()
+    critique, generation_time = await arun_critique(request)
+    return _finish(state, critique, generation_time, time.time() - start_time)
+
+def run_critique(request: dict) -> tuple:
+    """(critique, generation_time) for critique_request(state)"""
+    if not config.CRITIQUE_SPLIT:
+        return call_ollama(**request)
+    # One parallel slot per part; wall time is that of the slowest part
+    with ThreadPoolExecutor(len(request)) as pool:
+        futures = {
+            part: pool.submit(contextvars.copy_context().run, call_prefetched, part_request)
+            for part, part_request in request.items()
+        }
+        return _merge({part: future.result() for part, future in futures.items()})
+
+async def arun_critique(request: dict) -> tuple:
+    """Async version of run_critique"""
+    if not config.CRITIQUE_SPLIT:
+        return await acall_ollama(**request)
+    replies = await asyncio.gather(*(acall_prefetched(part_request) for part_request in request.values()))
+    return _merge(dict(zip(request, replies)))
+
+def _prepare(state: EssayState) -> dict:
+    """Announce the agent and build its call_ollama arguments (per part when split)"""
+    say("\n" + "="*60)
+    say("🔍 AGENT 5: CRITIQUE AGENT")
+    say("="*60)
+    say("Analyzing essay quality...")
+    if config.CRITIQUE_SPLIT:
+        say(f"   Split into {len(CRITIQUE_PART_TEMPLATES)} concurrent parts")
+    return critique_request(state)
+
+def critique_request(state: EssayState) -> dict:
+    """call_ollama arguments for a critique of state['essay_draft'] (per part when split)"""
+    if config.CRITIQUE_SPLIT:
+        return part_requests(state)
     
     # Format the prompt
+    budget = budget_for("critique")
+    structured = structured_output_for("critique")
     prompt = format_prompt(
-        CRITIQUE_TEMPLATE,
-        prompt=state['prompt'],
-        essay=state['essay_draft']
+        CRITIQUE_JSON_TEMPLATE if structured else CRITIQUE_TEMPLATE,
+        essay=fit_to_budget(state['essay_draft'], budget.context, "essay")
     )
     
-    # Call Ollama with lower temperature for analytical task
-    start_time = time.time()
-    critique, generation_time = call_ollama(
+    return dict(
         prompt=prompt,
         system_message=CRITIQUE_SYSTEM,
+        shared_prefix=shared_context(state['prompt']),
         temperature=0.4,  # Low temperature for consistent analysis
-        max_tokens=2000
+        max_tokens=budget.output,
+        agent="critique",
+        cutoff=cutoff_for("critique"),
+        json_schema=CRITIQUE_SCHEMA if structured else None
     )
-    total_time = time.time() - start_time
+
+def part_requests(state: EssayState) -> dict:
+    """
+    call_ollama arguments for each part of a split critique
+    
+    The essay is appended to the shared prefix, so the backend prefills
+    it once for the score, feedback and improvements parts; the revised
+    opening only gets the first paragraph (see opening_request).
+    """
+    budget = budget_for("critique")
+    structured = structured_output_for("critique")
+    templates = CRITIQUE_PART_JSON_TEMPLATES if structured else CRITIQUE_PART_TEMPLATES
+    essay_prefix = "\n\n".join([
+        shared_context(state['prompt']),
+        format_prompt(CRITIQUE_ESSAY_TEMPLATE, essay=fit_to_budget(state['essay_draft'], budget.context, "essay"))
+    ])
+    requests = {
+        part: dict(
+            prompt=templates[part],
+            system_message=CRITIQUE_SYSTEM,
+            shared_prefix=essay_prefix,
+            temperature=0.4,
+            max_tokens=budget.output,
+            agent="critique",
+            cutoff=cutoff_for(f"critique_{part}"),
+            json_schema=CRITIQUE_PART_SCHEMAS[part] if structured else None
+        )
+        for part in templates if part != "opening"
+    }
+    requests["opening"] = opening_request(state['prompt'], state['essay_draft'])
+    return requests
+
+def opening_request(prompt: str, essay: str, partial: bool = False) -> Optional[dict]:
+    """
+    call_ollama arguments for the revised-opening part
+    
+    With partial=True `essay` is still streaming: None until its first
+    paragraph is complete (or when the critique isn't split), so the
+    draft agent can start this part early in overlap mode.
+    """
+    if not config.CRITIQUE_SPLIT:
+        return None
+    opening = opening_paragraph(essay, partial)
+    if opening is None:
+        if partial:
+            return None
+        opening = essay.strip()
+    structured = structured_output_for("critique")
+    templates = CRITIQUE_PART_JSON_TEMPLATES if structured else CRITIQUE_PART_TEMPLATES
+    return dict(
+        prompt=format_prompt(templates["opening"], opening=fit_to_budget(opening, budget_for("critique").context, "opening")),
+        system_message=CRITIQUE_SYSTEM,
+        shared_prefix=shared_context(prompt),
+        temperature=0.4,
+        max_tokens=budget_for("critique").output,
+        agent="critique",
+        cutoff=cutoff_for("critique_opening"),
+        json_schema=CRITIQUE_PART_SCHEMAS["opening"] if structured else None
+    )
+
+def opening_paragraph(essay: str, partial: bool = False) -> Optional[str]:
+    """First paragraph of an essay, skipping a title line; None if not written yet"""
+    paragraphs = re.split(r"\n[ \t]*\n", essay)
+    if partial:
+        # The last paragraph may still be growing
+        paragraphs = paragraphs[:-1]
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # A heading, or a single line without closing punctuation, is a title
+        if paragraph.startswith("#") or ("\n" not in paragraph and not re.search(r"[.!?\"”')]$", paragraph)):
+            continue
+        return paragraph
+    return None
+
+def _merge(replies: dict) -> tuple:
+    """
+    (critique, generation_time) from the parts' (text, seconds) replies
+    
+    The result reads like a single-request critique: one JSON object in
+    structured mode, otherwise the sections in CRITIQUE_TEMPLATE order.
+    """
+    texts = {part: text for part, (text, _) in replies.items()}
+    generation_time = max(seconds for _, seconds in replies.values())
+    if structured_output_for("critique"):
+        parsed = [parse_structured(texts[part], CRITIQUE_PART_SCHEMAS[part]) for part in texts]
+        if all(parsed):
+            return json.dumps({k: v for fields in parsed for k, v in fields.items()}), generation_time
+        return "\n\n".join(texts.values()), generation_time
+    
+    # College fit comes from the score part but goes after the improvements
+    score = texts["score"]
+    fit = re.search(r"^#{1,6}\s*\**\s*COLLEGE FIT", score, re.IGNORECASE | re.MULTILINE)
+    verdict, college_fit = (score[:fit.start()], score[fit.start():]) if fit else (score, "")
+    sections = [verdict, texts["feedback"], texts["improvements"], college_fit, texts["opening"]]
+    return "\n\n".join(s.strip() for s in sections if s.strip()) + "\n", generation_time
+
+def parse_critique(critique: str) -> tuple:
+    """(markdown critique, score, details) from a critique reply in either mode"""
+    structured = structured_output_for("critique")
+    details = parse_structured(critique, CRITIQUE_SCHEMA) if structured else None
+    if details:
+        return render_critique(details), details['overall_score'], details
+    return critique, parse_score(critique), {}
+
+def _finish(state: EssayState, critique: str, generation_time: float, total_time: float) -> dict:
+    """Parse the score, report it and build the state update"""
+    critique, score, details = parse_critique(critique)
     
-    print(f"✅ Critique complete ({generation_time:.1f}s)")
+    say(f"✅ Critique complete ({generation_time:.1f}s)")
+    if score is not None:
+        say(f"   Score: {score}/10")
     
     # Update state
     return {
         "essay_critique": critique,
+        "critique_score": score,
+        "critique_details": details,
         "current_agent": "complete",
-        "agent_times": {**state.get("agent_times", {}), "critique": total_time},
+        "agent_times": {"critique": total_time},
         "messages": [AIMessage(content="Critique Agent: Provided detailed feedback")]
     }
\ No newline at end of file
@@ -0,0 +1,123 @@
+import re
+from typing import List, Optional
+
+
+# A list item line: "1. ...", "2) ...", "- ...", "* ...", "• ..."
+LIST_ITEM = re.compile(r"^(?:\d+[.)]|[-*+•])\s+")
+
+
+class SectionCutoff:
+    """
+    Detects when a markdown reply has every section the caller parses.
+
+    `sections` are the headings the reply must contain, in order. The
+    last one ends at the next heading or horizontal rule. Otherwise:
+
+    - a prose section ends after `final_paragraphs` paragraphs, once
+      the text after them has started and is not a list;
+    - a list never ends on a blank line, since models often put blank
+      lines between items. With `items` set, a list of at least that
+      many items ends at the first unindented paragraph after it (unless
+      earlier items already had such paragraphs, i.e. explanations);
+      without it, only a heading or rule ends the list.
+
+    If the model skips or renames a heading the cutoff never fires and
+    the reply runs to its natural end, so a misdetection can only cost
+    time, never sections.
+
+    `stop` sequences are sent to Ollama as well, for endings that need
+    no parsing (e.g. a sixth brainstorm idea).
+    """
+
+    def __init__(self, sections: List[str], final_paragraphs: int = 1, stop: Optional[List[str]] = None,
+                 items: Optional[int] = None):
+        self.sections = sections
+        self.final_paragraphs = final_paragraphs
+        self.items = items
+        self.stop = stop or []
+        self._patterns = [
+            re.compile(r"^#{1,6}\s*\**\s*" + re.escape(section), re.IGNORECASE | re.MULTILINE)
+            for section in sections
+        ]
+
+    def end_of(self, text: str) -> Optional[int]:
+        """Index where the reply is complete, or None if it is not yet"""
+        pos = 0
+        for pattern in self._patterns:
+            match = pattern.search(text, pos)
+            if match is None:
+                return None
+            pos = match.end()
+        line_end = text.find("\n", pos)
+        if line_end < 0:
+            return None
+
+        body_start = line_end + 1
+        rest = text[body_start:]
+
+        # A new heading or horizontal rule after the final section's content
+        boundary = re.search(r"^(#{1,6} |-{3,}\s*$)", rest, re.MULTILINE)
+        if boundary and rest[:boundary.start()].strip():
+            return body_start + boundary.start()
+
+        end = self._end_of_body(rest)
+        return None if end is None else body_start + end
+
+    def _end_of_body(self, body: str) -> Optional[int]:
+        """End of the final section's content in body (complete lines only), or None"""
+        paragraphs = items = 0
+        in_list = loose = False
+        last_end = None  # End of the last non-blank line
+        gap = False      # A blank line since then
+        pos = 0
+        for line in body.split("\n")[:-1]:
+            start, pos = pos, pos + len(line) + 1
+            if not line.strip():
+                gap = last_end is not None
+                continue
+            if LIST_ITEM.match(line):
+                items += 1
+                in_list = True
+            elif gap and not line[0].isspace():
+                # A new unindented paragraph after a blank line
+                if in_list:
+                    if self.items and items >= self.items and not loose:
+                        return last_end
+                    loose = True
+                else:
+                    paragraphs += 1
+                    if paragraphs >= self.final_paragraphs:
+                        return last_end
+            last_end, gap = start + len(line), False
+        return None
+
+    def complete(self, text: str) -> bool:
+        return self.end_of(text) is not None
+
+    def trim(self, text: str) -> str:
+        """Text up to the end of the final section (unchanged if incomplete)"""
+        end = self.end_of(text)
+        return text if end is None else text[:end].rstrip() + "\n"
+
+
+# Cutoffs for the agents' markdown formats (text mode only: structured JSON
+# replies end on their own)
+CUTOFFS = {
+    "research": SectionCutoff(["WHAT THE PROMPT REALLY ASKS", "COMMON PITFALLS", "KEY SUCCESS FACTORS"]),
+    "brainstorm": SectionCutoff(["IDEA 1:", "IDEA 5:", "RECOMMENDATION"], stop=["## IDEA 6"]),
+    "outline": SectionCutoff(["OPENING", "CONCLUSION", "WRITING GUIDELINES"], items=4),
+    "critique": SectionCutoff(["OVERALL SCORE", "STRENGTHS", "WEAKNESSES", "REVISED OPENING PARAGRAPH"]),
+    "critique_score": SectionCutoff(["OVERALL SCORE", "ONE-SENTENCE ASSESSMENT", "COLLEGE FIT"], items=3),
+    "critique_feedback": SectionCutoff(["STRENGTHS", "WEAKNESSES"], items=3),
+    "critique_improvements": SectionCutoff(["SPECIFIC IMPROVEMENTS NEEDED"], items=4),
+    "critique_opening": SectionCutoff(["REVISED OPENING PARAGRAPH"]),
+    "revise": SectionCutoff(["REVISED PARAGRAPH"]),
+    "cli_critique": SectionCutoff(
+        ["OVERALL ASSESSMENT", "STRENGTHS", "REVISED OPENING PARAGRAPH", "COLLEGE READINESS"], items=2
+    ),
+}
+
+
+def cutoff_for(agent: str) -> Optional[SectionCutoff]:
+    """Section cutoff for an agent, if it has a fixed section format"""
+    return CUTOFFS.get(agent)
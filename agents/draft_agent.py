@@ -1,5 +1,9 @@
 from agents.state import EssayState
-from agents.ollama_helper import call_ollama, format_prompt
+from agents.console import say
+from agents.context_budget import budget_for, fit_to_budget
+from agents.critique_agent import opening_request
+from agents.handoff import acall_handing_off, call_handing_off
+from agents.ollama_helper import format_prompt, shared_context
 from agents.prompts.draft import DRAFT_SYSTEM, DRAFT_TEMPLATE
 from langchain_core.messages import AIMessage
 import time
@@ -14,39 +18,63 @@ def draft_agent(state: EssayState) -> dict:
     Input: state['prompt'], state['research_analysis'], state['essay_outline']
     Output: state['essay_draft']
     """
-    print("\n" + "="*60)
-    print("✍️  AGENT 4: DRAFT AGENT")
-    print("="*60)
-    print("Writing the essay...")
+    request = _prepare(state)
     
-    # Format the prompt
+    # Call Ollama
+    # NOTE: In Week 4, this will use your fine-tuned model
+    # In overlap mode the split critique's revised opening starts as soon
+    # as the first paragraph is written
+    start_time = time.time()
+    essay, generation_time = call_handing_off(request, _critique_handoff(state))
+    return _finish(state, essay, generation_time, time.time() - start_time)
+
+async def adraft_agent(state: EssayState) -> dict:
+    """Async version of draft_agent (same request, non-blocking client)"""
+    request = _prepare(state)
+    start_time = time.time()
+    essay, generation_time = await acall_handing_off(request, _critique_handoff(state))
+    return _finish(state, essay, generation_time, time.time() - start_time)
+
+def _critique_handoff(state: EssayState):
+    """Critique request that only needs the partial essay (see critique_agent.opening_request)"""
+    def ready(essay: str):
+        return opening_request(state['prompt'], essay, partial=True)
+    return ready
+
+def _prepare(state: EssayState) -> dict:
+    """Announce the agent and build its call_ollama arguments"""
+    say("\n" + "="*60)
+    say("✍️  AGENT 4: DRAFT AGENT")
+    say("="*60)
+    say("Writing the essay...")
+    
+    # Format the prompt (prompt and research go in the shared prefix)
+    budget = budget_for("draft")
     prompt = format_prompt(
         DRAFT_TEMPLATE,
-        prompt=state['prompt'],
-        outline=state['essay_outline'],
-        research_analysis=state['research_analysis']
+        outline=fit_to_budget(state['essay_outline'], budget.context, "outline")
     )
     
-    # Call Ollama
-    # NOTE: In Week 4, this will use your fine-tuned model
-    start_time = time.time()
-    essay, generation_time = call_ollama(
+    return dict(
         prompt=prompt,
         system_message=DRAFT_SYSTEM,
+        shared_prefix=shared_context(state['prompt'], state['research_analysis']),
         temperature=0.75,  # Balanced creativity and coherence
-        max_tokens=2500    # Enough for 650+ words
+        max_tokens=budget.output,  # ~650 words plus headroom
+        agent="draft"
     )
-    total_time = time.time() - start_time
-    
+
+def _finish(state: EssayState, essay: str, generation_time: float, total_time: float) -> dict:
+    """Report the result and build the state update"""
     word_count = len(essay.split())
     
-    print(f"✅ Draft complete ({generation_time:.1f}s)")
-    print(f"   Word count: {word_count} words")
+    say(f"✅ Draft complete ({generation_time:.1f}s)")
+    say(f"   Word count: {word_count} words")
     
     # Update state
     return {
         "essay_draft": essay,
         "current_agent": "critique",
-        "agent_times": {**state.get("agent_times", {}), "draft": total_time},
+        "agent_times": {"draft": total_time},
         "messages": [AIMessage(content=f"Draft Agent: Wrote {word_count}-word essay")]
     }
\ No newline at end of file
@@ -0,0 +1,661 @@
+"""
+Deterministic stand-in for an Ollama server.
+
+Implements /api/generate, /api/chat (streaming and non-streaming),
+/api/tags and /api/ps with a simple latency model, so the pipeline's
+own overhead, concurrency and scaling can be measured without a GPU:
+
+    python -m agents.fake_ollama --port 11435 --decode-tps 40
+    OLLAMA_HOST=localhost:11435 python run_multi_agent.py
+
+Outputs are canned responses in the section formats the agents parse
+(`## IDEA n:`, `## RECOMMENDATION`, `## OVERALL SCORE: X/10`, ...),
+chosen from the prompt and varied deterministically by its hash.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional
+
+import xxhash
+
+from agents.context_budget import estimate_tokens
+from agents.structured import CRITIQUE_PARTS
+
+DEFAULT_MODELS = ("llama3.1:8b",)
+
+
+@dataclass
+class FakeOllamaConfig:
+    """Latency model and capacity of the fake server"""
+    models: tuple = DEFAULT_MODELS
+    load_seconds: float = 2.0          # Cold model load on first use / after keep_alive expiry
+    prefill_tps: float = 1500.0        # Prompt tokens/s (uncached part of the prompt only)
+    decode_tps: float = 40.0           # Output tokens/s for a request running alone
+    parallel: int = 4                  # Like OLLAMA_NUM_PARALLEL: extra requests queue FIFO
+    contention: float = 0.15           # Decode slowdown per additional concurrently running request
+    stall_rate: float = 0.0            # Fraction of requests that stall before their first token
+    stall_seconds: float = 10.0
+    ramble_tokens: int = 0             # Commentary appended after the requested sections
+    time_scale: float = 1.0            # Multiplies every sleep (0 = as fast as possible)
+    seed: int = 0                      # Seeds stalls; text depends only on the prompt
+
+
+def _tokens(text: str) -> List[str]:
+    """Split text into word-sized 'tokens' that join back to the original"""
+    return re.findall(r"\s*\S+|\s+$", text)
+
+
+# ----------------------------------------------------------------------
+# Canned outputs
+# ----------------------------------------------------------------------
+
+_TOPICS = [
+    ("The Broken Telescope", "rebuilding a thrift-store telescope with my grandfather after his stroke"),
+    ("Night Shift Algebra", "tutoring my younger brother at 11 PM after closing my parents' restaurant"),
+    ("Debugging at 2:47 AM", "chasing a race condition in my robotics team's code the night before regionals"),
+    ("The Wrong Answer Key", "discovering my teacher's answer key was wrong and deciding whether to say so"),
+    ("Forty Jars of Kimchi", "learning my mother's recipe by failing at it forty times"),
+    ("The Quiet Debate", "losing a debate round because I refused to use a misleading statistic"),
+    ("Lost in Translation", "interpreting for my father at a hospital and mistranslating one word"),
+]
+
+
+def _pick(seed: int, items: list, count: int) -> list:
+    rng = random.Random(seed)
+    return rng.sample(items, count)
+
+
+def _research(seed: int) -> str:
+    return """## WHAT THE PROMPT REALLY ASKS
+The prompt asks how the applicant responds when their assumptions are tested. Admissions officers want evidence of reflection, not a tidy success story.
+
+## WHAT ADMISSIONS WANTS TO SEE
+- A specific moment rather than a summary of years
+- Honest discomfort and how the applicant worked through it
+- Growth that shows up in later actions
+
+## COMMON PITFALLS
+- Listing achievements instead of telling one story
+- Ending with a generic lesson ("I learned to never give up")
+- Spending most of the essay on background
+
+## STRONG APPROACHES
+- Open in the middle of the moment
+- Use concrete details: names, times, objects
+- Let the reflection grow out of the scene
+
+## KEY SUCCESS FACTORS
+Specificity, vulnerability and an earned insight.
+"""
+
+
+def _brainstorm(seed: int) -> str:
+    ideas = _pick(seed, _TOPICS, 5)
+    sections = []
+    for i, (title, story) in enumerate(ideas, 1):
+        sections.append(
+            f"## IDEA {i}: {title}\n"
+            f"**Core Story:** {story[0].upper() + story[1:]}.\n"
+            f"**Why It Works:** It centres on one concrete scene. It shows growth through action rather than statement.\n"
+            f"**Growth Arc:** I learned that patience is a skill, not a trait.\n"
+            f"**Originality Score:** {6 + (seed + i) % 4}\n"
+        )
+    best = 1 + seed % 5
+    sections.append(
+        f"## RECOMMENDATION\n**Best Idea:** Idea {best}: {ideas[best - 1][0]}. "
+        f"It has the clearest narrative arc and the most specific details.\n"
+    )
+    return "\n".join(sections)
+
+
+def _outline(seed: int) -> str:
+    title, story = _pick(seed, _TOPICS, 1)[0]
+    return f"""## OPENING (Hook)
+**Scene to open with:** The moment of {story}
+**First sentence suggestion:** "I had three minutes and one chance to get it right."
+**Tone:** reflective
+
+## BODY SECTION 1: {title}
+**What happens:** The situation and what was at stake
+**Key details to include:** the time, the room, one line of dialogue
+**Emotion to convey:** frustration that turns into curiosity
+
+## BODY SECTION 2: The Turning Point
+**What happens:** The first attempt fails
+**Key details to include:** the specific mistake and who noticed it
+**Turning point:** Asking for help instead of hiding the failure
+
+## CONCLUSION
+**Reflection:** Progress comes from repeated honest attempts
+**Broader meaning:** How this changed the way I approach hard problems
+**Final note:** Return to the opening image, changed
+
+## WRITING GUIDELINES
+- Word count target: 650 words
+- Voice: conversational
+- Details to emphasize: sensory details and internal thoughts
+- What to avoid: "this taught me to never give up"
+"""
+
+
+_ESSAY_SENTENCES = [
+    "The clock on the microwave read 2:47 AM when I finally admitted I did not know what I was doing.",
+    "My grandfather used to say that anything worth fixing is worth breaking twice.",
+    "I had rehearsed the moment a dozen times, but none of the rehearsals included my hands shaking.",
+    "The room smelled like solder and cold coffee.",
+    "Nobody else noticed the mistake, which somehow made it worse.",
+    "I wrote the problem on a sticky note and stuck it to my bathroom mirror for a week.",
+    "When I asked for help, the answer was not what I expected.",
+    "It took me forty tries to understand that the recipe was never written down for a reason.",
+    "Looking back, the failure was the most useful thing that happened to me that year.",
+    "Now, when something breaks, my first question is not whose fault it is but what it is trying to tell me.",
+]
+
+
+def _essay(seed: int, paragraphs: int = 6) -> str:
+    rng = random.Random(seed)
+    return "\n\n".join(
+        " ".join(rng.choice(_ESSAY_SENTENCES) for _ in range(8)) for _ in range(paragraphs)
+    ) + "\n"
+
+
+def _critique(seed: int) -> str:
+    score = 5 + seed % 4
+    return f"""## OVERALL SCORE: {score}/10
+
+## ONE-SENTENCE ASSESSMENT
+A specific, honest story whose reflection is still more told than shown.
+
+## STRENGTHS (with specific quotes)
+1. Strong opening: "The clock on the microwave read 2:47 AM"
+2. Concrete sensory detail: "The room smelled like solder and cold coffee."
+3. Honest vulnerability about asking for help
+
+## WEAKNESSES (with specific quotes)
+1. Repetitive sentences weaken the pacing
+2. "the most useful thing that happened to me" is generic
+3. The conclusion restates rather than extends the story
+
+## SPECIFIC IMPROVEMENTS NEEDED
+1. **Opening:** Cut to the moment faster
+2. **Details:** Name the people involved
+3. **Voice:** Keep the humour from paragraph two throughout
+4. **Structure:** Shorten the background section
+
+## COLLEGE FIT
+- **Top-tier schools (Harvard, Stanford, MIT):** {"Yes" if score >= 7 else "Not yet"}, with revision
+- **Competitive schools:** Yes
+- **Better suited for:** Schools that value reflection and persistence
+
+## REVISED OPENING PARAGRAPH
+At 2:47 AM the debugger was still red, and I finally said the words I had avoided all week: "I don't know."
+"""
+
+
+def _cli_critique(seed: int) -> str:
+    score = 5 + seed % 4
+    return f"""## OVERALL ASSESSMENT
+- Score: {score}/10
+- A specific, honest story whose reflection needs more showing.
+
+## STRENGTHS (with specific examples from the text)
+1. A vivid opening moment
+2. Concrete sensory details
+3. Honest vulnerability
+
+## WEAKNESSES (with specific examples from the text)
+1. Repetitive sentence structure
+2. Generic phrasing in the conclusion
+3. Too much background
+
+## SPECIFIC IMPROVEMENTS
+1. Opening: Start one sentence later
+2. Body: Name the people involved
+3. Ending: Return to the opening image
+4. Voice/Style: Keep the humour throughout
+
+## REVISED OPENING PARAGRAPH
+At 2:47 AM the debugger was still red, and I finally said the words I had avoided all week.
+
+## COLLEGE READINESS
+- Would this essay work for: Competitive schools
+- Best fit for colleges that value: persistence and reflection
+"""
+
+
+def _brainstorm_json(seed: int) -> dict:
+    ideas = _pick(seed, _TOPICS, 5)
+    return {
+        "ideas": [
+            {
+                "title": title,
+                "core_story": story[0].upper() + story[1:] + ".",
+                "why_it_works": "It centres on one concrete scene. It shows growth through action.",
+                "growth_arc": "I learned that patience is a skill, not a trait.",
+                "originality_score": 6 + (seed + i) % 4,
+            }
+            for i, (title, story) in enumerate(ideas, 1)
+        ],
+        "recommendation": {
+            "idea_number": 1 + seed % 5,
+            "reason": "It has the clearest narrative arc. It has the most specific details.",
+        },
+    }
+
+
+def _critique_json(seed: int) -> dict:
+    score = 5 + seed % 4
+    return {
+        "overall_score": score,
+        "assessment": "A specific, honest story whose reflection is still more told than shown.",
+        "strengths": ['Strong opening: "The clock on the microwave read 2:47 AM"', "Concrete sensory detail", "Honest vulnerability"],
+        "weaknesses": ["Repetitive sentences", "\"the most useful thing that happened to me\" is generic", "Too much background"],
+        "improvements": {
+            "opening": "Cut to the moment faster",
+            "details": "Name the people involved",
+            "voice": "Keep the humour throughout",
+            "structure": "Shorten the background section",
+        },
+        "college_fit": {
+            "top_tier": "Yes, with revision" if score >= 7 else "Not yet",
+            "competitive": "Yes",
+            "best_suited_for": "Schools that value reflection and persistence",
+        },
+        "revised_opening": "At 2:47 AM the debugger was still red, and I finally said: \"I don't know.\"",
+    }
+
+
+def _critique_part(part: str, *headings: str):
+    """Markdown and JSON generators for one part of a split critique"""
+    def markdown(seed: int) -> str:
+        sections = re.split(r"\n(?=## )", _critique(seed).strip())
+        return "\n\n".join(
+            s.strip() for s in sections if any(s.startswith(f"## {h}") for h in headings)
+        ) + "\n"
+
+    def as_json(seed: int) -> dict:
+        full = _critique_json(seed)
+        return {field: full[field] for field in CRITIQUE_PARTS[part]}
+
+    return markdown, as_json
+
+
+def _revised_paragraph(seed: int) -> str:
+    rng = random.Random(seed)
+    return "## REVISED PARAGRAPH\n" + " ".join(rng.choice(_ESSAY_SENTENCES) for _ in range(6)) + "\n"
+
+
+def _ramble(tokens: int) -> str:
+    """Trailing commentary of the kind models add after the last section"""
+    words = ("Note:", "this", "essay", "outline", "could", "also", "explore", "further", "themes,")
+    return "\n\n" + " ".join(words[i % len(words)] for i in range(tokens)) + "\n"
+
+
+# (marker in prompt, markdown generator, JSON generator), checked in order
+_RESPONDERS = [
+    ("generate 5 distinct essay ideas", _brainstorm, _brainstorm_json),
+    ("Create a detailed outline", _outline, None),
+    ("Evaluate this college essay", _critique, _critique_json),
+    ("Evaluate the essay above", *_critique_part("score", "OVERALL SCORE", "ONE-SENTENCE", "COLLEGE FIT")),
+    ("List the strengths and weaknesses", *_critique_part("feedback", "STRENGTHS", "WEAKNESSES")),
+    ("needs to improve", *_critique_part("improvements", "SPECIFIC IMPROVEMENTS")),
+    ("This is the opening paragraph", *_critique_part("opening", "REVISED OPENING")),
+    ("provide a comprehensive critique", _cli_critique, None),
+    ("REVISED PARAGRAPH", _revised_paragraph, None),
+    ("Analyze the college essay prompt", _research, None),
+]
+
+
+def canned_response(prompt: str, structured: bool = False) -> str:
+    """
+    Deterministic response for a prompt, in the format its agent expects.
+
+    With structured=True (the request set `format`) agents that have a
+    JSON schema get compact JSON instead of markdown.
+    """
+    seed = xxhash.xxh32_intdigest(prompt)
+    for marker, responder, json_responder in _RESPONDERS:
+        if marker in prompt:
+            if structured and json_responder is not None:
+                return json.dumps(json_responder(seed))
+            return responder(seed)
+    return _essay(seed)
+
+
+# ----------------------------------------------------------------------
+# Server state
+# ----------------------------------------------------------------------
+
+class FakeOllama:
+    """Model residency, prompt cache and concurrency slots shared by all handlers"""
+
+    def __init__(self, config: Optional[FakeOllamaConfig] = None):
+        self.config = config or FakeOllamaConfig()
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.config.parallel)
+        self._running = 0
+        self._resident = {}  # model -> expiry timestamp (None = never expires)
+        self._loading = {m: threading.Lock() for m in self.config.models}
+        self._recent_prompts = deque(maxlen=self.config.parallel * 4)
+        self._rng = random.Random(self.config.seed)
+        self.requests = 0
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0 and self.config.time_scale > 0:
+            time.sleep(seconds * self.config.time_scale)
+
+    # -- residency -----------------------------------------------------
+
+    def _is_resident(self, model: str) -> bool:
+        expiry = self._resident.get(model, 0)
+        return expiry is None or expiry > time.time()
+
+    def load(self, model: str, keep_alive) -> int:
+        """Make model resident; returns load duration in ns"""
+        load_ns = 0
+        with self._loading.setdefault(model, threading.Lock()):
+            if not self._is_resident(model):
+                start = time.time()
+                self.sleep(self.config.load_seconds)
+                load_ns = int((time.time() - start) * 1e9)
+        seconds = _keep_alive_seconds(keep_alive)
+        with self._lock:
+            if seconds == 0:
+                self._resident.pop(model, None)
+            else:
+                self._resident[model] = None if seconds < 0 else time.time() + seconds
+        return load_ns
+
+    def loaded_models(self) -> list:
+        with self._lock:
+            models = [m for m in list(self._resident) if self._is_resident(m)]
+            expiries = {m: self._resident[m] for m in models}
+        return [
+            {
+                "name": m,
+                "model": m,
+                "size": 5_000_000_000,
+                "size_vram": 5_000_000_000,
+                "expires_at": _timestamp(expiries[m]),
+            }
+            for m in models
+        ]
+
+    # -- generation ----------------------------------------------------
+
+    def _cached_prefix_tokens(self, prompt: str) -> int:
+        """Tokens of prompt already in a slot's KV cache (longest shared prefix)"""
+        with self._lock:
+            best = max((len(os.path.commonprefix([p, prompt])) for p in self._recent_prompts), default=0)
+            self._recent_prompts.append(prompt)
+        return estimate_tokens(prompt[:best])
+
+    def generate(self, model: str, prompt: str, options: dict, keep_alive, structured: bool = False) -> Iterator[dict]:
+        """Yield {'response': token} chunks, then a final stats chunk"""
+        with self._lock:
+            self.requests += 1
+            stall = self._rng.random() < self.config.stall_rate
+
+        load_ns = self.load(model, keep_alive)
+        self._slots.acquire()
+        try:
+            with self._lock:
+                self._running += 1
+            text = canned_response(prompt, structured)
+            if self.config.ramble_tokens and not structured:
+                text += _ramble(self.config.ramble_tokens)
+            for stop in options.get("stop") or ():
+                if stop in text:
+                    text = text[:text.index(stop)]
+            tokens = _tokens(text)
+            num_predict = options.get("num_predict")
+            if num_predict is not None and num_predict >= 0:
+                tokens = tokens[:num_predict]
+
+            prompt_tokens = estimate_tokens(prompt)
+            uncached = prompt_tokens - self._cached_prefix_tokens(prompt)
+            prefill_start = time.time()
+            self.sleep(uncached / self.config.prefill_tps)
+            if stall:
+                self.sleep(self.config.stall_seconds)
+            prefill_ns = int((time.time() - prefill_start) * 1e9)
+
+            decode_start = time.time()
+            for token in tokens:
+                with self._lock:
+                    others = self._running - 1
+                self.sleep((1 + self.config.contention * others) / self.config.decode_tps)
+                yield {"response": token}
+            decode_ns = int((time.time() - decode_start) * 1e9)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._slots.release()
+
+        yield {
+            "done": True,
+            "done_reason": "length" if num_predict is not None and len(tokens) == num_predict else "stop",
+            "total_duration": load_ns + prefill_ns + decode_ns,
+            "load_duration": load_ns,
+            "prompt_eval_count": max(uncached, 1),  # Like Ollama: the cached prefix isn't re-evaluated
+            "prompt_eval_duration": prefill_ns,
+            "eval_count": len(tokens),
+            "eval_duration": decode_ns,
+        }
+
+
+def _keep_alive_seconds(value) -> float:
+    """Parse Ollama keep_alive ('30m', '1h', 300, -1); negative = forever"""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)\s*([smh]?)", str(value).strip())
+    if not match:
+        return 300.0
+    number, unit = match.groups()
+    return float(number) * {"": 1, "s": 1, "m": 60, "h": 3600}[unit]
+
+
+def _timestamp(epoch: Optional[float]) -> str:
+    if epoch is None:
+        return "2318-08-01T00:00:00Z"
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+
+def _chat_prompt(messages: list) -> str:
+    return "\n\n".join(m.get("content", "") for m in messages)
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "FakeOllamaServer"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, body: dict, status: int = 200) -> None:
+        data = json.dumps(body).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # Client gave up waiting (timeout, cancelled caller)
+            self.close_connection = True
+
+    def _send_chunk(self, body: dict) -> None:
+        data = (json.dumps(body) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        fake = self.server.fake
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": m, "model": m, "size": 5_000_000_000} for m in fake.config.models]})
+        elif self.path == "/api/ps":
+            self._send_json({"models": fake.loaded_models()})
+        elif self.path in ("/", "/api/version"):
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json({"error": "invalid JSON"}, status=400)
+            return
+
+        if self.path == "/api/generate":
+            chat = False
+            prompt = request.get("prompt", "")
+            if request.get("system"):
+                prompt = f"{request['system']}\n\n{prompt}"
+        elif self.path == "/api/chat":
+            chat = True
+            prompt = _chat_prompt(request.get("messages", []))
+        else:
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        fake = self.server.fake
+        model = request.get("model", "")
+        if model not in fake.config.models:
+            self._send_json({"error": f"model '{model}' not found"}, status=404)
+            return
+
+        # An empty prompt just loads (or, with keep_alive=0, unloads) the model
+        if not prompt and not chat:
+            load_ns = fake.load(model, request.get("keep_alive"))
+            self._send_json(self._wrap({"done": True, "load_duration": load_ns}, model, chat))
+            return
+
+        chunks = fake.generate(
+            model, prompt, request.get("options") or {}, request.get("keep_alive"),
+            structured=bool(request.get("format")),
+        )
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in chunks:
+                    self._send_chunk(self._wrap(chunk, model, chat))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client went away: stop generating and free the slot
+                chunks.close()
+                self.close_connection = True
+        else:
+            text = ""
+            final = {}
+            for chunk in chunks:
+                text += chunk.get("response", "")
+                if chunk.get("done"):
+                    final = chunk
+            self._send_json(self._wrap({**final, "response": text}, model, chat))
+
+    @staticmethod
+    def _wrap(chunk: dict, model: str, chat: bool) -> dict:
+        body = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": False, **chunk}
+        text = body.pop("response", "")
+        if chat:
+            body["message"] = {"role": "assistant", "content": text}
+        else:
+            body["response"] = text
+        return body
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    """HTTP server around a FakeOllama; serve in a thread with start()"""
+
+    daemon_threads = True
+    request_queue_size = 128  # Many runs connect at once in concurrency benchmarks
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: Optional[FakeOllamaConfig] = None):
+        super().__init__((host, port), _Handler)
+        self.fake = FakeOllama(config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv: Optional[list] = None) -> None:
+    defaults = FakeOllamaConfig()
+    parser = argparse.ArgumentParser(description="Deterministic fake Ollama server for offline benchmarking")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default=",".join(defaults.models), help="Comma-separated model names")
+    parser.add_argument("--load-seconds", type=float, default=defaults.load_seconds)
+    parser.add_argument("--prefill-tps", type=float, default=defaults.prefill_tps)
+    parser.add_argument("--decode-tps", type=float, default=defaults.decode_tps)
+    parser.add_argument("--parallel", type=int, default=defaults.parallel)
+    parser.add_argument("--contention", type=float, default=defaults.contention)
+    parser.add_argument("--stall-rate", type=float, default=defaults.stall_rate)
+    parser.add_argument("--stall-seconds", type=float, default=defaults.stall_seconds)
+    parser.add_argument("--ramble-tokens", type=int, default=defaults.ramble_tokens)
+    parser.add_argument("--time-scale", type=float, default=defaults.time_scale)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    args = parser.parse_args(argv)
+
+    config = FakeOllamaConfig(
+        models=tuple(m for m in args.models.split(",") if m),
+        load_seconds=args.load_seconds,
+        prefill_tps=args.prefill_tps,
+        decode_tps=args.decode_tps,
+        parallel=args.parallel,
+        contention=args.contention,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        ramble_tokens=args.ramble_tokens,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    server = FakeOllamaServer(args.host, args.port, config)
+    print(f"🧪 Fake Ollama listening on {server.url} (models: {', '.join(config.models)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
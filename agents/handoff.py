@@ -0,0 +1,259 @@
+import asyncio
+import contextlib
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+from agents import config
+from agents.console import say
+from agents.ollama_helper import acall_ollama, astream_ollama, call_ollama, stream_ollama
+from agents.response_cache import ResponseCache
+
+# Partial upstream reply -> the downstream request it already determines, or None
+Ready = Callable[[str], Optional[dict]]
+
+# A started generation nobody claims (the prediction was wrong, or the run
+# failed first) is forgotten after this many seconds
+UNCLAIMED_TTL = 600
+
+# Workflow run the current early starts belong to (see run_scope)
+_run: contextvars.ContextVar[Optional[object]] = contextvars.ContextVar("essay_handoff_run", default=None)
+
+
+def _request_key(request: dict) -> str:
+    """Content address of a call_ollama request (the cutoff is derived from `agent`)"""
+    return ResponseCache.key({k: v for k, v in request.items() if k != "cutoff"})
+
+
+class _Prefetch:
+    """A sync early start: the generation's future plus a flag that stops it mid-stream"""
+
+    def __init__(self, future: Future, stop: threading.Event):
+        self.future = future
+        self.stop = stop
+
+    def cancel(self) -> None:
+        # A queued call never starts; a running one closes its stream at the next token
+        self.stop.set()
+        self.future.cancel()
+
+
+def _generate_until_stopped(request: dict, stop: threading.Event) -> Tuple[str, float]:
+    """call_ollama, streamed so a cancelled early start frees its backend slot"""
+    stream = stream_ollama(**request)
+    try:
+        for _ in stream:
+            if stop.is_set():
+                raise CancelledError()
+    finally:
+        stream.close()
+    return stream.text, stream.elapsed or 0.0
+
+
+class Prefetcher:
+    """
+    Downstream generations started while the upstream agent still streams.
+
+    Entries are keyed by the workflow run (see run_scope) and the
+    complete request, so a node only ever claims the generation its own
+    run would have made. If the prediction was wrong (say the student
+    picked another idea) the node finds no match and makes its own call;
+    the unused start is cancelled once the node finishes (see claiming),
+    or at the latest when the run ends. Sync
+    entries run on a small thread pool, async ones as tasks on the
+    run's event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # (run, agent, request key) -> (_Prefetch or task, started_at)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.started = 0
+        self.claimed = 0
+        self.cancelled = 0
+
+    def start(self, request: dict) -> None:
+        key = _entry_key(request)
+        with self._lock:
+            self._expire()
+            if key in self._pending:
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(config.MAX_CONCURRENCY, thread_name_prefix="handoff")
+            # Copy the context so the early call keeps the run's request priority
+            stop = threading.Event()
+            future = self._executor.submit(contextvars.copy_context().run, _generate_until_stopped, request, stop)
+            self._pending[key] = (_Prefetch(future, stop), time.time())
+            self.started += 1
+
+    def astart(self, request: dict) -> None:
+        """Async counterpart of start() (call from the run's event loop)"""
+        key = _entry_key(request)
+        with self._lock:
+            self._expire()
+            if key in self._pending:
+                return
+            task = asyncio.ensure_future(acall_ollama(**request))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._pending[key] = (task, time.time())
+            self.started += 1
+
+    def claim(self, request: dict) -> Optional[Future]:
+        entry = self._claim(request)
+        return entry.future if entry is not None else None
+
+    def aclaim(self, request: dict) -> Optional[asyncio.Task]:
+        return self._claim(request)
+
+    def _claim(self, request: dict):
+        with self._lock:
+            self._expire()
+            entry = self._pending.pop(_entry_key(request), None)
+            if entry is None:
+                return None
+            self.claimed += 1
+            return entry[0]
+
+    def release(self, agent: str) -> None:
+        """Cancel what the current run started for `agent` that its node didn't claim"""
+        run = _run.get()
+        with self._lock:
+            self._cancel(lambda key: key[:2] == (run, agent))
+
+    def cancel_run(self, run: object) -> None:
+        """Cancel the early starts of a finished run that no node claimed"""
+        with self._lock:
+            self._cancel(lambda key: key[0] is run)
+
+    def _cancel(self, matches: Callable[[tuple], bool]) -> None:
+        for key in [key for key in self._pending if matches(key)]:
+            self._pending.pop(key)[0].cancel()
+            self.cancelled += 1
+
+    def _expire(self):
+        now = time.time()
+        self._cancel(lambda key: now - self._pending[key][1] > UNCLAIMED_TTL)
+
+    def stats(self) -> dict:
+        """Early starts vs. how many were used by their node (the rest were cancelled)"""
+        return {"started": self.started, "claimed": self.claimed, "cancelled": self.cancelled}
+
+
+def _entry_key(request: dict) -> tuple:
+    return (_run.get(), request.get("agent", ""), _request_key(request))
+
+
+_prefetcher = Prefetcher()
+
+
+def get_prefetcher() -> Prefetcher:
+    return _prefetcher
+
+
+def claiming(agent: str, node: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    """Wrap the node of `agent` so the early starts it left unclaimed are cancelled when it finishes"""
+    if asyncio.iscoroutinefunction(node):
+        @functools.wraps(node)
+        async def arun(state: dict) -> dict:
+            try:
+                return await node(state)
+            finally:
+                _prefetcher.release(agent)
+
+        return arun
+
+    @functools.wraps(node)
+    def run(state: dict) -> dict:
+        try:
+            return node(state)
+        finally:
+            _prefetcher.release(agent)
+
+    return run
+
+
+@contextlib.contextmanager
+def run_scope():
+    """
+    Tie the early starts made inside to one workflow run.
+
+    Runs never claim each other's generations, even for the same
+    request, and whatever the run leaves unclaimed (it failed, or the
+    node it was meant for never ran) is cancelled on exit.
+    """
+    run = object()
+    token = _run.set(run)
+    try:
+        yield
+    finally:
+        _run.reset(token)
+        _prefetcher.cancel_run(run)
+
+
+def _applies(request: dict) -> bool:
+    # Partial JSON isn't parsed, so structured replies are handed off whole
+    return config.OVERLAP_ENABLED and request.get("json_schema") is None
+
+
+def call_handing_off(request: dict, ready: Ready) -> Tuple[str, float]:
+    """
+    call_ollama, streaming so the next agent can start early.
+
+    In overlap mode `ready` is checked as tokens arrive; once it
+    returns the downstream request, that request is started (see
+    Prefetcher) while this reply finishes. Otherwise this is a plain
+    call_ollama.
+    """
+    if not _applies(request):
+        return call_ollama(**request)
+    stream = stream_ollama(**request)
+    handed_off = False
+    for _ in stream:
+        if not handed_off:
+            handed_off = _hand_off(ready, stream.text, _prefetcher.start)
+    if not handed_off:
+        _hand_off(ready, stream.text, _prefetcher.start)
+    return stream.text, stream.elapsed or 0.0
+
+
+async def acall_handing_off(request: dict, ready: Ready) -> Tuple[str, float]:
+    """Async version of call_handing_off"""
+    if not _applies(request):
+        return await acall_ollama(**request)
+    stream = await astream_ollama(**request)
+    handed_off = False
+    async for _ in stream:
+        if not handed_off:
+            handed_off = _hand_off(ready, stream.text, _prefetcher.astart)
+    if not handed_off:
+        _hand_off(ready, stream.text, _prefetcher.astart)
+    return stream.text, stream.elapsed or 0.0
+
+
+def _hand_off(ready: Ready, text: str, start: Callable[[dict], None]) -> bool:
+    request = ready(text)
+    if request is None:
+        return False
+    start(request)
+    return True
+
+
+def call_prefetched(request: dict) -> Tuple[str, float]:
+    """call_ollama, or the result of the same request started early"""
+    future = _prefetcher.claim(request)
+    if future is None:
+        return call_ollama(**request)
+    say("   ⏩ Started while the previous agent was still writing")
+    return future.result()
+
+
+async def acall_prefetched(request: dict) -> Tuple[str, float]:
+    """Async version of call_prefetched"""
+    task = _prefetcher.aclaim(request)
+    if task is None:
+        return await acall_ollama(**request)
+    say("   ⏩ Started while the previous agent was still writing")
+    return await task
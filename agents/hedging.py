@@ -0,0 +1,295 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from agents import config
+
+
+class HedgePolicy:
+    """
+    When to send a backup copy of a slow request, and how it went.
+
+    A request that has not produced its first token after the agent's
+    recent p95 time-to-first-token is duplicated to another backend
+    (see hedged_call). Until an agent has `min_samples` observations the
+    threshold comes from all agents' samples, then `fallback_delay`.
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        percentile: Optional[float] = None,
+        min_delay: Optional[float] = None,
+        fallback_delay: Optional[float] = None,
+        min_samples: int = 5,
+    ):
+        self.enabled = config.HEDGE_ENABLED if enabled is None else enabled
+        self.percentile = percentile or config.HEDGE_PERCENTILE
+        self.min_delay = config.HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.fallback_delay = fallback_delay or config.HEDGE_FALLBACK_DELAY
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._ttfts = {}
+        self._all_ttfts = deque(maxlen=1000)
+        self._counts = {}
+
+    def applies(self, backends: int) -> bool:
+        """Hedging needs somewhere else to send the copy"""
+        return self.enabled and backends > 1
+
+    def threshold(self, agent: str) -> float:
+        """Seconds to wait for a first token before hedging"""
+        with self._lock:
+            samples = self._ttfts.get(agent, ())
+            if len(samples) < self.min_samples:
+                samples = self._all_ttfts
+            if len(samples) < self.min_samples:
+                return self.fallback_delay
+            ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))])
+
+    def observe_ttft(self, agent: str, seconds: float) -> None:
+        with self._lock:
+            self._ttfts.setdefault(agent, deque(maxlen=200)).append(seconds)
+            self._all_ttfts.append(seconds)
+
+    def record(self, agent: str, hedged: bool, hedge_won: bool) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(agent, {"requests": 0, "hedged": 0, "hedge_wins": 0})
+            counts["requests"] += 1
+            counts["hedged"] += hedged
+            counts["hedge_wins"] += hedge_won
+
+    def stats(self) -> dict:
+        """Per agent: requests, hedges sent, hedges that won, current threshold"""
+        with self._lock:
+            agents = {agent: dict(counts) for agent, counts in self._counts.items()}
+        for agent, counts in agents.items():
+            counts["threshold"] = self.threshold(agent)
+        return agents
+
+
+class _Race:
+    """Shared state of one hedged request (sync)"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.winner = None
+        self.body: Optional[dict] = None
+        self.failed = []  # (backend, error), in order
+        self.closers = {}
+
+
+def _close_quietly(close: Callable) -> None:
+    try:
+        close()
+    except Exception:
+        pass
+
+
+def hedged_call(pool, scheduler, policy: HedgePolicy, agent: str, affinity: Optional[str],
+                open_attempt: Callable, retry_on: tuple = (), until: Optional[Callable] = None) -> tuple:
+    """
+    Run one generation with hedging; returns (body, backend).
+
+    open_attempt(backend) starts a streaming request and returns
+    (chunk_iterator, close_fn). The first attempt to produce a token
+    wins; the other is closed as soon as it can be (a copy blocked
+    before its response headers notices when they arrive). The backup
+    only goes out if the scheduler has a free slot, so hedging never
+    delays queued requests. Errors in retry_on (connection failures)
+    eject the backend and fail over, as OllamaClient._route does.
+    until(text), if given, ends the winning copy early once it returns
+    True (see cutoff.SectionCutoff).
+    """
+    race = _Race()
+    tried = []
+
+    def attempt(backend, slot):
+        pool.begin(backend)
+        start = time.time()
+        ok = True
+        close = None
+        try:
+            chunks, close = open_attempt(backend)
+            with race.cond:
+                if race.winner is not None:
+                    return
+                race.closers[id(backend)] = close
+            text = []
+            final = {}
+            for chunk in chunks:
+                if race.winner is not backend:
+                    policy.observe_ttft(agent, time.time() - start)
+                    with race.cond:
+                        if race.winner is not None:
+                            return
+                        race.winner = backend
+                        losers = [c for key, c in race.closers.items() if key != id(backend)]
+                        race.cond.notify_all()
+                    # Closing a response another thread is reading can block, so do it off-thread
+                    for loser in losers:
+                        threading.Thread(target=_close_quietly, args=(loser,), daemon=True).start()
+                token = chunk.get("response", "")
+                text.append(token)
+                if chunk.get("done"):
+                    final = chunk
+                elif until is not None and "\n" in token and until("".join(text)):
+                    final = {"done": True, "done_reason": "cutoff", "eval_count": len(text)}
+                    _close_quietly(close)
+                    break
+            with race.cond:
+                race.body = {**final, "response": "".join(text)}
+                race.cond.notify_all()
+        except BaseException as e:
+            if race.winner is not None and race.winner is not backend:
+                return  # Closed because the other copy won
+            ok = False
+            if isinstance(e, retry_on):
+                pool.mark_failed(backend)
+            with race.cond:
+                race.failed.append((backend, e))
+                race.cond.notify_all()
+        finally:
+            if close is not None and race.winner is not backend:
+                _close_quietly(close)
+            pool.end(backend, time.time() - start, ok)
+            if slot is not None:
+                slot.release()
+
+    def launch(slot=None):
+        backend = pool.pick(exclude=tried, affinity=None if tried else affinity)
+        if backend is None:
+            return None
+        tried.append(backend)
+        threading.Thread(target=attempt, args=(backend, slot), name="ollama-hedge", daemon=True).start()
+        return backend
+
+    launch()
+    deadline = time.time() + policy.threshold(agent)
+    hedged = False
+    with race.cond:
+        while race.body is None:
+            failed = [b for b, _ in race.failed]
+            if race.winner is not None and race.winner in failed:
+                raise race.failed[failed.index(race.winner)][1]
+            if race.winner is None and len(failed) == len(tried):
+                # Every copy failed before its first token: fail over or give up
+                error = race.failed[-1][1]
+                if not isinstance(error, retry_on) or launch() is None:
+                    raise error
+                continue
+            if not hedged and race.winner is None and time.time() >= deadline:
+                hedged = True
+                slot = scheduler.try_acquire()
+                if slot is not None and launch(slot) is None:
+                    slot.release()
+                continue
+            waiting = not hedged and race.winner is None
+            race.cond.wait(timeout=max(0.0, deadline - time.time()) if waiting else None)
+        winner = race.winner
+
+    backup_sent = len(tried) > 1 and hedged
+    policy.record(agent, backup_sent, backup_sent and winner is tried[-1])
+    return race.body, winner
+
+
+async def ahedged_call(pool, scheduler, policy: HedgePolicy, agent: str, affinity: Optional[str],
+                       open_attempt: Callable[..., Awaitable[tuple]], retry_on: tuple = (),
+                       until: Optional[Callable] = None) -> tuple:
+    """Async counterpart of hedged_call(); the losing copy's task is cancelled"""
+    first_token = asyncio.Event()
+    state = {"winner": None}
+    tasks = {}
+    tried = []
+
+    async def attempt(backend, slot):
+        pool.begin(backend)
+        start = time.time()
+        ok = True
+        close = None
+        try:
+            chunks, close = await open_attempt(backend)
+            text = []
+            final = {}
+            async for chunk in chunks:
+                if state["winner"] is None:
+                    policy.observe_ttft(agent, time.time() - start)
+                    state["winner"] = backend
+                    first_token.set()
+                    for task, other in tasks.items():
+                        if other is not backend:
+                            task.cancel()
+                token = chunk.get("response", "")
+                text.append(token)
+                if chunk.get("done"):
+                    final = chunk
+                elif until is not None and "\n" in token and until("".join(text)):
+                    final = {"done": True, "done_reason": "cutoff", "eval_count": len(text)}
+                    break
+            return {**final, "response": "".join(text)}
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            ok = False
+            if isinstance(e, retry_on):
+                pool.mark_failed(backend)
+            raise
+        finally:
+            if close is not None:
+                await close()
+            pool.end(backend, time.time() - start, ok)
+            if slot is not None:
+                slot.release()
+
+    def launch(slot=None):
+        backend = pool.pick(exclude=tried, affinity=None if tried else affinity)
+        if backend is None:
+            return None
+        tried.append(backend)
+        tasks[asyncio.ensure_future(attempt(backend, slot))] = backend
+        return backend
+
+    launch()
+    deadline = time.time() + policy.threshold(agent)
+    hedged = False
+    waiter = asyncio.ensure_future(first_token.wait())
+    try:
+        while True:
+            errors = []
+            for task, backend in tasks.items():
+                if not task.done() or task.cancelled():
+                    continue
+                if task.exception() is None:
+                    backup_sent = len(tried) > 1 and hedged
+                    policy.record(agent, backup_sent, backup_sent and backend is tried[-1])
+                    return task.result(), backend
+                if backend is state["winner"]:
+                    raise task.exception()
+                errors.append(task.exception())
+
+            pending = {task for task in tasks if not task.done()}
+            if not pending:
+                # Every copy failed before its first token: fail over or give up
+                error = errors[-1]
+                if not isinstance(error, retry_on) or launch() is None:
+                    raise error
+                continue
+
+            waiting = not hedged and state["winner"] is None
+            timeout = max(0.0, deadline - time.time()) if waiting else None
+            if not waiter.done():
+                pending.add(waiter)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done and waiting:
+                hedged = True
+                slot = scheduler.try_acquire()
+                if slot is not None and launch(slot) is None:
+                    slot.release()
+    finally:
+        waiter.cancel()
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,1054 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents import config
+from agents.context_budget import context_size
+from agents.cutoff import SectionCutoff
+from agents.hedging import HedgePolicy, ahedged_call, hedged_call
+from agents.metrics import MetricsRegistry, get_metrics
+from agents.response_cache import ResponseCache, cache_enabled_for, get_cache
+from agents.router import Backend, BackendPool
+from agents.scheduler import RequestScheduler, get_scheduler
+from agents.single_flight import SingleFlight
+
+
+def _abort(response: requests.Response) -> None:
+    """Close a streaming response, waking a thread blocked reading it (a plain close() doesn't)"""
+    sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    response.close()
+
+
+class OllamaError(Exception):
+    """Raised when an Ollama call fails (connection, timeout or HTTP error)"""
+
+
+class OllamaConnectionError(OllamaError):
+    """The backend could not be reached (safe to retry on another host)"""
+
+
+@dataclass
+class GenerationResult:
+    """One completed generation plus the timing fields Ollama reports"""
+    text: str
+    elapsed: float
+    model: str
+    host: str
+    stats: dict = field(default_factory=dict)
+    cached: bool = False
+
+    @property
+    def load_seconds(self) -> float:
+        """Time Ollama spent loading the model for this call"""
+        return self.stats.get("load_duration", 0) / 1e9
+
+
+class GenerationStream:
+    """
+    Iterates over response tokens as Ollama streams them.
+
+    Timing fields fill in while the stream is consumed:
+    ttft (time to first token, i.e. load + prefill), elapsed, and
+    decode_tps (tokens/s after the first token) once the stream is done.
+    """
+
+    def __init__(self, chunks: Iterator[dict], host: str, start: float, close=None, cached: bool = False):
+        self.host = host
+        self.text = ""
+        self.model = ""
+        self.stats = {}
+        self.done = False
+        self.cached = cached
+        self.on_done = None  # Callback run with the stream once the final chunk arrives
+        self.cutoff = None  # Optional SectionCutoff: stop as soon as the reply is complete
+        self.ttft: Optional[float] = None
+        self.elapsed: Optional[float] = None
+        self._chunks = chunks
+        self._start = start
+        self._first_token_at: Optional[float] = None
+        self._token_count = 0
+        self._yielded = 0  # Length of self.text handed to the consumer (see _ready)
+        self._close = close
+
+    def _consume(self, chunk: dict) -> str:
+        """Update timings from one NDJSON chunk and return its token"""
+        token = chunk.get("response", "")
+        if token:
+            if self._first_token_at is None:
+                self._first_token_at = time.time()
+                self.ttft = self._first_token_at - self._start
+            self._token_count += 1
+            self.text += token
+        if chunk.get("done"):
+            self.done = True
+            self.model = chunk.get("model", "")
+            self.stats = OllamaClient._stats(chunk)
+            self._finish()
+            if self.on_done is not None:
+                self.on_done(self)
+        return token
+
+    def _finish(self):
+        if self.elapsed is None:
+            self.elapsed = time.time() - self._start
+
+    def _cut_off(self, token: str) -> bool:
+        """End the stream early once the cutoff says every section is in (trims self.text)"""
+        if self.cutoff is None or self.done or "\n" not in token:
+            return False
+        end = self.cutoff.end_of(self.text)
+        if end is None:
+            return False
+        self.text = self.text[:end].rstrip() + "\n"
+        self.done = True
+        # Ollama's final stats never arrive; time the decode ourselves
+        decode_ns = int((time.time() - self._first_token_at) * 1e9)
+        self.stats = {"eval_count": self._token_count, "eval_duration": decode_ns, "done_reason": "cutoff"}
+        self._finish()
+        if self.on_done is not None:
+            self.on_done(self)
+        return True
+
+    def _ready(self, token: str) -> Tuple[str, bool]:
+        """
+        (text to hand the consumer now, whether the reply is complete).
+
+        With a cutoff the line being written, and blank lines before it,
+        are held back: the cutoff may still decide the reply ended before
+        them, and a live consumer must never see text past that end.
+        """
+        if self.cutoff is None:
+            self._yielded = len(self.text)
+            return token, False
+        ended = self._cut_off(token)
+        ready = len(self.text) if ended or self.done else self._settled()
+        text, self._yielded = self.text[self._yielded:ready], max(self._yielded, ready)
+        return text, ended
+
+    def _settled(self) -> int:
+        """End of the text no cutoff can remove: through the last non-blank complete line"""
+        lines = self.text[:self.text.rfind("\n") + 1]
+        if not lines.strip():
+            return 0
+        return lines.index("\n", len(lines.rstrip())) + 1
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for chunk in self._chunks:
+                token = self._consume(chunk)
+                if not token:
+                    continue
+                text, ended = self._ready(token)
+                if text:
+                    yield text
+                if ended:
+                    break
+            # Ended on its own: whatever was held back is part of the reply
+            if self.text[self._yielded:]:
+                yield self.text[self._yielded:]
+        finally:
+            self._finish()
+            self.close()
+
+    @property
+    def decode_tps(self) -> Optional[float]:
+        """Decode speed, from Ollama's eval stats when present"""
+        if self.stats.get("eval_duration"):
+            return self.stats["eval_count"] / (self.stats["eval_duration"] / 1e9)
+        if self._first_token_at is not None and self.elapsed and self._token_count > 1:
+            decode_time = self._start + self.elapsed - self._first_token_at
+            if decode_time > 0:
+                return (self._token_count - 1) / decode_time
+        return None
+
+    @property
+    def prefill_tps(self) -> Optional[float]:
+        """Prompt processing speed, from Ollama's prompt_eval stats"""
+        if self.stats.get("prompt_eval_duration"):
+            return self.stats["prompt_eval_count"] / (self.stats["prompt_eval_duration"] / 1e9)
+        return None
+
+    def result(self) -> GenerationResult:
+        """Snapshot as a GenerationResult (consume the stream first)"""
+        return GenerationResult(
+            text=self.text, elapsed=self.elapsed or 0.0,
+            model=self.model, host=self.host, stats=self.stats, cached=self.cached,
+        )
+
+    def close(self):
+        """Stop reading and release the connection back to the pool"""
+        if self._close is not None:
+            self._close()
+            self._close = None
+
+
+class AsyncGenerationStream(GenerationStream):
+    """Async counterpart of GenerationStream (use `async for`)"""
+
+    def __init__(self, chunks: AsyncIterator[dict], host: str, start: float, aclose=None, cached: bool = False):
+        super().__init__(iter(()), host, start, cached=cached)
+        self._achunks = chunks
+        self._aclose = aclose
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        try:
+            async for chunk in self._achunks:
+                token = self._consume(chunk)
+                if not token:
+                    continue
+                text, ended = self._ready(token)
+                if text:
+                    yield text
+                if ended:
+                    break
+            if self.text[self._yielded:]:
+                yield self.text[self._yielded:]
+        finally:
+            self._finish()
+            await self.aclose()
+
+    async def aclose(self):
+        if self._aclose is not None:
+            await self._aclose()
+            self._aclose = None
+
+
+class OllamaClient:
+    """
+    Pooled Ollama client shared by every agent and CLI command.
+
+    The sync path keeps a requests.Session with keep-alive connections;
+    the async path keeps one httpx.AsyncClient per event loop, closed
+    with `await client.aclose()` or `async with client:`. Generation
+    requests are routed across the backend pool (OLLAMA_HOSTS); `host`
+    is the primary backend, used for one-off GETs.
+    """
+
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        model: Optional[str] = None,
+        hosts: Optional[list] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        keep_alive: Optional[str] = None,
+        scheduler: Optional[RequestScheduler] = None,
+        hedging: Optional[HedgePolicy] = None,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        if hosts is None:
+            hosts = [host] if host else config.OLLAMA_HOSTS
+        self.pool = BackendPool(hosts)
+        self.host = self.pool.backends[0].url
+        self.model = model or config.MODEL
+        self.keep_alive = keep_alive or config.KEEP_ALIVE
+        self.connect_timeout = connect_timeout or config.CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or config.READ_TIMEOUT
+        self.pool_size = pool_size or config.POOL_SIZE
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        # httpx clients are bound to the loop they were created on
+        self._async_clients = weakref.WeakKeyDictionary()
+        self.flights = SingleFlight()
+        self.scheduler = scheduler or get_scheduler()
+        self.hedging = hedging or HedgePolicy()
+        self.metrics = metrics or get_metrics()
+        self._keep_warm_thread: Optional[threading.Thread] = None
+        self._keep_warm_stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Request building
+    # ------------------------------------------------------------------
+
+    def build_payload(
+        self,
+        prompt: str,
+        system_message: str = "",
+        temperature: float = 0.7,
+        max_tokens: int = 2000,
+        top_p: float = 0.9,
+        model: Optional[str] = None,
+        stream: bool = False,
+        shared_prefix: str = "",
+        num_ctx: Optional[int] = None,
+        json_schema: Optional[dict] = None,
+        stop: Optional[list] = None,
+    ) -> dict:
+        """
+        Build an /api/generate payload.
+
+        The prompt is laid out as shared_prefix, system_message, prompt.
+        Content shared between calls goes first so Ollama's prompt cache
+        can reuse the already-prefilled tokens on the next call.
+        num_ctx defaults to the prompt plus max_tokens, bucketed (see
+        context_budget.context_size). json_schema is sent as Ollama's
+        `format` to constrain the reply to that JSON schema; stop lists
+        Ollama stop sequences.
+        """
+        full_prompt = "\n\n".join(part for part in (shared_prefix, system_message, prompt) if part)
+
+        payload = {
+            "model": model or self.model,
+            "prompt": full_prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": {
+                "temperature": temperature,
+                "top_p": top_p,
+                "num_predict": max_tokens,
+                "num_ctx": num_ctx or context_size(full_prompt, max_tokens),
+            }
+        }
+        if json_schema is not None:
+            payload["format"] = json_schema
+        if stop:
+            payload["options"]["stop"] = stop
+        return payload
+
+    def _timeout(self, timeout: Optional[float]) -> tuple:
+        return (self.connect_timeout, timeout or self.read_timeout)
+
+    def _error(self, exc: Exception, timeout: float, host: Optional[str] = None) -> OllamaError:
+        """Translate transport errors into the messages agents have always shown"""
+        if isinstance(exc, (requests.exceptions.ConnectTimeout, httpx.ConnectTimeout)):
+            return OllamaConnectionError(f"Cannot connect to Ollama at {host or self.host}. Is it running? (ollama serve)")
+        if isinstance(exc, (requests.exceptions.Timeout, httpx.TimeoutException)):
+            return OllamaError(f"Ollama request timed out ({timeout:.0f}s). Is the model loaded?")
+        if isinstance(exc, (requests.exceptions.ConnectionError, httpx.ConnectError)):
+            return OllamaConnectionError(f"Cannot connect to Ollama at {host or self.host}. Is it running? (ollama serve)")
+        return OllamaError(f"Ollama error: {str(exc)}")
+
+    @staticmethod
+    def _stats(body: dict) -> dict:
+        """Timing/token fields from a final Ollama response"""
+        return {
+            key: body[key]
+            for key in (
+                "total_duration", "load_duration",
+                "prompt_eval_count", "prompt_eval_duration",
+                "eval_count", "eval_duration", "done_reason",
+            )
+            if key in body
+        }
+
+    @classmethod
+    def _result(cls, body: dict, elapsed: float, host: str, cached: bool = False) -> GenerationResult:
+        return GenerationResult(
+            text=body.get("response", ""),
+            elapsed=elapsed,
+            model=body.get("model", ""),
+            host=host,
+            stats=cls._stats(body),
+            cached=cached,
+        )
+
+    # ------------------------------------------------------------------
+    # Response cache
+    # ------------------------------------------------------------------
+
+    def _cache_lookup(self, payload: dict, agent: str, cache: Optional[bool]):
+        """
+        Returns (cache_key, cached_body). cache_key is None when the
+        cache is bypassed for this call.
+        """
+        use_cache = cache_enabled_for(agent) if cache is None else cache
+        if not use_cache:
+            return None, None
+        key = get_cache().key(payload)
+        body = get_cache().get(key)
+        if body is not None:
+            self.metrics.observe_cache_hit(agent, payload["model"])
+        return key, body
+
+    @staticmethod
+    def _cache_store(key: Optional[str], body: dict, elapsed: float):
+        if key is not None and body.get("response"):
+            get_cache().put(key, body, elapsed)
+
+    @classmethod
+    def _cached_stream(cls, body: dict, start: float, stream_class=None):
+        """Replay a cached body as a single-chunk stream"""
+        chunk = {**body, "done": True}
+        if stream_class is AsyncGenerationStream:
+            async def chunks():
+                yield chunk
+            return AsyncGenerationStream(chunks(), "cache", start, cached=True)
+        return GenerationStream(iter([chunk]), "cache", start, cached=True)
+
+    @staticmethod
+    def _flight_key(payload: dict, agent: str, coalesce: Optional[bool]) -> Optional[str]:
+        """Key for single-flight coalescing, or None when it is off for this call (see config.COALESCE_AGENTS)"""
+        if coalesce is None:
+            coalesce = config.COALESCE_ENABLED and agent in config.COALESCE_AGENTS
+        if not coalesce:
+            return None
+        return ResponseCache.key(payload)
+
+    def _store_on_done(self, stream: GenerationStream, key: Optional[str], agent: str = "",
+                       model: str = "", queue_wait: Optional[float] = None):
+        """
+        Cache the reply and record its metrics once the stream completes.
+
+        queue_wait is None for a stream that joined another caller's
+        generation, which that caller records.
+        """
+        def done(done_stream):
+            if key is not None:
+                body = {"response": done_stream.text, "model": done_stream.model, **done_stream.stats}
+                self._cache_store(key, body, done_stream.elapsed or 0.0)
+            if queue_wait is not None:
+                self.metrics.observe_call(
+                    agent, done_stream.model or model, done_stream.host, done_stream.stats,
+                    queue_wait, done_stream.elapsed or 0.0,
+                )
+        stream.on_done = done
+
+    # ------------------------------------------------------------------
+    # Sync API
+    # ------------------------------------------------------------------
+
+    def post(self, path: str, payload: dict, timeout: Optional[float] = None, host: Optional[str] = None) -> dict:
+        """POST to an Ollama endpoint (primary host by default) and return the decoded JSON body"""
+        host = host or self.host
+        read_timeout = timeout or self.read_timeout
+        try:
+            response = self._session.post(
+                f"{host}{path}", json=payload, timeout=self._timeout(read_timeout)
+            )
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise self._error(e, read_timeout, host) from e
+
+    def get(self, path: str, timeout: Optional[float] = None, host: Optional[str] = None) -> dict:
+        """GET an Ollama endpoint (primary host by default) and return the decoded JSON body"""
+        host = host or self.host
+        read_timeout = timeout or self.read_timeout
+        try:
+            response = self._session.get(f"{host}{path}", timeout=self._timeout(read_timeout))
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            raise self._error(e, read_timeout, host) from e
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _affinity(options: dict) -> Optional[str]:
+        """Requests of one essay run share the first block of their prefix"""
+        shared_prefix = options.get("shared_prefix")
+        return shared_prefix.split("\n\n", 1)[0] if shared_prefix else None
+
+    def _route(self, send, affinity: Optional[str], hold: bool = False):
+        """
+        Call send(backend) on the best backend, failing over to the next
+        one when a backend cannot be reached. Returns (result, backend).
+
+        With hold=True the request stays outstanding on the backend and
+        the caller must finish it with pool.end() (used for streams).
+        """
+        tried = []
+        while True:
+            backend = self.pool.pick(exclude=tried, affinity=affinity)
+            if backend is None:
+                raise last_error
+            tried.append(backend)
+            self.pool.begin(backend)
+            start = time.time()
+            try:
+                result = send(backend)
+            except OllamaConnectionError as e:
+                self.pool.end(backend, time.time() - start, ok=False)
+                self.pool.mark_failed(backend)
+                last_error = e
+                continue
+            except BaseException:
+                self.pool.end(backend, time.time() - start, ok=False)
+                raise
+            if not hold:
+                self.pool.end(backend, time.time() - start)
+            return result, backend
+
+    async def _aroute(self, send, affinity: Optional[str], hold: bool = False):
+        """Async counterpart of _route(); send(backend) is a coroutine function"""
+        tried = []
+        while True:
+            backend = self.pool.pick(exclude=tried, affinity=affinity)
+            if backend is None:
+                raise last_error
+            tried.append(backend)
+            self.pool.begin(backend)
+            start = time.time()
+            try:
+                result = await send(backend)
+            except OllamaConnectionError as e:
+                self.pool.end(backend, time.time() - start, ok=False)
+                self.pool.mark_failed(backend)
+                last_error = e
+                continue
+            except BaseException:
+                self.pool.end(backend, time.time() - start, ok=False)
+                raise
+            if not hold:
+                self.pool.end(backend, time.time() - start)
+            return result, backend
+
+    def generate(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        agent: str = "",
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        cutoff: Optional[SectionCutoff] = None,
+        **options
+    ) -> GenerationResult:
+        """
+        Run one non-streaming generation.
+
+        Keyword options are passed to build_payload (system_message,
+        temperature, max_tokens, top_p, model). `agent` selects the
+        cache policy; `cache` forces it on or off for this call.
+        Concurrent identical requests from analytical agents
+        (config.COALESCE_AGENTS) share one upstream generation; `coalesce`
+        forces it on or off for this call. With a `cutoff` the reply is
+        streamed and generation stops as soon as every section the
+        caller parses is complete.
+        """
+        cutoff = self._text_cutoff(cutoff, options)
+        payload = self.build_payload(prompt, stop=cutoff.stop if cutoff else None, **options)
+        start = time.time()
+        key, body = self._cache_lookup(payload, agent, cache)
+        if body is not None:
+            return self._result(body, time.time() - start, "cache", cached=True)
+
+        def fetch():
+            with self.scheduler.acquire() as slot:
+                if self.hedging.applies(len(self.pool.backends)):
+                    body, backend = hedged_call(
+                        self.pool, self.scheduler, self.hedging, agent, self._affinity(options),
+                        lambda b: self._open_attempt(payload, timeout or self.read_timeout, b),
+                        retry_on=(OllamaConnectionError,),
+                        until=cutoff.complete if cutoff else None,
+                    )
+                elif cutoff is not None:
+                    body, backend = self._generate_until(
+                        payload, timeout or self.read_timeout, self._affinity(options), cutoff
+                    )
+                else:
+                    body, backend = self._route(
+                        lambda b: self.post("/api/generate", payload, timeout=timeout, host=b.url),
+                        self._affinity(options),
+                    )
+            if cutoff is not None:
+                body["response"] = cutoff.trim(body.get("response", ""))
+                body.setdefault("model", payload["model"])
+            elapsed = time.time() - start
+            self._cache_store(key, body, elapsed)
+            self.metrics.observe_call(agent, payload["model"], backend.url, self._stats(body), slot.waited, elapsed)
+            return self._result(body, elapsed, backend.url)
+
+        flight_key = self._flight_key(payload, agent, coalesce)
+        if flight_key is None:
+            return fetch()
+        return self.flights.do(flight_key, fetch)
+
+    @staticmethod
+    def _text_cutoff(cutoff: Optional[SectionCutoff], options: dict) -> Optional[SectionCutoff]:
+        """Cutoffs only apply to markdown replies; JSON replies end on their own"""
+        return None if options.get("json_schema") is not None else cutoff
+
+    def _generate_until(self, payload: dict, read_timeout: float, affinity: Optional[str],
+                        cutoff: SectionCutoff) -> tuple:
+        """Stream one generation and close it once cutoff is satisfied; returns (body, backend)"""
+        (chunks, close), backend = self._route(
+            lambda b: self._open_attempt(payload, read_timeout, b), affinity, hold=True
+        )
+        start = time.time()
+        ok = False
+        text = []
+        final = {}
+        first_token_at = None
+        try:
+            for chunk in chunks:
+                token = chunk.get("response", "")
+                text.append(token)
+                if first_token_at is None:
+                    first_token_at = time.time()
+                if chunk.get("done"):
+                    final = chunk
+                elif "\n" in token and cutoff.complete("".join(text)):
+                    # Closed before Ollama's final stats: time the decode ourselves
+                    final = {"model": payload["model"], "done_reason": "cutoff", "eval_count": len(text),
+                             "eval_duration": int((time.time() - first_token_at) * 1e9)}
+                    break
+            ok = True
+        finally:
+            close()
+            self.pool.end(backend, time.time() - start, ok)
+        return {**final, "response": "".join(text)}, backend
+
+    def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        agent: str = "",
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        cutoff: Optional[SectionCutoff] = None,
+        **options
+    ) -> GenerationStream:
+        """
+        Start a streaming generation.
+
+        Returns a GenerationStream; iterate it to receive tokens. The
+        connection is returned to the pool when iteration ends or
+        close() is called. Cache hits replay as a single chunk, and
+        concurrent identical requests subscribe to one shared stream.
+        With a `cutoff` the stream ends (and frees its slot) as soon as
+        every section is complete.
+        """
+        cutoff = self._text_cutoff(cutoff, options)
+        payload = self.build_payload(prompt, stream=True, stop=cutoff.stop if cutoff else None, **options)
+        read_timeout = timeout or self.read_timeout
+        start = time.time()
+        key, body = self._cache_lookup(payload, agent, cache)
+        if body is not None:
+            return self._cached_stream(body, start)
+
+        affinity = self._affinity(options)
+        flight_key = self._flight_key(payload, agent, coalesce)
+        if flight_key is None:
+            chunks, close, host, waited = self._open_stream(payload, read_timeout, affinity)
+            stream = GenerationStream(chunks, host, start, close=close)
+        else:
+            opened = {}
+
+            def opener():
+                chunks, close, opened["host"], opened["waited"] = self._open_stream(payload, read_timeout, affinity)
+                return chunks, close
+
+            chunks = self.flights.stream(flight_key, opener)
+            stream = GenerationStream(chunks, opened.get("host", self.host), start, close=chunks.close)
+            waited = opened.get("waited")
+        stream.cutoff = cutoff
+        self._store_on_done(stream, key, agent, payload["model"], waited)
+        return stream
+
+    def _open_stream(self, payload: dict, read_timeout: float, affinity: Optional[str] = None) -> tuple:
+        """
+        POST a streaming request; returns (chunk_iterator, close_fn, host,
+        seconds waited for the scheduler slot).
+
+        The scheduler slot and the backend lease are held until the
+        stream ends or is closed.
+        """
+        slot = self.scheduler.acquire()
+        try:
+            response, backend = self._route(
+                lambda b: self._post_stream(payload, read_timeout, b), affinity, hold=True
+            )
+        except BaseException:
+            slot.release()
+            raise
+        opened_at = time.time()
+        finished = []
+
+        def finish(ok: bool):
+            if not finished:
+                finished.append(True)
+                self.pool.end(backend, time.time() - opened_at, ok)
+                slot.release()
+
+        def chunks():
+            ok = False
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+                ok = True
+            except requests.exceptions.RequestException as e:
+                raise self._error(e, read_timeout, backend.url) from e
+            finally:
+                finish(ok)
+
+        def close():
+            response.close()
+            finish(True)
+
+        return chunks(), close, backend.url, slot.waited
+
+    def _post_stream(self, payload: dict, read_timeout: float, backend: Backend) -> requests.Response:
+        """Open a streaming /api/generate response on one backend"""
+        try:
+            response = self._session.post(
+                f"{backend.url}/api/generate", json={**payload, "stream": True},
+                timeout=self._timeout(read_timeout), stream=True,
+            )
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException as e:
+            raise self._error(e, read_timeout, backend.url) from e
+
+    def _open_attempt(self, payload: dict, read_timeout: float, backend: Backend) -> tuple:
+        """One copy of a hedged request: (chunk_iterator, close_fn), no slot or pool accounting"""
+        response = self._post_stream(payload, read_timeout, backend)
+
+        def chunks():
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+            except requests.exceptions.RequestException as e:
+                raise self._error(e, read_timeout, backend.url) from e
+
+        return chunks(), lambda: _abort(response)
+
+    def tags(self, timeout: float = 5, host: Optional[str] = None) -> list:
+        """Models installed on a backend (/api/tags)"""
+        return self.get("/api/tags", timeout=timeout, host=host).get("models", [])
+
+    def loaded_models(self, timeout: float = 5, host: Optional[str] = None) -> list:
+        """Models currently resident in memory on a backend (/api/ps)"""
+        return self.get("/api/ps", timeout=timeout, host=host).get("models", [])
+
+    # ------------------------------------------------------------------
+    # Warm-up / keep-alive
+    # ------------------------------------------------------------------
+
+    def warm_up(self, models: Optional[list] = None) -> dict:
+        """
+        Preload models on every reachable backend and pin them with keep_alive.
+
+        Returns {model: load_seconds} (the slowest backend's load time);
+        0.0 means it was already resident everywhere.
+        """
+        models = models or config.WARMUP_MODELS
+        load_times = {model: 0.0 for model in models}
+        reached = 0
+        for backend in self.pool.backends:
+            try:
+                resident = {m.get("name") for m in self.loaded_models(host=backend.url)}
+            except OllamaConnectionError:
+                self.pool.mark_failed(backend)
+                continue
+            reached += 1
+            for model in models:
+                # Always send the load request so keep_alive is refreshed,
+                # but only report a load time for models that were cold
+                start = time.time()
+                body = self.post(
+                    "/api/generate",
+                    {
+                        "model": model,
+                        "keep_alive": self.keep_alive,
+                        "stream": False,
+                        # Load with the context size real calls use, or the first one reloads
+                        "options": {"num_ctx": config.NUM_CTX_MIN},
+                    },
+                    host=backend.url,
+                )
+                if model not in resident:
+                    seconds = body.get("load_duration", 0) / 1e9 or (time.time() - start)
+                    load_times[model] = max(load_times[model], seconds)
+        if not reached:
+            raise OllamaConnectionError(f"Cannot connect to Ollama at {self.host}. Is it running? (ollama serve)")
+        return load_times
+
+    def start_keep_warm(self, interval: Optional[float] = None, models: Optional[list] = None) -> None:
+        """Re-warm models in a background thread for long-running modes"""
+        if self._keep_warm_thread is not None and self._keep_warm_thread.is_alive():
+            return
+        interval = interval or config.KEEP_WARM_INTERVAL
+        self._keep_warm_stop.clear()
+
+        def loop():
+            while not self._keep_warm_stop.wait(interval):
+                try:
+                    self.warm_up(models)
+                except OllamaError:
+                    pass  # Next real call will surface the error
+
+        self._keep_warm_thread = threading.Thread(target=loop, name="ollama-keep-warm", daemon=True)
+        self._keep_warm_thread.start()
+
+    def stop_keep_warm(self) -> None:
+        """Stop the background keep-warm thread"""
+        self._keep_warm_stop.set()
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                ),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    async def apost(self, path: str, payload: dict, timeout: Optional[float] = None, host: Optional[str] = None) -> dict:
+        """Async POST to an Ollama endpoint (primary host by default)"""
+        host = host or self.host
+        read_timeout = timeout or self.read_timeout
+        try:
+            response = await self._async_client().post(
+                f"{host}{path}", json=payload,
+                timeout=httpx.Timeout(read_timeout, connect=self.connect_timeout),
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            raise self._error(e, read_timeout, host) from e
+
+    async def agenerate(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        agent: str = "",
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        cutoff: Optional[SectionCutoff] = None,
+        **options
+    ) -> GenerationResult:
+        """Async counterpart of generate()"""
+        cutoff = self._text_cutoff(cutoff, options)
+        payload = self.build_payload(prompt, stop=cutoff.stop if cutoff else None, **options)
+        start = time.time()
+        key, body = self._cache_lookup(payload, agent, cache)
+        if body is not None:
+            return self._result(body, time.time() - start, "cache", cached=True)
+
+        async def fetch():
+            with await self.scheduler.aacquire() as slot:
+                if self.hedging.applies(len(self.pool.backends)):
+                    body, backend = await ahedged_call(
+                        self.pool, self.scheduler, self.hedging, agent, self._affinity(options),
+                        lambda b: self._aopen_attempt(payload, timeout or self.read_timeout, b),
+                        retry_on=(OllamaConnectionError,),
+                        until=cutoff.complete if cutoff else None,
+                    )
+                elif cutoff is not None:
+                    body, backend = await self._agenerate_until(
+                        payload, timeout or self.read_timeout, self._affinity(options), cutoff
+                    )
+                else:
+                    body, backend = await self._aroute(
+                        lambda b: self.apost("/api/generate", payload, timeout=timeout, host=b.url),
+                        self._affinity(options),
+                    )
+            if cutoff is not None:
+                body["response"] = cutoff.trim(body.get("response", ""))
+                body.setdefault("model", payload["model"])
+            elapsed = time.time() - start
+            self._cache_store(key, body, elapsed)
+            self.metrics.observe_call(agent, payload["model"], backend.url, self._stats(body), slot.waited, elapsed)
+            return self._result(body, elapsed, backend.url)
+
+        flight_key = self._flight_key(payload, agent, coalesce)
+        if flight_key is None:
+            return await fetch()
+        return await self.flights.ado(flight_key, fetch)
+
+    async def _agenerate_until(self, payload: dict, read_timeout: float, affinity: Optional[str],
+                               cutoff: SectionCutoff) -> tuple:
+        """Async counterpart of _generate_until()"""
+        (chunks, aclose), backend = await self._aroute(
+            lambda b: self._aopen_attempt(payload, read_timeout, b), affinity, hold=True
+        )
+        start = time.time()
+        ok = False
+        text = []
+        final = {}
+        first_token_at = None
+        try:
+            async for chunk in chunks:
+                token = chunk.get("response", "")
+                text.append(token)
+                if first_token_at is None:
+                    first_token_at = time.time()
+                if chunk.get("done"):
+                    final = chunk
+                elif "\n" in token and cutoff.complete("".join(text)):
+                    # Closed before Ollama's final stats: time the decode ourselves
+                    final = {"model": payload["model"], "done_reason": "cutoff", "eval_count": len(text),
+                             "eval_duration": int((time.time() - first_token_at) * 1e9)}
+                    break
+            ok = True
+        finally:
+            await aclose()
+            self.pool.end(backend, time.time() - start, ok)
+        return {**final, "response": "".join(text)}, backend
+
+    async def astream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        agent: str = "",
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
+        cutoff: Optional[SectionCutoff] = None,
+        **options
+    ) -> AsyncGenerationStream:
+        """Async counterpart of stream() (iterate with `async for`)"""
+        cutoff = self._text_cutoff(cutoff, options)
+        payload = self.build_payload(prompt, stream=True, stop=cutoff.stop if cutoff else None, **options)
+        read_timeout = timeout or self.read_timeout
+        start = time.time()
+        key, body = self._cache_lookup(payload, agent, cache)
+        if body is not None:
+            return self._cached_stream(body, start, AsyncGenerationStream)
+
+        affinity = self._affinity(options)
+        flight_key = self._flight_key(payload, agent, coalesce)
+        if flight_key is None:
+            chunks, aclose, host, waited = await self._aopen_stream(payload, read_timeout, affinity)
+            stream = AsyncGenerationStream(chunks, host, start, aclose=aclose)
+        else:
+            opened = {}
+
+            async def opener():
+                chunks, aclose, opened["host"], opened["waited"] = await self._aopen_stream(payload, read_timeout, affinity)
+                return chunks, aclose
+
+            chunks = await self.flights.astream(flight_key, opener)
+            stream = AsyncGenerationStream(chunks, opened.get("host", self.host), start, aclose=chunks.aclose)
+            waited = opened.get("waited")
+        stream.cutoff = cutoff
+        self._store_on_done(stream, key, agent, payload["model"], waited)
+        return stream
+
+    async def _aopen_stream(self, payload: dict, read_timeout: float, affinity: Optional[str] = None) -> tuple:
+        """Async counterpart of _open_stream(); returns (chunk_iterator, aclose_fn, host, waited)"""
+        slot = await self.scheduler.aacquire()
+        try:
+            response, backend = await self._aroute(
+                lambda b: self._apost_stream(payload, read_timeout, b), affinity, hold=True
+            )
+        except BaseException:
+            slot.release()
+            raise
+        opened_at = time.time()
+        finished = []
+
+        def finish(ok: bool):
+            if not finished:
+                finished.append(True)
+                self.pool.end(backend, time.time() - opened_at, ok)
+                slot.release()
+
+        async def chunks():
+            ok = False
+            try:
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+                ok = True
+            except httpx.HTTPError as e:
+                raise self._error(e, read_timeout, backend.url) from e
+            finally:
+                finish(ok)
+
+        async def aclose():
+            await response.aclose()
+            finish(True)
+
+        return chunks(), aclose, backend.url, slot.waited
+
+    async def _apost_stream(self, payload: dict, read_timeout: float, backend: Backend) -> httpx.Response:
+        """Async counterpart of _post_stream()"""
+        client = self._async_client()
+        try:
+            request = client.build_request(
+                "POST", f"{backend.url}/api/generate", json={**payload, "stream": True},
+                timeout=httpx.Timeout(read_timeout, connect=self.connect_timeout),
+            )
+            response = await client.send(request, stream=True)
+            response.raise_for_status()
+            return response
+        except httpx.HTTPError as e:
+            raise self._error(e, read_timeout, backend.url) from e
+
+    async def _aopen_attempt(self, payload: dict, read_timeout: float, backend: Backend) -> tuple:
+        """Async counterpart of _open_attempt(): (chunk_iterator, aclose_fn)"""
+        response = await self._apost_stream(payload, read_timeout, backend)
+
+        async def chunks():
+            try:
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+            except httpx.HTTPError as e:
+                raise self._error(e, read_timeout, backend.url) from e
+
+        return chunks(), response.aclose
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def close(self):
+        """Close pooled sync connections"""
+        self.stop_keep_warm()
+        self.pool.close()
+        self._session.close()
+
+    async def aclose(self):
+        """Close the async client bound to the running loop (a later call on the loop opens a new one)"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def __aenter__(self) -> "OllamaClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        # Before asyncio.run() closes the loop, so no connection is left open
+        await self.aclose()
+
+
+_client: Optional[OllamaClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> OllamaClient:
+    """Process-wide shared client (created on first use)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient()
+    return _client
+
+def set_client(client: OllamaClient) -> None:
+    """Replace the shared client (e.g. to point at another host)"""
+    global _client
+    with _client_lock:
+        _client = client
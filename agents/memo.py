@@ -0,0 +1,155 @@
+import asyncio
+import functools
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import xxhash
+from langchain_core.messages import AIMessage
+
+from agents import config
+from agents.console import say
+from agents.context_budget import budget_for
+from agents.response_cache import ResponseCache
+from agents.structured import structured_output_for
+
+# State fields each agent reads (see the Input lines of the agent
+# docstrings). A node is reused when an earlier run of the same coaching
+# session had the same values, model, code and prompts. Draft is left
+# out: within a session the only rerun with an unchanged outline is one
+# asking for a fresh draft.
+NODE_INPUTS = {
+    "research": ("prompt",),
+    "brainstorm": ("prompt", "research_analysis"),
+    "outline": ("prompt", "research_analysis", "selected_idea"),
+    "critique": ("prompt", "essay_draft"),
+}
+
+# Settings that change what a node produces from the same inputs, besides
+# the model, structured output and budget (all part of node_key): every
+# agent's prompt context and window, plus each agent's own switches
+_SHARED_SETTINGS = ("RESEARCH_CONTEXT_TOKENS", "NUM_CTX_MIN", "NUM_CTX_MAX")
+NODE_SETTINGS = {
+    "critique": ("CRITIQUE_SPLIT",),
+}
+
+# Bookkeeping every run records for itself rather than reusing
+_PER_RUN_FIELDS = ("agent_times", "messages")
+
+_AGENTS_DIR = Path(__file__).parent
+
+# Modules every agent's output depends on besides its own: prompt
+# budgets, cutoffs, structured output and how the request is built
+_SHARED_MODULES = ("context_budget.py", "cutoff.py", "structured.py", "llm_client.py", "ollama_helper.py")
+
+
+@functools.lru_cache(maxsize=None)
+def _code_version(node: str) -> str:
+    """Hash of the agent's module, its prompts and the shared modules, so edits to any invalidate it"""
+    digest = xxhash.xxh3_64()
+    for path in (
+        _AGENTS_DIR / f"{node}_agent.py",
+        _AGENTS_DIR / "prompts" / f"{node}.py",
+        _AGENTS_DIR / "prompts" / "shared.py",
+        *(_AGENTS_DIR / module for module in _SHARED_MODULES),
+    ):
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def node_key(node: str, state: dict) -> str:
+    """Content address of one node's inputs within the run's coaching session"""
+    budget = budget_for(node)
+    return ResponseCache.key({
+        "session": state["session_id"],
+        "node": node,
+        "inputs": {field: state.get(field) for field in NODE_INPUTS[node]},
+        "model": config.MODEL,
+        "structured": structured_output_for(node),
+        "settings": {name: getattr(config, name) for name in _SHARED_SETTINGS + NODE_SETTINGS.get(node, ())},
+        "budget": [budget.context, budget.output],
+        "code": _code_version(node),
+    })
+
+
+def memoized(node: str, agent: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    """
+    Wrap an agent so a rerun in the same session reuses its saved output.
+
+    Opt-in (ESSAY_NODE_MEMO=1) and only for runs with a session_id:
+    runs of one student's coaching session share outputs (e.g. picking
+    another brainstorm idea reruns outline onwards), unrelated runs never
+    do, so two students with the same prompt get their own ideas.
+
+    Reused nodes are appended to state['reused_nodes'] and timed at 0s.
+    Only NODE_INPUTS (and NODE_SETTINGS) are compared, so anything else in the state (e.g.
+    user_context, which no agent reads yet) can change freely. Async
+    agents get an async wrapper whose cache I/O runs off the event loop.
+    """
+    if asyncio.iscoroutinefunction(agent):
+        @functools.wraps(agent)
+        async def arun(state: dict) -> dict:
+            if not _enabled(state):
+                return await agent(state)
+            key, reused = await asyncio.to_thread(_lookup, node, state)
+            if reused is not None:
+                return reused
+            start = time.time()
+            update = await agent(state)
+            await asyncio.to_thread(_store, key, update, time.time() - start)
+            return update
+
+        return arun
+
+    @functools.wraps(agent)
+    def run(state: dict) -> dict:
+        if not _enabled(state):
+            return agent(state)
+        key, reused = _lookup(node, state)
+        if reused is not None:
+            return reused
+        start = time.time()
+        update = agent(state)
+        _store(key, update, time.time() - start)
+        return update
+
+    return run
+
+
+def _enabled(state: dict) -> bool:
+    return config.NODE_MEMO_ENABLED and bool(state.get("session_id"))
+
+
+def _lookup(node: str, state: dict) -> tuple:
+    """(key, state update reusing the saved output or None)"""
+    key = node_key(node, state)
+    saved = get_node_cache().get(key)
+    if saved is None:
+        return key, None
+    say(f"\n♻️  {node.capitalize()}: inputs unchanged this session, reusing previous output")
+    return key, {
+        **saved,
+        "agent_times": {node: 0.0},
+        "messages": [AIMessage(content=f"{node.capitalize()} Agent: Reused previous output")],
+        "reused_nodes": [node],
+    }
+
+
+def _store(key: str, update: dict, seconds: float) -> None:
+    get_node_cache().put(key, {k: v for k, v in update.items() if k not in _PER_RUN_FIELDS}, seconds)
+
+
+_node_cache: Optional[ResponseCache] = None
+_node_cache_lock = threading.Lock()
+
+
+def get_node_cache() -> ResponseCache:
+    """Process-wide store of node outputs (separate from the response cache)"""
+    global _node_cache
+    if _node_cache is None:
+        with _node_cache_lock:
+            if _node_cache is None:
+                _node_cache = ResponseCache(path=str(Path(config.CACHE_DIR) / "nodes.sqlite"))
+    return _node_cache
@@ -0,0 +1,275 @@
+import contextlib
+import contextvars
+import os
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional
+
+from agents import config
+
+PREFIX = "essay_llm"
+
+# Histogram bucket upper bounds (+Inf is implied)
+TPS_BUCKETS = (5, 10, 20, 40, 80, 160, 320, 640, 1280, 2560, 5120)
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# Prompts that were (almost) all in the KV cache evaluate a handful of
+# tokens in microseconds; their prefill speed is noise, so it's skipped
+MIN_PREFILL_TOKENS = 32
+
+HISTOGRAMS = {
+    "prefill_tokens_per_second": ("Prompt processing speed per call (Ollama prompt_eval stats)", TPS_BUCKETS),
+    "decode_tokens_per_second": ("Generation speed per call (Ollama eval stats)", TPS_BUCKETS),
+    "queue_wait_seconds": ("Time a call waited for a scheduler slot", SECONDS_BUCKETS),
+    "call_seconds": ("Wall time per call, queueing included", SECONDS_BUCKETS),
+}
+COUNTERS = {
+    "calls_total": "LLM calls sent to a backend",
+    "prompt_tokens_total": "Prompt tokens Ollama evaluated (the cached prefix is not counted)",
+    "output_tokens_total": "Tokens generated",
+    "load_seconds_total": "Time Ollama spent loading models",
+    "cache_hits_total": "Calls answered by the response cache",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+@dataclass
+class CallRecord:
+    """Token counts and timings of one LLM call"""
+    agent: str
+    model: str
+    host: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+    prefill_seconds: Optional[float] = None  # None: not reported (e.g. stopped by a cutoff)
+    decode_seconds: Optional[float] = None
+    load_seconds: float = 0.0
+    queue_wait: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def prefill_tps(self) -> Optional[float]:
+        if self.prefill_seconds and self.prompt_tokens >= MIN_PREFILL_TOKENS:
+            return self.prompt_tokens / self.prefill_seconds
+        return None
+
+    @property
+    def decode_tps(self) -> Optional[float]:
+        if self.decode_seconds and self.output_tokens:
+            return self.output_tokens / self.decode_seconds
+        return None
+
+
+# Calls made by the current run (see MetricsRegistry.collect)
+_run_calls: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("essay_run_calls", default=None)
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                    for k, v in labels.items())
+
+
+class MetricsRegistry:
+    """
+    Per-call LLM metrics, labelled by agent, model and host.
+
+    The client records every call that reaches a backend (observe_call)
+    with the token counts and durations Ollama reports. Export them as
+    Prometheus text (to_prometheus, export to ESSAY_METRICS_FILE, or
+    serve on ESSAY_METRICS_PORT), or wrap a run in collect() to get
+    just that run's calls for a summary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._counters: Dict[tuple, float] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def observe_call(self, agent: str, model: str, host: str, stats: dict,
+                     queue_wait: float = 0.0, elapsed: float = 0.0) -> CallRecord:
+        """Record one call from its Ollama stats (see OllamaClient._stats)"""
+        record = CallRecord(
+            agent=agent or "other", model=model, host=host,
+            prompt_tokens=stats.get("prompt_eval_count", 0),
+            output_tokens=stats.get("eval_count", 0),
+            prefill_seconds=stats["prompt_eval_duration"] / 1e9 if stats.get("prompt_eval_duration") else None,
+            decode_seconds=stats["eval_duration"] / 1e9 if stats.get("eval_duration") else None,
+            load_seconds=stats.get("load_duration", 0) / 1e9,
+            queue_wait=queue_wait,
+            elapsed=elapsed,
+        )
+        labels = (record.agent, record.model, record.host)
+        with self._lock:
+            self._count("calls_total", labels, 1)
+            self._count("prompt_tokens_total", labels, record.prompt_tokens)
+            self._count("output_tokens_total", labels, record.output_tokens)
+            self._count("load_seconds_total", labels, record.load_seconds)
+            if record.prefill_tps is not None:
+                self._observe("prefill_tokens_per_second", labels, record.prefill_tps)
+            if record.decode_tps is not None:
+                self._observe("decode_tokens_per_second", labels, record.decode_tps)
+            self._observe("queue_wait_seconds", labels, queue_wait)
+            self._observe("call_seconds", labels, elapsed)
+        calls = _run_calls.get()
+        if calls is not None:
+            calls.append(record)
+        return record
+
+    def observe_cache_hit(self, agent: str, model: str) -> None:
+        with self._lock:
+            self._count("cache_hits_total", (agent or "other", model, "cache"), 1)
+
+    def _count(self, name: str, labels: tuple, value: float):
+        self._counters[(name, labels)] = self._counters.get((name, labels), 0) + value
+
+    def _observe(self, name: str, labels: tuple, value: float):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram(HISTOGRAMS[name][1])
+        histogram.observe(value)
+
+    @contextlib.contextmanager
+    def collect(self) -> Iterator[List[CallRecord]]:
+        """Collect the calls made inside the block (and the tasks/threads it starts with its context)"""
+        calls = []
+        token = _run_calls.set(calls)
+        try:
+            yield calls
+        finally:
+            _run_calls.reset(token)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, help_text in COUNTERS.items():
+                series = [(labels, value) for (n, labels), value in self._counters.items() if n == name]
+                lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} counter"]
+                for (agent, model, host), value in sorted(series):
+                    lines.append(f"{PREFIX}_{name}{{{_labels(agent=agent, model=model, host=host)}}} {value:g}")
+            for name, (help_text, _) in HISTOGRAMS.items():
+                series = [(labels, h) for (n, labels), h in self._histograms.items() if n == name]
+                lines += [f"# HELP {PREFIX}_{name} {help_text}", f"# TYPE {PREFIX}_{name} histogram"]
+                for (agent, model, host), histogram in sorted(series, key=lambda s: s[0]):
+                    labels = _labels(agent=agent, model=model, host=host)
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{PREFIX}_{name}_bucket{{{labels},le="{bound:g}"}} {count}')
+                    lines.append(f'{PREFIX}_{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"{PREFIX}_{name}_sum{{{labels}}} {histogram.sum:g}")
+                    lines.append(f"{PREFIX}_{name}_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: Optional[str] = None) -> None:
+        """Write the metrics to path (ESSAY_METRICS_FILE by default; no-op if unset)"""
+        path = path or config.METRICS_FILE
+        if not path:
+            return
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)  # Scrapers never see a half-written file
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve /metrics on a background thread"""
+        if self._server is not None:
+            return self._server
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server
+
+
+def summarize(calls: List[CallRecord]) -> dict:
+    """
+    Per-agent totals for one run's calls, and where the time went.
+
+    `time_shares` splits the calls' wall time into queue, model load,
+    prefill, decode and other (network, unreported phases), as fractions.
+    """
+    agents = {}
+    for call in calls:
+        agent = agents.setdefault(call.agent, {
+            "calls": 0, "prompt_tokens": 0, "output_tokens": 0,
+            "prefill_seconds": 0.0, "decode_seconds": 0.0, "load_seconds": 0.0,
+            "queue_wait": 0.0, "elapsed": 0.0, "_prefill_tokens": 0, "_prefill_measured": 0.0, "_decode_tokens": 0,
+        })
+        agent["calls"] += 1
+        agent["prompt_tokens"] += call.prompt_tokens
+        agent["output_tokens"] += call.output_tokens
+        agent["load_seconds"] += call.load_seconds
+        agent["queue_wait"] += call.queue_wait
+        agent["elapsed"] += call.elapsed
+        if call.prefill_seconds:
+            agent["prefill_seconds"] += call.prefill_seconds
+        if call.prefill_tps is not None:
+            agent["_prefill_tokens"] += call.prompt_tokens
+            agent["_prefill_measured"] += call.prefill_seconds
+        if call.decode_seconds:
+            agent["decode_seconds"] += call.decode_seconds
+            agent["_decode_tokens"] += call.output_tokens
+    for agent in agents.values():
+        prefill_tokens, measured = agent.pop("_prefill_tokens"), agent.pop("_prefill_measured")
+        decode_tokens = agent.pop("_decode_tokens")
+        agent["prefill_tps"] = prefill_tokens / measured if measured else None
+        agent["decode_tps"] = decode_tokens / agent["decode_seconds"] if agent["decode_seconds"] else None
+
+    total = sum(a["elapsed"] for a in agents.values())
+    shares = {}
+    if total:
+        for phase, key in (("queue", "queue_wait"), ("load", "load_seconds"),
+                           ("prefill", "prefill_seconds"), ("decode", "decode_seconds")):
+            shares[phase] = sum(a[key] for a in agents.values()) / total
+        shares["other"] = max(0.0, 1 - sum(shares.values()))
+    return {"agents": agents, "time_shares": shares}
+
+
+_registry = MetricsRegistry()
+_serve_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide registry (also starts the /metrics endpoint if ESSAY_METRICS_PORT is set)"""
+    if config.METRICS_PORT and _registry._server is None:
+        with _serve_lock:
+            if _registry._server is None:
+                _registry.serve(config.METRICS_PORT)
+    return _registry
@@ -1,56 +1,166 @@
-import requests
-import time
-from typing import Tuple
-
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL = "llama3.1:8b"
+from typing import Optional, Tuple
+from agents import config
+from agents.context_budget import research_for_context
+from agents.cutoff import SectionCutoff
+from agents.llm_client import get_client, AsyncGenerationStream, GenerationStream
+from agents.prompts.shared import SHARED_PROMPT_TEMPLATE, SHARED_RESEARCH_TEMPLATE
 
 def call_ollama(
     prompt: str, 
     temperature: float = 0.7,
     max_tokens: int = 2000,
-    system_message: str = ""
+    system_message: str = "",
+    shared_prefix: str = "",
+    agent: str = "",
+    cache: Optional[bool] = None,
+    json_schema: Optional[dict] = None,
+    cutoff: Optional[SectionCutoff] = None
 ) -> Tuple[str, float]:
     """
-    Call Ollama API with error handling
+    Call Ollama API through the shared pooled client
+    
+    `shared_prefix` is context shared with other agents of the same run
+    (see shared_context); it is sent first so Ollama reuses its KV cache.
+    `agent` picks the response-cache policy (see response_cache);
+    pass cache=True/False to force it for one call. With json_schema the
+    reply is constrained to that JSON schema (see agents/structured.py).
+    With a cutoff (see agents/cutoff.py) generation stops as soon as
+    every section the agent parses is complete.
     
     Returns:
         (response_text, time_taken_seconds)
     """
-    # Combine system message and prompt
-    if system_message:
-        full_prompt = f"{system_message}\n\n{prompt}"
-    else:
-        full_prompt = prompt
-    
-    payload = {
-        "model": MODEL,
-        "prompt": full_prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "top_p": 0.9,
-            "num_predict": max_tokens
-        }
-    }
+    result = get_client().generate(
+        prompt,
+        system_message=system_message,
+        shared_prefix=shared_prefix,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        agent=agent,
+        cache=cache,
+        json_schema=json_schema,
+        cutoff=cutoff
+    )
+    return result.text, result.elapsed
+
+async def acall_ollama(
+    prompt: str, 
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    system_message: str = "",
+    shared_prefix: str = "",
+    agent: str = "",
+    cache: Optional[bool] = None,
+    json_schema: Optional[dict] = None,
+    cutoff: Optional[SectionCutoff] = None
+) -> Tuple[str, float]:
+    """
+    Async version of call_ollama
     
-    start = time.time()
+    Returns:
+        (response_text, time_taken_seconds)
+    """
+    result = await get_client().agenerate(
+        prompt,
+        system_message=system_message,
+        shared_prefix=shared_prefix,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        agent=agent,
+        cache=cache,
+        json_schema=json_schema,
+        cutoff=cutoff
+    )
+    return result.text, result.elapsed
+
+def stream_ollama(
+    prompt: str, 
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    system_message: str = "",
+    shared_prefix: str = "",
+    agent: str = "",
+    cache: Optional[bool] = None,
+    json_schema: Optional[dict] = None,
+    cutoff: Optional[SectionCutoff] = None
+) -> GenerationStream:
+    """
+    Streaming version of call_ollama
     
-    try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=180)
-        response.raise_for_status()
-        elapsed = time.time() - start
-        
-        result = response.json()
-        return result['response'], elapsed
+    Iterate the returned stream to receive tokens as they arrive; after
+    iteration, stream.text holds the full response and stream.ttft /
+    stream.decode_tps hold time-to-first-token and decode tokens/s.
+    """
+    return get_client().stream(
+        prompt,
+        system_message=system_message,
+        shared_prefix=shared_prefix,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        agent=agent,
+        cache=cache,
+        json_schema=json_schema,
+        cutoff=cutoff
+    )
+
+async def astream_ollama(
+    prompt: str, 
+    temperature: float = 0.7,
+    max_tokens: int = 2000,
+    system_message: str = "",
+    shared_prefix: str = "",
+    agent: str = "",
+    cache: Optional[bool] = None,
+    json_schema: Optional[dict] = None,
+    cutoff: Optional[SectionCutoff] = None
+) -> AsyncGenerationStream:
+    """Async version of stream_ollama (iterate with `async for`)"""
+    return await get_client().astream(
+        prompt,
+        system_message=system_message,
+        shared_prefix=shared_prefix,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        agent=agent,
+        cache=cache,
+        json_schema=json_schema,
+        cutoff=cutoff
+    )
+
+def warm_up(models: Optional[list] = None, verbose: bool = True) -> dict:
+    """
+    Preload the configured model(s) so the first agent of a run does not
+    pay the cold-load time. Load time is reported separately from
+    generation time.
     
-    except requests.exceptions.Timeout:
-        raise Exception("Ollama request timed out (180s). Is the model loaded?")
-    except requests.exceptions.ConnectionError:
-        raise Exception("Cannot connect to Ollama. Is it running? (ollama serve)")
-    except Exception as e:
-        raise Exception(f"Ollama error: {str(e)}")
+    Returns:
+        {model: load_seconds} (0.0 for models that were already resident)
+    """
+    if not config.WARMUP_ENABLED:
+        return {}
+    load_times = get_client().warm_up(models)
+    if verbose:
+        for model, seconds in load_times.items():
+            if seconds:
+                print(f"🔥 Loaded {model} in {seconds:.1f}s (keep_alive={get_client().keep_alive})")
+            else:
+                print(f"🔥 {model} already resident")
+    return load_times
 
 def format_prompt(template: str, **kwargs) -> str:
     """Format a prompt template with variables"""
-    return template.format(**kwargs)
\ No newline at end of file
+    return template.format(**kwargs)
+
+def shared_context(prompt: str, research_analysis: str = "") -> str:
+    """
+    Prefix shared by the agents of one essay run.
+    
+    Every agent starts its prompt with the same essay prompt (and, after
+    research, the same research analysis), byte for byte, so the
+    backend only prefills it once per run. The research analysis is
+    trimmed to its shared token budget first.
+    """
+    parts = [format_prompt(SHARED_PROMPT_TEMPLATE, prompt=prompt)]
+    if research_analysis:
+        parts.append(format_prompt(SHARED_RESEARCH_TEMPLATE, research_analysis=research_for_context(research_analysis)))
+    return "\n\n".join(parts)
\ No newline at end of file
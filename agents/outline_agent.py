@@ -1,5 +1,9 @@
 from agents.state import EssayState
-from agents.ollama_helper import call_ollama, format_prompt
+from agents.console import say
+from agents.context_budget import budget_for, fit_to_budget
+from agents.cutoff import cutoff_for
+from agents.handoff import acall_prefetched, call_prefetched
+from agents.ollama_helper import format_prompt, shared_context
 from agents.prompts.outline import OUTLINE_SYSTEM, OUTLINE_TEMPLATE
 from langchain_core.messages import AIMessage
 import time
@@ -13,36 +17,61 @@ def outline_agent(state: EssayState) -> dict:
     Input: state['prompt'], state['research_analysis'], state['selected_idea']
     Output: state['essay_outline']
     """
-    print("\n" + "="*60)
-    print("📋 AGENT 3: OUTLINE AGENT")
-    print("="*60)
-    print("Creating essay structure...")
+    request = _prepare(state)
     
-    # Format the prompt
+    # Call Ollama
+    start_time = time.time()
+    outline, generation_time = call_prefetched(request)
+    return _finish(state, outline, generation_time, time.time() - start_time)
+
+async def aoutline_agent(state: EssayState) -> dict:
+    """Async version of outline_agent (same request, non-blocking client)"""
+    request = _prepare(state)
+    start_time = time.time()
+    outline, generation_time = await acall_prefetched(request)
+    return _finish(state, outline, generation_time, time.time() - start_time)
+
+def _prepare(state: EssayState) -> dict:
+    """Announce the agent and build its call_ollama arguments"""
+    say("\n" + "="*60)
+    say("📋 AGENT 3: OUTLINE AGENT")
+    say("="*60)
+    say("Creating essay structure...")
+    return outline_request(state)
+
+def outline_request(state: EssayState) -> dict:
+    """
+    call_ollama arguments for the outline of state['selected_idea']
+    
+    Also used by the brainstorm agent to start the outline early in
+    overlap mode (see agents/handoff.py).
+    """
+    # Format the prompt (prompt and research go in the shared prefix)
+    budget = budget_for("outline")
     prompt = format_prompt(
         OUTLINE_TEMPLATE,
-        prompt=state['prompt'],
-        research_analysis=state['research_analysis'],
-        selected_idea=state['selected_idea']
+        selected_idea=fit_to_budget(state['selected_idea'], budget.context, "selected idea")
     )
     
-    # Call Ollama
-    start_time = time.time()
-    outline, generation_time = call_ollama(
+    return dict(
         prompt=prompt,
         system_message=OUTLINE_SYSTEM,
+        shared_prefix=shared_context(state['prompt'], state['research_analysis']),
         temperature=0.6,  # Moderate temperature for structured creativity
-        max_tokens=1500
+        max_tokens=budget.output,
+        agent="outline",
+        cutoff=cutoff_for("outline")
     )
-    total_time = time.time() - start_time
-    
-    print(f"✅ Outline complete ({generation_time:.1f}s)")
-    print(f"   Outline length: {len(outline.split())} words")
+
+def _finish(state: EssayState, outline: str, generation_time: float, total_time: float) -> dict:
+    """Report the result and build the state update"""
+    say(f"✅ Outline complete ({generation_time:.1f}s)")
+    say(f"   Outline length: {len(outline.split())} words")
     
     # Update state
     return {
         "essay_outline": outline,
         "current_agent": "draft",
-        "agent_times": {**state.get("agent_times", {}), "outline": total_time},
+        "agent_times": {"outline": total_time},
         "messages": [AIMessage(content="Outline Agent: Created detailed essay structure")]
     }
\ No newline at end of file
@@ -0,0 +1,218 @@
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Optional
+
+import xxhash
+
+from agents import config
+from agents.context_budget import budget_for
+from agents.research_agent import research_agent
+from agents.response_cache import ResponseCache
+from agents.scheduler import request_priority
+
+# Prompts most runs use: the Common App personal essay prompts and a few
+# common supplements. warm_library precomputes their research analyses.
+KNOWN_PROMPTS = {
+    "common_app_1": "Some students have a background, identity, interest, or talent that is so meaningful they believe their application would be incomplete without it. If this sounds like you, then please share your story.",
+    "common_app_2": "The lessons we take from obstacles we encounter can be fundamental to later success. Recount a time when you faced a challenge, setback, or failure. How did it affect you, and what did you learn from the experience?",
+    "common_app_3": "Reflect on a time when you questioned or challenged a belief or idea. What prompted your thinking? What was the outcome?",
+    "common_app_4": "Reflect on something that someone has done for you that has made you happy or thankful in a surprising way. How has this gratitude affected or motivated you?",
+    "common_app_5": "Discuss an accomplishment, event, or realization that sparked a period of personal growth and a new understanding of yourself or others.",
+    "common_app_6": "Describe a topic, idea, or concept you find so engaging that it makes you lose all track of time. Why does it captivate you? What or who do you turn to when you want to learn more?",
+    "common_app_7": "Share an essay on any topic of your choice. It can be one you've already written, one that responds to a different prompt, or one of your own design.",
+    "why_us": "Why are you interested in attending this college, and what do you hope to study?",
+    "activity": "Briefly elaborate on one of your extracurricular activities or work experiences.",
+    "community": "Describe the world you come from and how you, as a product of it, might add to the diversity of our community.",
+}
+
+# Bumped when the file layout changes (older files are ignored, not migrated)
+LIBRARY_FORMAT = 1
+
+_PROMPTS_DIR = Path(__file__).parent / "prompts"
+_QUOTES = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-"})
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Prompt text as compared by the library: case, quotes and spacing don't matter"""
+    text = unicodedata.normalize("NFKC", prompt).translate(_QUOTES).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+@functools.lru_cache(maxsize=None)
+def template_version() -> str:
+    """
+    Hash of the research prompts, so editing them invalidates every entry.
+
+    Computed once per process, like the templates it describes: they are
+    imported at start-up, so a running process keeps using (and matching)
+    the version it loaded.
+    """
+    digest = xxhash.xxh3_64()
+    for path in (_PROMPTS_DIR / "research.py", _PROMPTS_DIR / "shared.py"):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def library_key(prompt: str) -> str:
+    """Content address of a prompt's research analysis under the current templates and model"""
+    return ResponseCache.key({
+        "prompt": normalize_prompt(prompt),
+        "template": template_version(),
+        "model": config.MODEL,
+        "max_tokens": budget_for("research").output,
+    })
+
+
+class PromptLibrary:
+    """
+    Research analyses precomputed offline for known prompts.
+
+    A JSON file of entries keyed by library_key, each recording the
+    prompt, model and template version it was generated with. Entries
+    written under other templates or another model never match and are
+    dropped by prune() (warm_library prunes before it fills gaps). The
+    file is re-read when it changes on disk, so a running server picks
+    up a fresh warm without restarting.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or config.PROMPT_LIBRARY_PATH)
+        self._lock = threading.Lock()
+        self._entries: dict = {}
+        self._mtime: Optional[float] = None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, prompt: str) -> Optional[dict]:
+        """The entry for prompt under the current templates, or None"""
+        key = library_key(prompt)
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def add(self, prompt: str, research_analysis: str, seconds: float) -> None:
+        with self._lock:
+            self._reload()
+            self._entries[library_key(prompt)] = {
+                "prompt": prompt,
+                "model": config.MODEL,
+                "template_version": template_version(),
+                "research_analysis": research_analysis,
+                "generation_seconds": round(seconds, 2),
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            self._save()
+
+    def prune(self) -> int:
+        """Drop entries from other template versions or models; returns how many"""
+        with self._lock:
+            self._reload()
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry["template_version"] != template_version() or entry["model"] != config.MODEL
+            ]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+            return len(stale)
+
+    def entries(self) -> list:
+        with self._lock:
+            self._reload()
+            return list(self._entries.values())
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def _reload(self):
+        try:
+            mtime = self.path.stat().st_mtime
+        except FileNotFoundError:
+            self._entries, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        self._entries = data.get("entries", {}) if data.get("format") == LIBRARY_FORMAT else {}
+        self._mtime = mtime
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"format": LIBRARY_FORMAT, "entries": self._entries}, f, indent=1, ensure_ascii=False)
+        os.replace(tmp, self.path)  # Readers never see a half-written library
+        self._mtime = self.path.stat().st_mtime
+
+
+def precomputed_research(prompt: str) -> Optional[str]:
+    """The library's research analysis for prompt, or None (also when the library is disabled)"""
+    if not config.PROMPT_LIBRARY_ENABLED:
+        return None
+    entry = get_prompt_library().lookup(prompt)
+    return entry["research_analysis"] if entry else None
+
+
+def warm_library(prompts: Optional[Iterable[str]] = None, concurrency: Optional[int] = None,
+                 library: Optional[PromptLibrary] = None) -> dict:
+    """
+    Precompute the research analysis of every prompt that has no current entry.
+
+    Offline step (run it after deploying or editing agents/prompts/research.py):
+    KNOWN_PROMPTS by default, at batch priority so it yields to students.
+
+    Returns:
+        {"generated": n, "current": n, "pruned": n}
+    """
+    library = library or get_prompt_library()
+    pruned = library.prune()
+    prompts = list(dict.fromkeys(prompts if prompts is not None else KNOWN_PROMPTS.values()))
+    missing = [p for p in prompts if library.lookup(p) is None]
+
+    def generate(prompt: str):
+        start = time.time()
+        update = research_agent({"prompt": prompt})
+        library.add(prompt, update["research_analysis"], time.time() - start)
+
+    with request_priority("batch", tenant="prompt_library"):
+        with ThreadPoolExecutor(concurrency or config.MAX_CONCURRENCY) as pool:
+            # Copy the context so the calls keep the batch priority
+            for future in [pool.submit(contextvars.copy_context().run, generate, p) for p in missing]:
+                future.result()
+    return {"generated": len(missing), "current": len(prompts) - len(missing), "pruned": pruned}
+
+
+_library: Optional[PromptLibrary] = None
+_library_lock = threading.Lock()
+
+
+def get_prompt_library() -> PromptLibrary:
+    """Process-wide prompt library (ESSAY_PROMPT_LIBRARY_PATH)"""
+    global _library
+    if _library is None:
+        with _library_lock:
+            if _library is None:
+                _library = PromptLibrary()
+    return _library
+
+
+def set_prompt_library(library: PromptLibrary) -> None:
+    """Replace the process-wide library (e.g. a scratch file for benchmarks)"""
+    global _library
+    _library = library
@@ -11,12 +11,7 @@ Focus on:
 
 Prefer unique, unexpected angles over obvious choices."""
 
-BRAINSTORM_TEMPLATE = """Based on this prompt and research analysis, generate 5 distinct essay ideas.
-
-PROMPT: {prompt}
-
-RESEARCH INSIGHTS:
-{research_analysis}
+BRAINSTORM_TEMPLATE = """Based on the prompt and research insights above, generate 5 distinct essay ideas.
 
 Generate 5 essay ideas in this format:
 
@@ -35,4 +30,12 @@ Generate 5 essay ideas in this format:
 **Best Idea:** [Which number and why in 2 sentences]
 
 Make ideas SPECIFIC. Instead of "learning to code," say "debugging a neural network at 2 AM and discovering how I handle failure."
-"""
\ No newline at end of file
+"""
+BRAINSTORM_JSON_TEMPLATE = """Based on the prompt and research insights above, generate 5 distinct essay ideas.
+
+Reply with JSON only, no markdown:
+- ideas: 5 objects with title (catchy), core_story (1 sentence - specific scenario/event), why_it_works (2 sentences), growth_arc (1 sentence - what the applicant learned), originality_score (1-10)
+- recommendation: idea_number of the best idea and reason (2 sentences)
+
+Make ideas SPECIFIC. Instead of "learning to code," say "debugging a neural network at 2 AM and discovering how I handle failure."
+"""
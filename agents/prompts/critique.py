@@ -12,9 +12,7 @@ Focus on:
 5. Writing quality and structure
 6. Originality"""
 
-CRITIQUE_TEMPLATE = """Evaluate this college essay with brutal honesty.
-
-ORIGINAL PROMPT: {prompt}
+CRITIQUE_TEMPLATE = """Evaluate this college essay, written for the prompt above, with brutal honesty.
 
 ESSAY:
 {essay}
@@ -50,4 +48,105 @@ Provide critique in this format:
 ## REVISED OPENING PARAGRAPH
 [Write an improved version of the first paragraph]
 
-Be honest. A 5/10 essay should be called a 5/10."""
\ No newline at end of file
+Be honest. A 5/10 essay should be called a 5/10."""
+
+CRITIQUE_JSON_TEMPLATE = """Evaluate this college essay, written for the prompt above, with brutal honesty.
+
+ESSAY:
+{essay}
+
+Reply with JSON only, no markdown:
+- overall_score: integer 1-10
+- assessment: one sentence capturing the essay's core strength or weakness
+- strengths: 3 strengths, each with a specific quote from the text
+- weaknesses: 3 weaknesses, each with a specific quote from the text
+- improvements: concrete suggestions for opening, details, voice and structure
+- college_fit: top_tier (Harvard, Stanford, MIT) and competitive (yes/no and why), best_suited_for
+- revised_opening: an improved version of the first paragraph
+
+Be honest. A 5/10 essay should be called a 5/10."""
+
+# Split critique (ESSAY_CRITIQUE_SPLIT=1): the essay goes in the shared
+# prefix and each part below is a separate, concurrent request. The
+# revised opening only needs the first paragraph, so it gets that alone.
+
+CRITIQUE_ESSAY_TEMPLATE = """ESSAY TO EVALUATE:
+{essay}"""
+
+CRITIQUE_PART_TEMPLATES = {
+    "score": """Evaluate the essay above, written for the essay prompt, with brutal honesty.
+
+Provide your verdict in this format:
+
+## OVERALL SCORE: [X/10]
+
+## ONE-SENTENCE ASSESSMENT
+[Capture the essay's core strength or weakness]
+
+## COLLEGE FIT
+- **Top-tier schools (Harvard, Stanford, MIT):** [Yes/No and why]
+- **Competitive schools:** [Yes/No and why]
+- **Better suited for:** [What kind of schools this essay would work for]
+
+Be honest. A 5/10 essay should be called a 5/10.""",
+    "feedback": """List the strengths and weaknesses of the essay above, quoting the text.
+
+Use this format:
+
+## STRENGTHS (with specific quotes)
+1. [Strength with example from text]
+2. [Strength with example from text]
+3. [Strength with example from text]
+
+## WEAKNESSES (with specific quotes)
+1. [Weakness with example from text]
+2. [Weakness with example from text]
+3. [Weakness with example from text]""",
+    "improvements": """Say what the essay above needs to improve.
+
+Use this format:
+
+## SPECIFIC IMPROVEMENTS NEEDED
+1. **Opening:** [Concrete suggestion]
+2. **Details:** [What needs more specificity]
+3. **Voice:** [How to make more authentic]
+4. **Structure:** [Any pacing/flow issues]""",
+    "opening": """This is the opening paragraph of a college essay written for the prompt above:
+
+{opening}
+
+Rewrite it so it starts in the middle of a moment, with concrete detail and an authentic voice.
+
+Use this format:
+
+## REVISED OPENING PARAGRAPH
+[Write an improved version of the first paragraph]""",
+}
+
+CRITIQUE_PART_JSON_TEMPLATES = {
+    "score": """Evaluate the essay above, written for the essay prompt, with brutal honesty.
+
+Reply with JSON only, no markdown:
+- overall_score: integer 1-10
+- assessment: one sentence capturing the essay's core strength or weakness
+- college_fit: top_tier (Harvard, Stanford, MIT) and competitive (yes/no and why), best_suited_for
+
+Be honest. A 5/10 essay should be called a 5/10.""",
+    "feedback": """List the strengths and weaknesses of the essay above, quoting the text.
+
+Reply with JSON only, no markdown:
+- strengths: 3 strengths, each with a specific quote from the text
+- weaknesses: 3 weaknesses, each with a specific quote from the text""",
+    "improvements": """Say what the essay above needs to improve.
+
+Reply with JSON only, no markdown:
+- improvements: concrete suggestions for opening, details, voice and structure""",
+    "opening": """This is the opening paragraph of a college essay written for the prompt above:
+
+{opening}
+
+Rewrite it so it starts in the middle of a moment, with concrete detail and an authentic voice.
+
+Reply with JSON only, no markdown:
+- revised_opening: an improved version of the first paragraph""",
+}
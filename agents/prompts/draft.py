@@ -23,16 +23,11 @@ AVOID:
 
 Write as if you're telling a close friend a story that changed you."""
 
-DRAFT_TEMPLATE = """Write a complete 650-word college admissions essay.
-
-PROMPT: {prompt}
+DRAFT_TEMPLATE = """Write a complete 650-word college admissions essay for the prompt above, using the research insights as context.
 
 OUTLINE TO FOLLOW:
 {outline}
 
-RESEARCH CONTEXT:
-{research_analysis}
-
 Write the complete essay now. Follow the outline but make it flow naturally. Use specific details, show vulnerability, and maintain an authentic voice throughout.
 
 Start writing:"""
\ No newline at end of file
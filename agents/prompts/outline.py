@@ -11,12 +11,7 @@ Focus on:
 
 Make the outline ACTIONABLE - specific enough that someone could write the essay from it."""
 
-OUTLINE_TEMPLATE = """Create a detailed outline for this college essay.
-
-PROMPT: {prompt}
-
-RESEARCH INSIGHTS:
-{research_analysis}
+OUTLINE_TEMPLATE = """Create a detailed outline for an essay answering the prompt above, guided by the research insights.
 
 SELECTED IDEA:
 {selected_idea}
@@ -11,9 +11,7 @@ Focus on:
 
 Be specific and actionable. Think like an admissions officer."""
 
-RESEARCH_TEMPLATE = """Analyze this college essay prompt in depth:
-
-PROMPT: {prompt}
+RESEARCH_TEMPLATE = """Analyze the college essay prompt above in depth.
 
 Provide your analysis in this format:
 
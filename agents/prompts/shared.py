@@ -0,0 +1,9 @@
+# Context shared by several agents in one essay run. It is placed at the
+# very start of every agent's prompt (before the agent's own system
+# message) so Ollama's prompt cache can reuse the already-prefilled
+# prefix instead of re-processing it for each agent.
+
+SHARED_PROMPT_TEMPLATE = """ESSAY PROMPT: {prompt}"""
+
+SHARED_RESEARCH_TEMPLATE = """RESEARCH INSIGHTS:
+{research_analysis}"""
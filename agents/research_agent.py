@@ -1,5 +1,8 @@
 from agents.state import EssayState
-from agents.ollama_helper import call_ollama, format_prompt
+from agents.console import say
+from agents.context_budget import budget_for
+from agents.cutoff import cutoff_for
+from agents.ollama_helper import acall_ollama, call_ollama, shared_context
 from agents.prompts.research import RESEARCH_SYSTEM, RESEARCH_TEMPLATE
 from langchain_core.messages import AIMessage
 import time
@@ -14,31 +17,50 @@ def research_agent(state: EssayState) -> dict:
     Input: state['prompt']
     Output: state['research_analysis']
     """
-    print("\n" + "="*60)
-    print("🔍 AGENT 1: RESEARCH AGENT")
-    print("="*60)
-    print(f"Analyzing prompt: {state['prompt'][:80]}...")
-    
-    # Format the prompt
-    prompt = format_prompt(RESEARCH_TEMPLATE, prompt=state['prompt'])
+    request = _prepare(state)
     
     # Call Ollama
     start_time = time.time()
-    analysis, generation_time = call_ollama(
+    analysis, generation_time = call_ollama(**request)
+    return _finish(state, analysis, generation_time, time.time() - start_time)
+
+async def aresearch_agent(state: EssayState) -> dict:
+    """Async version of research_agent (same request, non-blocking client)"""
+    request = _prepare(state)
+    start_time = time.time()
+    analysis, generation_time = await acall_ollama(**request)
+    return _finish(state, analysis, generation_time, time.time() - start_time)
+
+def _prepare(state: EssayState) -> dict:
+    """Announce the agent and build its call_ollama arguments"""
+    say("\n" + "="*60)
+    say("🔍 AGENT 1: RESEARCH AGENT")
+    say("="*60)
+    say(f"Analyzing prompt: {state['prompt'][:80]}...")
+    
+    # Format the prompt (the essay prompt itself goes in the shared prefix)
+    prompt = RESEARCH_TEMPLATE
+    budget = budget_for("research")
+    
+    return dict(
         prompt=prompt,
         system_message=RESEARCH_SYSTEM,
+        shared_prefix=shared_context(state['prompt']),
         temperature=0.5,  # Lower temperature for analytical task
-        max_tokens=1500
+        max_tokens=budget.output,
+        agent="research",
+        cutoff=cutoff_for("research")
     )
-    total_time = time.time() - start_time
-    
-    print(f"✅ Research complete ({generation_time:.1f}s)")
-    print(f"   Analysis length: {len(analysis.split())} words")
+
+def _finish(state: EssayState, analysis: str, generation_time: float, total_time: float) -> dict:
+    """Report the result and build the state update"""
+    say(f"✅ Research complete ({generation_time:.1f}s)")
+    say(f"   Analysis length: {len(analysis.split())} words")
     
     # Update state
     return {
         "research_analysis": analysis,
         "current_agent": "brainstorm",
-        "agent_times": {**state.get("agent_times", {}), "research": total_time},
+        "agent_times": {"research": total_time},
         "messages": [AIMessage(content=f"Research Agent: Analyzed prompt, found key insights")]
     }
\ No newline at end of file
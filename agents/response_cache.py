@@ -0,0 +1,153 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import xxhash
+import zstandard
+
+from agents import config
+
+
+class ResponseCache:
+    """
+    Persistent, content-addressed cache of Ollama responses.
+
+    Keys are an xxh3-128 hash of the full request payload (model, prompt,
+    sampling options); values are zstd-compressed JSON. The cache is
+    capped at max_bytes of compressed data and evicts least recently
+    used entries first.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = Path(path or Path(config.CACHE_DIR) / "responses.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else config.CACHE_MAX_BYTES
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                gen_seconds REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._total_bytes = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        # Counters for this process
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        """Content address of a request payload (stream flag excluded)"""
+        request = {k: v for k, v in payload.items() if k != "stream"}
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False)
+        return xxhash.xxh3_128_hexdigest(canonical.encode("utf-8"))
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached response body for key, or None on a miss"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, gen_seconds FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._db.execute(
+                "UPDATE responses SET hits = hits + 1, last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self._db.commit()
+            self.hits += 1
+            self.saved_seconds += row[1]
+        return json.loads(self._decompressor.decompress(row[0]))
+
+    def put(self, key: str, body: dict, gen_seconds: float) -> None:
+        """Store a response body and evict LRU entries beyond the size cap"""
+        value = self._compressor.compress(json.dumps(body).encode("utf-8"))
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, gen_seconds, hits, last_access) "
+                "VALUES (?, ?, ?, ?, 0, ?)",
+                (key, value, len(value), gen_seconds, time.time()),
+            )
+            self._total_bytes += len(value)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (row[0],))
+            self._total_bytes -= row[1]
+
+    def clear(self) -> None:
+        """Drop every cached response"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus lifetime totals"""
+        with self._lock:
+            entries, lifetime_hits, lifetime_saved = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * gen_seconds), 0) "
+                "FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "lifetime_hits": lifetime_hits,
+            "lifetime_saved_seconds": lifetime_saved,
+        }
+
+
+def cache_enabled_for(agent: str) -> bool:
+    """
+    Default cache policy for an agent.
+
+    High-temperature creative agents (brainstorm, draft, generate,
+    improve, compare) bypass the cache so reruns still explore;
+    analytical agents opt in. Override with ESSAY_CACHE_AGENTS.
+    """
+    return config.CACHE_ENABLED and agent in config.CACHE_AGENTS
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> ResponseCache:
+    """Process-wide shared cache (created on first use)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
@@ -0,0 +1,264 @@
+from agents.state import EssayState
+from agents import config
+from agents.console import say
+from agents.context_budget import budget_for, estimate_tokens, fit_to_budget
+from agents.critique_agent import arun_critique, critique_request, parse_critique, run_critique
+from agents.cutoff import cutoff_for
+from agents.ollama_helper import acall_ollama, call_ollama, format_prompt, shared_context
+from agents.prompts.revise import REVISE_SYSTEM, REVISE_ESSAY_TEMPLATE, REVISE_PARAGRAPH_TEMPLATE
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.messages import AIMessage
+from typing import List, Optional
+import asyncio
+import contextvars
+import re
+import time
+
+# Text between double quotes in a weakness ("the most useful thing ...")
+QUOTE_PATTERN = re.compile(r'["“]([^"”]+)["”]')
+
+# Shorter quotes ("I", "it was") match too many paragraphs to be useful
+MIN_QUOTE_WORDS = 3
+
+def wants_revision(state: EssayState) -> bool:
+    """Whether the workflow goes on to the revise loop after critique"""
+    score = state.get('critique_score')
+    return config.REVISE_ENABLED and score is not None and score < config.REVISE_TARGET_SCORE
+
+def revise_agent(state: EssayState) -> dict:
+    """
+    Agent 6: Revise Agent (optional, ESSAY_REVISE=1)
+    
+    Acts on the critique: rewrites only the paragraphs its weaknesses
+    quote, re-scores the essay, and repeats until the target score, a
+    round without improvement, or the token/time budget stops it. The
+    best-scoring version is kept.
+    
+    Input: state['prompt'], state['research_analysis'], state['essay_draft'], state['essay_critique']
+    Output: state['essay_draft'], state['essay_critique'], state['critique_score'], state['revisions']
+    """
+    loop = _prepare(state)
+    
+    while True:
+        requests = loop.next_round()
+        if requests is None:
+            break
+        # The round's paragraphs are rewritten concurrently, one slot each
+        with ThreadPoolExecutor(len(requests)) as pool:
+            futures = {
+                index: pool.submit(contextvars.copy_context().run, call_ollama, **request)
+                for index, request in requests.items()
+            }
+            revised = loop.apply({index: future.result() for index, future in futures.items()})
+        loop.rescored(*run_critique(critique_request(revised)))
+    return _finish(state, loop)
+
+async def arevise_agent(state: EssayState) -> dict:
+    """Async version of revise_agent (same requests, non-blocking client)"""
+    loop = _prepare(state)
+    while True:
+        requests = loop.next_round()
+        if requests is None:
+            break
+        replies = await asyncio.gather(*(acall_ollama(**request) for request in requests.values()))
+        revised = loop.apply(dict(zip(requests, replies)))
+        loop.rescored(*await arun_critique(critique_request(revised)))
+    return _finish(state, loop)
+
+class RevisionLoop:
+    """
+    State of one revise loop: the best version so far and what it cost.
+    
+    next_round() decides whether to go on and builds the rewrite
+    requests; apply() splices the rewritten paragraphs into the essay;
+    rescored() takes the new critique and keeps the version if it
+    scored higher. Spend is counted in estimated output tokens (the
+    rewrites plus each re-score) and wall time since the loop started.
+    """
+
+    def __init__(self, state: EssayState):
+        self.state = state
+        self.best = {
+            "essay_draft": state['essay_draft'],
+            "essay_critique": state['essay_critique'],
+            "critique_score": state['critique_score'],
+            "critique_details": state.get('critique_details') or {},
+        }
+        self.rounds: List[dict] = []
+        self.tokens = 0
+        self.stop_reason: Optional[str] = None
+        self.started = time.time()
+        self._round: Optional[dict] = None
+
+    def next_round(self) -> Optional[dict]:
+        """{part index: call_ollama arguments} for the next round, or None to stop"""
+        score = self.best['critique_score']
+        if score is None:
+            return self._stop("the critique has no score")
+        if score >= config.REVISE_TARGET_SCORE:
+            return self._stop(f"reached {config.REVISE_TARGET_SCORE}/10")
+        if self.stop_reason:
+            return None
+        if len(self.rounds) >= config.REVISE_MAX_ROUNDS:
+            return self._stop(f"{config.REVISE_MAX_ROUNDS} rounds")
+        
+        parts = split_paragraphs(self.best['essay_draft'])
+        targets = quoted_paragraphs(parts, weaknesses(self.best['essay_critique'], self.best['critique_details']))
+        targets = dict(list(targets.items())[:config.REVISE_MAX_PARAGRAPHS])
+        if not targets:
+            return self._stop("no weakness quotes a paragraph")
+        
+        # Stop before a round that would overrun the budget, not after it
+        cost = sum(estimate_tokens(parts[i]) for i in targets) + estimate_tokens(self.best['essay_critique'])
+        if self.tokens + cost > config.REVISE_TOKEN_BUDGET:
+            return self._stop(f"token budget ({self.tokens} of {config.REVISE_TOKEN_BUDGET} used)")
+        last_round = self.rounds[-1]['seconds'] if self.rounds else 0.0
+        if time.time() - self.started + last_round > config.REVISE_TIME_BUDGET:
+            return self._stop(f"time budget ({config.REVISE_TIME_BUDGET:.0f}s)")
+        
+        budget = budget_for("revise")
+        essay_prefix = "\n\n".join([
+            shared_context(self.state['prompt'], self.state.get('research_analysis', "")),
+            format_prompt(REVISE_ESSAY_TEMPLATE, essay=fit_to_budget(self.best['essay_draft'], budget.context, "essay"))
+        ])
+        numbers = paragraph_numbers(parts)
+        self._round = {"parts": parts, "numbers": [numbers[i] for i in targets], "start": time.time()}
+        say(f"   Round {len(self.rounds) + 1}: rewriting paragraph(s) {', '.join(map(str, self._round['numbers']))}")
+        return {
+            index: dict(
+                prompt=format_prompt(
+                    REVISE_PARAGRAPH_TEMPLATE,
+                    number=numbers[index],
+                    paragraph=parts[index].strip(),
+                    weaknesses="\n".join(f"- {w}" for w in quoted),
+                    words=len(parts[index].split())
+                ),
+                system_message=REVISE_SYSTEM,
+                shared_prefix=essay_prefix,
+                temperature=0.7,
+                max_tokens=min(budget.output, 2 * estimate_tokens(parts[index]) + 64),
+                agent="revise",
+                cutoff=cutoff_for("revise")
+            )
+            for index, quoted in targets.items()
+        }
+
+    def apply(self, replies: dict) -> dict:
+        """State with the rewritten paragraphs, ready to be re-scored"""
+        parts = list(self._round['parts'])
+        for index, (reply, _) in replies.items():
+            self.tokens += estimate_tokens(reply)
+            parts[index] = revised_paragraph(reply) or parts[index]
+        self._round['essay'] = "".join(parts)
+        return {**self.state, "essay_draft": self._round['essay']}
+
+    def rescored(self, critique: str, generation_time: float) -> None:
+        self.tokens += estimate_tokens(critique)
+        critique, score, details = parse_critique(critique)
+        kept = score is not None and score > self.best['critique_score']
+        self.rounds.append({
+            "round": len(self.rounds) + 1,
+            "paragraphs": self._round['numbers'],
+            "score": score,
+            "kept": kept,
+            "seconds": time.time() - self._round['start'],
+        })
+        say(f"   Round {len(self.rounds)}: {self.best['critique_score']}/10 → {score}/10"
+              f" ({'kept' if kept else 'discarded'})")
+        if kept:
+            self.best = {
+                "essay_draft": self._round['essay'],
+                "essay_critique": critique,
+                "critique_score": score,
+                "critique_details": details,
+            }
+        else:
+            self._stop("no improvement")
+
+    def _stop(self, reason: str) -> None:
+        self.stop_reason = self.stop_reason or reason
+        return None
+
+def split_paragraphs(essay: str) -> List[str]:
+    """Essay split into paragraphs and the blank lines between them ("".join restores it)"""
+    return re.split(r"(\n[ \t]*\n)", essay)
+
+def paragraph_numbers(parts: List[str]) -> dict:
+    """{part index: 1-based paragraph number} for the non-empty paragraphs of split_paragraphs"""
+    indices = [i for i in range(0, len(parts), 2) if parts[i].strip()]
+    return {index: number for number, index in enumerate(indices, 1)}
+
+def weaknesses(critique: str, details: dict) -> List[str]:
+    """The critique's weaknesses (structured field, or the markdown WEAKNESSES list)"""
+    if details.get('weaknesses'):
+        return list(details['weaknesses'])
+    section = re.search(
+        r"^#{1,6}\s*\**\s*WEAKNESSES[^\n]*\n(.*?)(?=^#{1,6} |\Z)", critique, re.IGNORECASE | re.MULTILINE | re.DOTALL
+    )
+    if section is None:
+        return []
+    return [item.strip() for item in re.findall(r"^\s*(?:\d+[.)]|[-*])\s+(.+)$", section.group(1), re.MULTILINE)]
+
+def _words(text: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9']+", text.casefold().replace("’", "'")))
+
+def quoted_paragraphs(parts: List[str], weaknesses: List[str]) -> dict:
+    """
+    {part index: weaknesses quoting it}, most-criticised paragraph first
+    
+    A quote matches a paragraph when its words appear there in order
+    (case and punctuation ignored); quotes elided with "..." match on
+    each fragment. Titles and headings are never rewritten.
+    """
+    paragraphs = {
+        i: f" {_words(parts[i])} " for i in paragraph_numbers(parts)
+        if not parts[i].strip().startswith("#")
+    }
+    targets = {}
+    for weakness in weaknesses:
+        for quote in QUOTE_PATTERN.findall(weakness):
+            for fragment in re.split(r"\.\.\.|…", quote):
+                words = _words(fragment)
+                if len(words.split()) < MIN_QUOTE_WORDS:
+                    continue
+                for index, text in paragraphs.items():
+                    if f" {words} " in text and weakness not in targets.setdefault(index, []):
+                        targets[index].append(weakness)
+    targets = {index: quoted for index, quoted in targets.items() if quoted}
+    return dict(sorted(targets.items(), key=lambda item: (-len(item[1]), item[0])))
+
+def revised_paragraph(reply: str) -> str:
+    """The paragraph from a '## REVISED PARAGRAPH' reply ("" if there is none)"""
+    heading = re.search(r"^#{1,6}\s*\**\s*REVISED PARAGRAPH\**[^\n]*$", reply, re.IGNORECASE | re.MULTILINE)
+    body = reply[heading.end():] if heading else reply
+    for paragraph in re.split(r"\n[ \t]*\n", body):
+        paragraph = paragraph.strip().strip('"“”').strip()
+        if paragraph and not paragraph.startswith("#"):
+            return paragraph
+    return ""
+
+def _prepare(state: EssayState) -> RevisionLoop:
+    """Announce the agent and start the loop"""
+    say("\n" + "="*60)
+    say("✏️  AGENT 6: REVISE AGENT")
+    say("="*60)
+    say(f"Revising weak paragraphs (target {config.REVISE_TARGET_SCORE}/10, "
+          f"budget {config.REVISE_TOKEN_BUDGET} tokens / {config.REVISE_TIME_BUDGET:.0f}s)...")
+    return RevisionLoop(state)
+
+def _finish(state: EssayState, loop: RevisionLoop) -> dict:
+    """Report the result and build the state update"""
+    total_time = time.time() - loop.started
+    before, after = state['critique_score'], loop.best['critique_score']
+    
+    say(f"✅ Revision complete ({total_time:.1f}s): {before}/10 → {after}/10 "
+          f"in {len(loop.rounds)} round(s), stopped: {loop.stop_reason}")
+    
+    # Update state
+    return {
+        **loop.best,
+        "revisions": loop.rounds,
+        "current_agent": "complete",
+        "agent_times": {"revise": total_time},
+        "messages": [AIMessage(content=f"Revise Agent: {len(loop.rounds)} round(s), score {before} → {after}")]
+    }
\ No newline at end of file
@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from typing import Iterable, List, Optional
+
+import requests
+import xxhash
+
+from agents import config
+
+
+class Backend:
+    """One Ollama endpoint and its live load/health/latency stats"""
+
+    def __init__(self, url: str):
+        self.url = config._host_url(url)
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.ewma_latency: Optional[float] = None
+        self.latencies = deque(maxlen=500)
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.time() >= self.ejected_until
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "url": self.url,
+            "healthy": self.available,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ewma": self.ewma_latency,
+            "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        }
+
+
+class BackendPool:
+    """
+    Routes requests across several Ollama hosts.
+
+    - Least-outstanding-requests balancing (ties broken by EWMA latency)
+    - Optional affinity: requests sharing a prompt prefix prefer the same
+      host (rendezvous hashing) so its KV cache can be reused, as long as
+      that host is not busier than the least-loaded one by more than
+      `affinity_slack`
+    - Background /api/tags health probes; failed hosts are ejected for
+      `eject_seconds` and callers fail over to the next host immediately
+    """
+
+    def __init__(
+        self,
+        hosts: Optional[Iterable[str]] = None,
+        probe_interval: Optional[float] = None,
+        eject_seconds: Optional[float] = None,
+        affinity_slack: int = 1,
+    ):
+        self.backends: List[Backend] = [Backend(h) for h in (hosts or config.OLLAMA_HOSTS)]
+        self.probe_interval = probe_interval or config.HEALTH_INTERVAL
+        self.eject_seconds = eject_seconds or config.EJECT_SECONDS
+        self.affinity_slack = affinity_slack
+        self._lock = threading.Lock()
+        self._probe_session = requests.Session()
+        self._probe_thread: Optional[threading.Thread] = None
+        self._probe_stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Selection
+    # ------------------------------------------------------------------
+
+    def pick(self, exclude: Iterable[Backend] = (), affinity: Optional[str] = None) -> Optional[Backend]:
+        """
+        Choose a backend for the next request, or None if every backend
+        has been excluded. Ejected hosts are only used when no healthy
+        host is left.
+        """
+        self._ensure_health_checks()
+        exclude = set(id(b) for b in exclude)
+        with self._lock:
+            candidates = [b for b in self.backends if id(b) not in exclude]
+            if not candidates:
+                return None
+            healthy = [b for b in candidates if b.available] or candidates
+
+            least = min(healthy, key=lambda b: (b.outstanding, b.ewma_latency or 0.0))
+            if affinity and len(healthy) > 1:
+                preferred = max(
+                    healthy, key=lambda b: xxhash.xxh64_intdigest(f"{b.url}|{affinity}")
+                )
+                if preferred.outstanding <= least.outstanding + self.affinity_slack:
+                    return preferred
+            return least
+
+    def begin(self, backend: Backend) -> None:
+        """Count a request as outstanding on backend"""
+        with self._lock:
+            backend.outstanding += 1
+            backend.requests += 1
+
+    def end(self, backend: Backend, elapsed: float, ok: bool = True) -> None:
+        """Finish an outstanding request and record its latency"""
+        with self._lock:
+            backend.outstanding -= 1
+            if ok:
+                backend.consecutive_failures = 0
+                backend.latencies.append(elapsed)
+                if backend.ewma_latency is None:
+                    backend.ewma_latency = elapsed
+                else:
+                    backend.ewma_latency = 0.8 * backend.ewma_latency + 0.2 * elapsed
+            else:
+                backend.errors += 1
+
+    def mark_failed(self, backend: Backend) -> None:
+        """Eject a backend after a connection failure"""
+        with self._lock:
+            backend.consecutive_failures += 1
+            backend.ejected_until = time.time() + self.eject_seconds
+
+    # ------------------------------------------------------------------
+    # Health checks
+    # ------------------------------------------------------------------
+
+    def probe(self) -> None:
+        """Probe every backend's /api/tags once and update health"""
+        for backend in self.backends:
+            try:
+                response = self._probe_session.get(
+                    f"{backend.url}/api/tags", timeout=(config.CONNECT_TIMEOUT, 5)
+                )
+                healthy = response.status_code == 200
+            except requests.exceptions.RequestException:
+                healthy = False
+            with self._lock:
+                backend.healthy = healthy
+                if healthy:
+                    backend.ejected_until = 0.0
+
+    def _ensure_health_checks(self) -> None:
+        # A single host has nowhere to fail over to, so don't bother probing
+        if len(self.backends) < 2 or self._probe_thread is not None:
+            return
+        with self._lock:
+            if self._probe_thread is not None:
+                return
+            self._probe_thread = threading.Thread(
+                target=self._probe_loop, name="ollama-health", daemon=True
+            )
+            self._probe_thread.start()
+
+    def _probe_loop(self) -> None:
+        while not self._probe_stop.wait(self.probe_interval):
+            self.probe()
+
+    def close(self) -> None:
+        """Stop health checks"""
+        self._probe_stop.set()
+        self._probe_session.close()
+
+    def stats(self) -> list:
+        """Per-host health, load and latency"""
+        with self._lock:
+            return [b.stats() for b in self.backends]
@@ -0,0 +1,244 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Optional
+
+from agents import config
+
+# Lower number = served first
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+
+_request_class = contextvars.ContextVar("essay_request_class", default=("normal", "default"))
+
+def set_request_priority(priority: str, tenant: str = "default") -> None:
+    """Set the priority class/tenant for LLM calls made from the current context"""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+    _request_class.set((priority, tenant))
+
+@contextmanager
+def request_priority(priority: str, tenant: str = "default"):
+    """
+    Run a block of LLM calls under a priority class and tenant.
+
+    Example:
+        with request_priority("batch", tenant="test_suite"):
+            run_test_suite()
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+    token = _request_class.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _request_class.reset(token)
+
+def current_request_class() -> tuple:
+    """(priority, tenant) of the current context"""
+    return _request_class.get()
+
+
+class _Waiter:
+    """A queued request; grant() hands it a slot (thread or event loop)"""
+
+    def __init__(self, priority: str, tenant: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.time()
+        self.granted = False
+        self._loop = loop
+        if loop is None:
+            self._event = threading.Event()
+        else:
+            self._future = loop.create_future()
+
+    def grant(self):
+        self.granted = True
+        if self._loop is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self._future.done():
+            self._future.set_result(None)
+
+
+class Slot:
+    """A held concurrency slot; release() is idempotent"""
+
+    def __init__(self, scheduler: "RequestScheduler", priority: str, tenant: str, waited: float):
+        self.priority = priority
+        self.tenant = tenant
+        self.waited = waited
+        self._scheduler = scheduler
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._scheduler._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class RequestScheduler:
+    """
+    Admission control in front of Ollama.
+
+    At most max_concurrency requests run at once (match it to the
+    server's OLLAMA_NUM_PARALLEL so requests queue here, where priority
+    is honoured, rather than FIFO inside Ollama). Waiting requests are
+    served strictly by priority class; within a class, tenants are served
+    round-robin so one tenant's burst cannot starve another.
+    `interactive_reserve` slots are never given to batch requests.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, interactive_reserve: Optional[int] = None):
+        self.max_concurrency = max_concurrency or config.MAX_CONCURRENCY
+        self.interactive_reserve = (
+            config.INTERACTIVE_RESERVE if interactive_reserve is None else interactive_reserve
+        )
+        self.active = 0
+        self._lock = threading.Lock()
+        # priority -> OrderedDict(tenant -> deque of waiters), rotated for fairness
+        self._queues = {p: OrderedDict() for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=1000) for p in PRIORITIES}
+        self._granted = {p: 0 for p in PRIORITIES}
+
+    # ------------------------------------------------------------------
+    # Acquire / release
+    # ------------------------------------------------------------------
+
+    def acquire(self, priority: Optional[str] = None, tenant: Optional[str] = None) -> Slot:
+        """Block until a slot is free for this request; use as a context manager"""
+        waiter = self._enqueue(priority, tenant, loop=None)
+        waiter._event.wait()
+        return self._slot(waiter)
+
+    async def aacquire(self, priority: Optional[str] = None, tenant: Optional[str] = None) -> Slot:
+        """Async counterpart of acquire() (does not block the event loop)"""
+        waiter = self._enqueue(priority, tenant, loop=asyncio.get_running_loop())
+        try:
+            await waiter._future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._remove(waiter)
+                    raise
+            # Granted while being cancelled: give the slot back
+            self._release()
+            raise
+        return self._slot(waiter)
+
+    def try_acquire(self, priority: Optional[str] = None, tenant: Optional[str] = None) -> Optional[Slot]:
+        """
+        Take a slot only if one is free and nobody is queued, else None.
+
+        For speculative work (hedged requests) that must never delay
+        real requests.
+        """
+        default_priority, default_tenant = current_request_class()
+        priority = priority or default_priority
+        with self._lock:
+            limit = self.max_concurrency - (self.interactive_reserve if priority == "batch" else 0)
+            if self.active >= limit or any(self._queues[p] for p in PRIORITIES):
+                return None
+            self.active += 1
+        return Slot(self, priority, tenant or default_tenant, 0.0)
+
+    def _enqueue(self, priority: Optional[str], tenant: Optional[str], loop) -> _Waiter:
+        default_priority, default_tenant = current_request_class()
+        waiter = _Waiter(priority or default_priority, tenant or default_tenant, loop)
+        with self._lock:
+            self._queues[waiter.priority].setdefault(waiter.tenant, deque()).append(waiter)
+            self._dispatch()
+        return waiter
+
+    def _slot(self, waiter: _Waiter) -> Slot:
+        waited = time.time() - waiter.enqueued_at
+        with self._lock:
+            self._waits[waiter.priority].append(waited)
+            self._granted[waiter.priority] += 1
+        return Slot(self, waiter.priority, waiter.tenant, waited)
+
+    def _remove(self, waiter: _Waiter):
+        tenants = self._queues[waiter.priority]
+        queue = tenants.get(waiter.tenant)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del tenants[waiter.tenant]
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the best waiting requests (lock held)"""
+        while self.active < self.max_concurrency:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self.active += 1
+            waiter.grant()
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for priority in sorted(PRIORITIES, key=PRIORITIES.get):
+            if priority == "batch" and self.active >= self.max_concurrency - self.interactive_reserve:
+                continue
+            tenants = self._queues[priority]
+            if not tenants:
+                continue
+            # Round-robin: serve the tenant at the front, then move it to the back
+            tenant, queue = next(iter(tenants.items()))
+            waiter = queue.popleft()
+            del tenants[tenant]
+            if queue:
+                tenants[tenant] = queue
+            return waiter
+        return None
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Active slots, queue depth and recent wait times per priority class"""
+        with self._lock:
+            classes = {}
+            for priority in PRIORITIES:
+                waits = sorted(self._waits[priority])
+                classes[priority] = {
+                    "queued": sum(len(q) for q in self._queues[priority].values()),
+                    "granted": self._granted[priority],
+                    "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                    "wait_p95": waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    "wait_max": waits[-1] if waits else 0.0,
+                }
+            return {
+                "active": self.active,
+                "max_concurrency": self.max_concurrency,
+                "classes": classes,
+            }
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> RequestScheduler:
+    """Process-wide scheduler shared by every LLM call"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RequestScheduler()
+    return _scheduler
@@ -0,0 +1,402 @@
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional
+
+
+class _Call:
+    """One in-flight (sync) call that followers wait on"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class _Broadcast:
+    """
+    Fans one upstream chunk iterator out to many subscribers.
+
+    Chunks are buffered so a subscriber that joins late still replays the
+    stream from the start. There is no pump thread: whichever subscriber
+    runs out of buffered chunks pulls the next one from upstream.
+    """
+
+    def __init__(self, on_finish: Callable[[], None]):
+        self.chunks = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._cond = threading.Condition()
+        self._pumping = False
+        self._source: Optional[Iterator[dict]] = None
+        self._close_source = None
+        self._opened = threading.Event()
+        self._on_finish = on_finish
+
+    def open(self, opener: Callable[[], tuple]) -> None:
+        try:
+            self._source, self._close_source = opener()
+        except BaseException as e:
+            self._finish(error=e)
+        finally:
+            self._opened.set()
+
+    def _finish(self, error: Optional[BaseException] = None):
+        with self._cond:
+            if self.finished:
+                return
+            self.finished = True
+            self.error = error
+            self._cond.notify_all()
+        self._on_finish()
+
+    def join(self) -> bool:
+        """Count a new subscriber; False if every earlier one already left (start a new stream)"""
+        with self._cond:
+            if self.abandoned:
+                return False
+            self.subscribers += 1
+            return True
+
+    def subscribe(self) -> "_Subscription":
+        """Chunk iterator for a subscriber counted by join(); close() releases it"""
+        return _Subscription(self)
+
+    def _replay(self) -> Iterator[dict]:
+        self._opened.wait()
+        index = 0
+        while True:
+            with self._cond:
+                while True:
+                    if index < len(self.chunks):
+                        chunk = self.chunks[index]
+                        index += 1
+                        break
+                    if self.finished:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    if not self._pumping:
+                        self._pumping = True
+                        chunk = None
+                        break
+                    self._cond.wait()
+            if chunk is not None:
+                yield chunk
+                continue
+            self._pump_one()
+
+    def _pump_one(self):
+        try:
+            chunk = next(self._source)
+        except StopIteration:
+            with self._cond:
+                self._pumping = False
+            self._finish()
+            return
+        except BaseException as e:
+            with self._cond:
+                self._pumping = False
+            self._finish(error=e)
+            return
+        with self._cond:
+            self.chunks.append(chunk)
+            self._pumping = False
+            self._cond.notify_all()
+
+    def _unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+            abandoned = self.abandoned = self.subscribers == 0 and not self.finished
+        if abandoned:
+            # Nobody is listening any more: stop the upstream generation
+            if self._close_source is not None:
+                self._close_source()
+            self._finish(error=RuntimeError("Shared stream closed by all subscribers"))
+
+
+class _AsyncBroadcast:
+    """asyncio counterpart of _Broadcast"""
+
+    def __init__(self, on_finish: Callable[[], None]):
+        self.chunks = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.abandoned = False
+        self._cond = asyncio.Condition()
+        self._pumping = False
+        self._source: Optional[AsyncIterator[dict]] = None
+        self._close_source = None
+        self._opened = asyncio.Event()
+        self._on_finish = on_finish
+
+    async def open(self, opener: Callable[[], Awaitable[tuple]]) -> None:
+        try:
+            self._source, self._close_source = await opener()
+        except BaseException as e:
+            await self._finish(error=e)
+        finally:
+            self._opened.set()
+
+    async def _finish(self, error: Optional[BaseException] = None):
+        async with self._cond:
+            if self.finished:
+                return
+            self.finished = True
+            self.error = error
+            self._cond.notify_all()
+        self._on_finish()
+
+    def join(self) -> bool:
+        """Count a new subscriber; False if every earlier one already left (start a new stream)"""
+        if self.abandoned:
+            return False
+        self.subscribers += 1
+        return True
+
+    def subscribe(self) -> "_AsyncSubscription":
+        """Chunk iterator for a subscriber counted by join(); aclose() releases it"""
+        return _AsyncSubscription(self)
+
+    async def _replay(self) -> AsyncIterator[dict]:
+        await self._opened.wait()
+        index = 0
+        while True:
+            async with self._cond:
+                while True:
+                    if index < len(self.chunks):
+                        chunk = self.chunks[index]
+                        index += 1
+                        break
+                    if self.finished:
+                        if self.error is not None:
+                            raise self.error
+                        return
+                    if not self._pumping:
+                        self._pumping = True
+                        chunk = None
+                        break
+                    await self._cond.wait()
+            if chunk is not None:
+                yield chunk
+                continue
+            await self._pump_one()
+
+    async def _pump_one(self):
+        try:
+            chunk = await self._source.__anext__()
+        except StopAsyncIteration:
+            self._pumping = False
+            await self._finish()
+            return
+        except BaseException as e:
+            self._pumping = False
+            await self._finish(error=e)
+            return
+        async with self._cond:
+            self.chunks.append(chunk)
+            self._pumping = False
+            self._cond.notify_all()
+
+    async def _unsubscribe(self):
+        self.subscribers -= 1
+        self.abandoned = self.subscribers == 0 and not self.finished
+        if self.abandoned:
+            if self._close_source is not None:
+                await self._close_source()
+            await self._finish(error=RuntimeError("Shared stream closed by all subscribers"))
+
+
+class _Subscription:
+    """
+    One subscriber's view of a _Broadcast.
+
+    The subscriber is counted from join(), not from the first next(), so
+    a follower that hasn't started reading keeps the stream alive; close()
+    releases it exactly once, whether or not it was ever iterated.
+    """
+
+    def __init__(self, broadcast: _Broadcast):
+        self._broadcast = broadcast
+        self._chunks = broadcast._replay()
+        self._closed = False
+
+    def __iter__(self) -> "_Subscription":
+        return self
+
+    def __next__(self) -> dict:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._chunks.close()
+        self._broadcast._unsubscribe()
+
+
+class _AsyncSubscription:
+    """asyncio counterpart of _Subscription"""
+
+    def __init__(self, broadcast: _AsyncBroadcast):
+        self._broadcast = broadcast
+        self._chunks = broadcast._replay()
+        self._closed = False
+
+    def __aiter__(self) -> "_AsyncSubscription":
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return await self._chunks.__anext__()
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        await self._chunks.aclose()
+        await self._broadcast._unsubscribe()
+
+
+# Result a cancelled leader leaves for its followers: retry, one of them leads
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests.
+
+    The first caller for a key (the leader) does the work; callers that
+    arrive while it is in flight wait and receive the same result, or
+    subscribe to the same token stream. Keys are dropped as soon as the
+    call finishes, so this never serves stale results (that is the
+    response cache's job).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._async_calls = {}
+        self._async_streams = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], object]):
+        """Run fn once for all concurrent callers with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stream(self, key: str, opener: Callable[[], tuple]) -> Iterator[dict]:
+        """
+        Subscribe to the shared chunk stream for key.
+
+        opener() is called once, by the leader, and must return
+        (chunk_iterator, close_fn) for the upstream response.
+        """
+        with self._lock:
+            broadcast = self._streams.get(key)
+            # Counted before returning, so the stream outlives a leader that closes early
+            leader = broadcast is None or not broadcast.join()
+            if leader:
+                broadcast = self._streams[key] = _Broadcast(
+                    on_finish=lambda: self._drop(self._streams, key, broadcast)
+                )
+                broadcast.join()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            broadcast.open(opener)
+            if broadcast.error is not None:
+                raise broadcast.error
+        return broadcast.subscribe()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[object]]):
+        """Async counterpart of do() (coalesces within one event loop)"""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        future = self._async_calls.get(loop_key)
+        if future is not None:
+            self.coalesced += 1
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                return result
+            # The leader's caller gave up (e.g. a hedge it lost), not the call
+            return await self.ado(key, fn)
+
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[loop_key] = future
+        self.leaders += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # Don't cancel the followers with it: they retry
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._async_calls[loop_key]
+
+    async def astream(self, key: str, opener: Callable[[], Awaitable[tuple]]) -> AsyncIterator[dict]:
+        """Async counterpart of stream()"""
+        loop_key = (id(asyncio.get_running_loop()), key)
+        broadcast = self._async_streams.get(loop_key)
+        leader = broadcast is None or not broadcast.join()
+        if leader:
+            broadcast = self._async_streams[loop_key] = _AsyncBroadcast(
+                on_finish=lambda: self._drop(self._async_streams, loop_key, broadcast)
+            )
+            broadcast.join()
+            self.leaders += 1
+            await broadcast.open(opener)
+            if broadcast.error is not None:
+                raise broadcast.error
+        else:
+            self.coalesced += 1
+        return broadcast.subscribe()
+
+    def _drop(self, table: dict, key, broadcast) -> None:
+        with self._lock:
+            if table.get(key) is broadcast:
+                del table[key]
+
+    def stats(self) -> dict:
+        """How many upstream calls were made vs. served by coalescing"""
+        return {"leaders": self.leaders, "coalesced": self.coalesced}
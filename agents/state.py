@@ -1,7 +1,12 @@
 from typing import TypedDict, Annotated, List, Optional
 from langchain_core.messages import BaseMessage
+from agents import config
 import operator
 
+def append_bounded(log: list, entries: list) -> list:
+    """Reducer for the message log: append, keeping the latest config.MAX_STATE_MESSAGES"""
+    return (log + entries)[-config.MAX_STATE_MESSAGES:]
+
 class EssayState(TypedDict):
     """
     State that flows through all agents.
@@ -10,16 +15,25 @@ class EssayState(TypedDict):
     # Input from user
     prompt: str
     user_context: Optional[str]  # Optional background about the student
+    session_id: Optional[str]   # Coaching session: its runs may reuse each other's agent outputs
     
     # Agent outputs (populated as workflow progresses)
     research_analysis: str      # Research Agent output
     brainstorm_ideas: List[str] # Brainstorm Agent output (5 ideas)
     selected_idea: str          # Which idea was chosen
+    idea_choice: Optional[int]  # Idea number the student picked (None: brainstorm's recommendation)
     essay_outline: str          # Outline Agent output
     essay_draft: str            # Draft Agent output (the actual essay)
     essay_critique: str         # Critique Agent output
     
+    # Typed results (filled from structured JSON output when enabled)
+    idea_details: List[dict]    # Brainstorm ideas as dicts (title, core_story, ...)
+    critique_score: Optional[int]  # Overall score out of 10, None if it couldn't be parsed
+    critique_details: dict      # Critique fields (strengths, weaknesses, ...)
+    revisions: List[dict]       # Revise loop rounds (paragraphs rewritten, new score, kept)
+    
     # Metadata
     current_agent: str          # Which agent is currently working
-    agent_times: dict           # Track how long each agent takes
-    messages: Annotated[List[BaseMessage], operator.add]  # Agent communication log
\ No newline at end of file
+    agent_times: Annotated[dict, operator.or_]  # How long each agent took (each agent writes only its own entry)
+    reused_nodes: Annotated[List[str], operator.add]  # Agents whose previous output was reused
+    messages: Annotated[List[BaseMessage], append_bounded]  # Agent communication log (latest entries only)
\ No newline at end of file
@@ -0,0 +1,163 @@
+import json
+import re
+from typing import Optional
+
+from agents import config
+
+# JSON schemas passed as Ollama's `format`, which constrains decoding so the
+# reply always parses (no markdown scaffolding for the model to get wrong)
+
+BRAINSTORM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "ideas": {
+            "type": "array",
+            "minItems": 5,
+            "maxItems": 5,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "core_story": {"type": "string"},
+                    "why_it_works": {"type": "string"},
+                    "growth_arc": {"type": "string"},
+                    "originality_score": {"type": "integer", "minimum": 1, "maximum": 10},
+                },
+                "required": ["title", "core_story", "why_it_works", "growth_arc", "originality_score"],
+            },
+        },
+        "recommendation": {
+            "type": "object",
+            "properties": {
+                "idea_number": {"type": "integer", "minimum": 1, "maximum": 5},
+                "reason": {"type": "string"},
+            },
+            "required": ["idea_number", "reason"],
+        },
+    },
+    "required": ["ideas", "recommendation"],
+}
+
+CRITIQUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": {"type": "integer", "minimum": 1, "maximum": 10},
+        "assessment": {"type": "string"},
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "weaknesses": {"type": "array", "items": {"type": "string"}},
+        "improvements": {
+            "type": "object",
+            "properties": {
+                "opening": {"type": "string"},
+                "details": {"type": "string"},
+                "voice": {"type": "string"},
+                "structure": {"type": "string"},
+            },
+            "required": ["opening", "details", "voice", "structure"],
+        },
+        "college_fit": {
+            "type": "object",
+            "properties": {
+                "top_tier": {"type": "string"},
+                "competitive": {"type": "string"},
+                "best_suited_for": {"type": "string"},
+            },
+            "required": ["top_tier", "competitive", "best_suited_for"],
+        },
+        "revised_opening": {"type": "string"},
+    },
+    "required": [
+        "overall_score", "assessment", "strengths", "weaknesses",
+        "improvements", "college_fit", "revised_opening",
+    ],
+}
+
+# Fields of each request when the critique is split into concurrent parts
+# (ESSAY_CRITIQUE_SPLIT=1); merged, they make up CRITIQUE_SCHEMA
+CRITIQUE_PARTS = {
+    "score": ("overall_score", "assessment", "college_fit"),
+    "feedback": ("strengths", "weaknesses"),
+    "improvements": ("improvements",),
+    "opening": ("revised_opening",),
+}
+
+CRITIQUE_PART_SCHEMAS = {
+    part: {
+        "type": "object",
+        "properties": {field: CRITIQUE_SCHEMA["properties"][field] for field in fields},
+        "required": list(fields),
+    }
+    for part, fields in CRITIQUE_PARTS.items()
+}
+
+
+def structured_output_for(agent: str) -> bool:
+    """Whether an agent asks for schema-constrained JSON (ESSAY_STRUCTURED_AGENTS)"""
+    return agent in config.STRUCTURED_AGENTS
+
+
+def parse_structured(text: str, schema: dict) -> Optional[dict]:
+    """
+    Decode a structured reply, or None if it is not usable.
+
+    Only the top-level required keys are checked; Ollama already
+    enforces the full schema while decoding, so a failure here means
+    the output was cut short (num_predict) rather than malformed.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or any(key not in data for key in schema.get("required", ())):
+        return None
+    return data
+
+
+def parse_score(critique: str) -> Optional[int]:
+    """Overall score from a markdown critique ('## OVERALL SCORE: [7/10]', '- Score: 7/10')"""
+    match = re.search(r"SCORE[:\s]*\[?\s*(\d+)\s*/\s*10", critique, re.IGNORECASE)
+    return int(match.group(1)) if match else None
+
+
+def render_idea(number: int, idea: dict) -> str:
+    """One brainstorm idea in the markdown layout the text mode produces"""
+    return (
+        f"## IDEA {number}: {idea['title']}\n"
+        f"**Core Story:** {idea['core_story']}\n"
+        f"**Why It Works:** {idea['why_it_works']}\n"
+        f"**Growth Arc:** {idea['growth_arc']}\n"
+        f"**Originality Score:** {idea['originality_score']}\n"
+    )
+
+
+def render_critique(critique: dict) -> str:
+    """A structured critique as the markdown report the text mode produces"""
+    improvements = critique["improvements"]
+    fit = critique["college_fit"]
+    lines = [
+        f"## OVERALL SCORE: {critique['overall_score']}/10",
+        "",
+        "## ONE-SENTENCE ASSESSMENT",
+        critique["assessment"],
+        "",
+        "## STRENGTHS (with specific quotes)",
+        *(f"{i}. {s}" for i, s in enumerate(critique["strengths"], 1)),
+        "",
+        "## WEAKNESSES (with specific quotes)",
+        *(f"{i}. {w}" for i, w in enumerate(critique["weaknesses"], 1)),
+        "",
+        "## SPECIFIC IMPROVEMENTS NEEDED",
+        f"1. **Opening:** {improvements['opening']}",
+        f"2. **Details:** {improvements['details']}",
+        f"3. **Voice:** {improvements['voice']}",
+        f"4. **Structure:** {improvements['structure']}",
+        "",
+        "## COLLEGE FIT",
+        f"- **Top-tier schools (Harvard, Stanford, MIT):** {fit['top_tier']}",
+        f"- **Competitive schools:** {fit['competitive']}",
+        f"- **Better suited for:** {fit['best_suited_for']}",
+        "",
+        "## REVISED OPENING PARAGRAPH",
+        critique["revised_opening"],
+    ]
+    return "\n".join(lines) + "\n"
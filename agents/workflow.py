@@ -1,78 +1,456 @@
+import asyncio
+import contextvars
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Iterator, Optional
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
 from agents.state import EssayState
-from agents.research_agent import research_agent
-from agents.brainstorm_agent import brainstorm_agent
-from agents.outline_agent import outline_agent
-from agents.draft_agent import draft_agent
-from agents.critique_agent import critique_agent
+from agents.research_agent import research_agent, aresearch_agent
+from agents.brainstorm_agent import brainstorm_agent, abrainstorm_agent
+from agents.outline_agent import outline_agent, aoutline_agent
+from agents.draft_agent import draft_agent, adraft_agent
+from agents.critique_agent import critique_agent, acritique_agent
+from agents.revise_agent import revise_agent, arevise_agent, wants_revision
+from agents.console import quiet, say
+from agents.checkpoints import get_checkpointer, new_thread_id, storage_report, thread_config
+from agents.handoff import claiming, run_scope
+from agents.llm_client import get_client
+from agents.memo import memoized
+from agents.metrics import get_metrics, summarize
+from agents.prompt_library import precomputed_research
+from agents.response_cache import get_cache
+from agents.ollama_helper import warm_up
+from agents import config
 
-def create_essay_workflow():
+def select_idea(state: EssayState) -> dict:
+    """
+    Swap in the idea the student picked, if any.
+    
+    Kept out of the brainstorm agent so that picking another idea in
+    the same session reuses the memoized brainstorm (the same five
+    ideas) and only reruns outline onwards.
+    """
+    choice = state.get("idea_choice")
+    ideas = state["brainstorm_ideas"]
+    if not choice:
+        return {}
+    if not 1 <= choice <= len(ideas):
+        say(f"⚠️  Idea {choice} doesn't exist ({len(ideas)} ideas), keeping the recommendation")
+        return {}
+    say(f"\n👉 Using idea {choice} (student's choice)")
+    return {"selected_idea": ideas[choice - 1].strip()}
+
+def _entry_node(state: EssayState) -> str:
+    """Skip research when the prompt library already supplied the analysis"""
+    return "brainstorm" if state.get("research_analysis") else "research"
+
+def _after_critique(state: EssayState) -> str:
+    """Go on to the revise loop when it is enabled and the score is below target"""
+    return "revise" if wants_revision(state) else END
+
+def _agent_node(name: str, agent, aagent) -> RunnableLambda:
+    """Memoized agent node: `agent` under invoke, `aagent` under ainvoke"""
+    return RunnableLambda(
+        claiming(name, memoized(name, agent)), afunc=claiming(name, memoized(name, aagent)), name=name
+    )
+
+def create_essay_workflow(checkpointer=None):
     """
     Create the complete 5-agent essay generation workflow.
     
-    Flow: Research → Brainstorm → Outline → Draft → Critique → End
+    Flow: Research → Brainstorm → (select idea) → Outline → Draft → Critique → (Revise) → End
+    
+    Runs whose prompt is in the prompt library (agents/prompt_library.py)
+    start with its precomputed research analysis and enter at Brainstorm.
+    
+    With ESSAY_NODE_MEMO=1, agents are memoized per session on the state
+    fields they read (agents/memo.py), so a rerun in the same session
+    with an edited input only recomputes what it affects.
+    
+    With a checkpointer the state is saved after every agent, per
+    thread id, so a failed run can be resumed (resume_essay_generation).
+    
+    The same compiled graph runs synchronously (invoke) or on the
+    event loop with the async agents and client (ainvoke).
+    
+    With ESSAY_OVERLAP=1 the graph stays linear but an agent may start
+    its generation while the previous one is still streaming (see
+    agents/handoff.py); the node then just collects the result.
     """
     # Create the graph
     workflow = StateGraph(EssayState)
     
     # Add all 5 agents as nodes
-    workflow.add_node("research", research_agent)
-    workflow.add_node("brainstorm", brainstorm_agent)
-    workflow.add_node("outline", outline_agent)
-    workflow.add_node("draft", draft_agent)
-    workflow.add_node("critique", critique_agent)
+    workflow.add_node("research", _agent_node("research", research_agent, aresearch_agent))
+    workflow.add_node("brainstorm", _agent_node("brainstorm", brainstorm_agent, abrainstorm_agent))
+    workflow.add_node("select", select_idea)
+    workflow.add_node("outline", _agent_node("outline", outline_agent, aoutline_agent))
+    # Not memoized: a rerun with the same outline is asking for a fresh draft
+    workflow.add_node("draft", RunnableLambda(draft_agent, afunc=adraft_agent, name="draft"))
+    workflow.add_node("critique", _agent_node("critique", critique_agent, acritique_agent))
+    # Not memoized: its result depends on the loop's target and budget as well as its inputs
+    workflow.add_node("revise", RunnableLambda(revise_agent, afunc=arevise_agent, name="revise"))
     
     # Define the flow (linear for now)
     workflow.add_edge("research", "brainstorm")
-    workflow.add_edge("brainstorm", "outline")
+    workflow.add_edge("brainstorm", "select")
+    workflow.add_edge("select", "outline")
     workflow.add_edge("outline", "draft")
     workflow.add_edge("draft", "critique")
-    workflow.add_edge("critique", END)
+    workflow.add_conditional_edges("critique", _after_critique, ["revise", END])
+    workflow.add_edge("revise", END)
     
-    # Set the entry point
-    workflow.set_entry_point("research")
+    # Set the entry point (research is skipped when it was precomputed)
+    workflow.set_conditional_entry_point(_entry_node, ["research", "brainstorm"])
     
     # Compile and return
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+@lru_cache(maxsize=None)
+def _compiled_workflow(checkpointer=None):
+    """The workflow compiled once per checkpointer and shared by every run"""
+    return create_essay_workflow(checkpointer)
 
-def run_essay_generation(prompt: str, user_context: str = None) -> dict:
+def _invoke(app, state, thread_id: str = None, verbose: bool = True) -> dict:
     """
-    Convenience function to run the full workflow.
-    
-    Args:
-        prompt: The college essay prompt
-        user_context: Optional context about the student
+    Run (state) or continue (None) the workflow, saving progress under thread_id.
     
-    Returns:
-        Final state with all agent outputs
+    verbose=False silences the agents' progress (see agents/console.py).
     """
-    # Create the workflow
-    app = create_essay_workflow()
-    
-    # Initial state
-    initial_state = {
+    try:
+        with run_scope(), quiet(not verbose):
+            return app.invoke(state, thread_config(thread_id) if thread_id else None)
+    except BaseException:
+        if thread_id:
+            print(f"\n💾 Progress saved. Resume with: python essay_cli.py resume {thread_id}")
+        raise
+    finally:
+        get_metrics().export()
+
+async def _ainvoke(app, state, thread_id: str = None, verbose: bool = True) -> dict:
+    """Async counterpart of _invoke"""
+    try:
+        with run_scope(), quiet(not verbose):
+            return await app.ainvoke(state, thread_config(thread_id) if thread_id else None)
+    except BaseException:
+        if thread_id:
+            print(f"\n💾 Progress saved. Resume with: python essay_cli.py resume {thread_id}")
+        raise
+    finally:
+        get_metrics().export()
+
+def _initial_state(prompt: str, user_context: str = None, idea: int = None, session_id: str = None) -> dict:
+    """State a new run starts from (with the research analysis if the prompt library has it)"""
+    research = precomputed_research(prompt)
+    if research:
+        say(f"\n📚 Research: precomputed analysis from the prompt library")
+    return {
         "prompt": prompt,
         "user_context": user_context,
-        "research_analysis": "",
+        "session_id": session_id,
+        "research_analysis": research or "",
         "brainstorm_ideas": [],
         "selected_idea": "",
+        "idea_choice": idea,
         "essay_outline": "",
         "essay_draft": "",
         "essay_critique": "",
-        "current_agent": "research",
-        "agent_times": {},
-        "messages": []
+        "idea_details": [],
+        "critique_score": None,
+        "critique_details": {},
+        "revisions": [],
+        "current_agent": "brainstorm" if research else "research",
+        "agent_times": {"research": 0.0} if research else {},
+        "reused_nodes": [],
+        "messages": [AIMessage(content="Research Agent: Loaded precomputed analysis")] if research else []
     }
+
+def run_essay_generation(
+    prompt: str,
+    user_context: str = None,
+    thread_id: str = None,
+    idea: int = None,
+    session_id: str = None,
+) -> dict:
+    """
+    Convenience function to run the full workflow.
+    
+    Args:
+        prompt: The college essay prompt
+        user_context: Optional context about the student
+        thread_id: Checkpoint id for this run (a new one by default)
+        idea: Brainstorm idea number to write about instead of the recommended one
+        session_id: Coaching session the run belongs to; with ESSAY_NODE_MEMO=1
+            it reuses agent outputs from earlier runs of the session
+    
+    Returns:
+        Final state with all agent outputs
+    """
+    # Create the workflow
+    checkpointer = get_checkpointer()
+    app = _compiled_workflow(checkpointer)
+    if checkpointer is None:
+        thread_id = None
+    elif thread_id is None:
+        thread_id = new_thread_id()
     
     # Run the workflow
     print("\n" + "="*70)
     print(" ESSAY MENTOR AI - MULTI-AGENT ESSAY GENERATION")
     print("="*70)
     print(f"\nPrompt: {prompt}\n")
+    if thread_id:
+        print(f"🧵 Run id: {thread_id}")
+    
+    # Initial state
+    initial_state = _initial_state(prompt, user_context, idea, session_id)
     
-    final_state = app.invoke(initial_state)
+    # Load the model before the first agent so its time isn't billed to research
+    load_times = warm_up()
+    
+    with get_metrics().collect() as calls:
+        final_state = _invoke(app, initial_state, thread_id)
+    _print_summary(final_state, load_times, thread_id, calls)
+    return final_state
+
+# Per event loop: the semaphore bounding concurrent runs and the shared warm-up
+_run_slots = weakref.WeakKeyDictionary()
+_warm_ups = weakref.WeakKeyDictionary()
+
+async def _warm_up_once() -> dict:
+    """Warm up once per event loop; concurrent runs wait for the same warm-up"""
+    loop = asyncio.get_running_loop()
+    warming = _warm_ups.get(loop)
+    if warming is None or (warming.done() and not warming.cancelled() and warming.exception()):
+        # First run on this loop, or the last attempt failed: (re)try
+        warming = _warm_ups[loop] = asyncio.ensure_future(asyncio.to_thread(warm_up))
+    return await asyncio.shield(warming)
+
+async def arun_essay_generation(
+    prompt: str,
+    user_context: str = None,
+    thread_id: str = None,
+    idea: int = None,
+    verbose: bool = True,
+    session_id: str = None,
+) -> dict:
+    """
+    Async version of run_essay_generation.
+    
+    Runs the same graph with ainvoke, so many essays can share one event
+    loop and the pooled async client instead of a thread each. At most
+    config.MAX_ACTIVE_RUNS run at once per loop (the rest wait); the
+    scheduler still decides how many LLM requests are in flight.
+    verbose=False skips the banner, the agents' progress and the summary.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _run_slots.get(loop)
+    if slots is None:
+        slots = _run_slots[loop] = asyncio.Semaphore(config.MAX_ACTIVE_RUNS)
+    
+    async with slots:
+        checkpointer = get_checkpointer()
+        app = _compiled_workflow(checkpointer)
+        if checkpointer is None:
+            thread_id = None
+        elif thread_id is None:
+            thread_id = new_thread_id()
+        
+        if verbose:
+            print("\n" + "="*70)
+            print(" ESSAY MENTOR AI - MULTI-AGENT ESSAY GENERATION")
+            print("="*70)
+            print(f"\nPrompt: {prompt}\n")
+            if thread_id:
+                print(f"🧵 Run id: {thread_id}")
+        
+        load_times = await _warm_up_once()
+        with get_metrics().collect() as calls:
+            final_state = await _ainvoke(
+                app, _initial_state(prompt, user_context, idea, session_id), thread_id, verbose
+            )
+        if verbose:
+            _print_summary(final_state, load_times, thread_id, calls)
+        return final_state
+
+@dataclass
+class BatchResult:
+    """One essay of a batch run (see run_essay_generation_batch)"""
+    index: int                    # Position in the prompts passed in
+    prompt: str
+    state: Optional[dict] = None  # Final state, None if the run failed
+    error: Optional[Exception] = None
+    elapsed: float = 0.0
+    thread_id: Optional[str] = None  # Checkpoint id: finish a failed run with `essay_cli.py resume`
+    llm: dict = field(default_factory=dict)  # The run's LLM calls (agents.metrics.summarize)
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+def run_essay_generation_batch(
+    prompts: Iterable[str],
+    concurrency: int = None,
+    user_context: str = None,
+    session_id: str = None,
+    verbose: bool = False,
+) -> Iterator[BatchResult]:
+    """
+    Run the workflow for many prompts, yielding results as they finish.
+    
+    The graph is compiled and the model warmed up once; every run
+    shares the client, caches and checkpointer. Results arrive in
+    completion order (BatchResult.index gives the input position), and
+    a failed run is yielded with its error instead of stopping the
+    batch. `concurrency` defaults to the scheduler's slot count, enough
+    runs to keep every backend slot busy. LLM calls keep the caller's
+    request priority (e.g. request_priority("batch")). The runs are
+    unrelated unless given a session_id (see run_essay_generation).
+    Runs are quiet unless verbose=True: concurrent runs' agent progress
+    interleaves.
+    """
+    prompts = list(prompts)
+    checkpointer = get_checkpointer()
+    app = _compiled_workflow(checkpointer)
+    warm_up()
+    
+    def run_one(index: int, prompt: str) -> BatchResult:
+        thread_id = new_thread_id() if checkpointer is not None else None
+        start = time.time()
+        state, error = None, None
+        with get_metrics().collect() as calls:
+            try:
+                state = _invoke(
+                    app, _initial_state(prompt, user_context, session_id=session_id), thread_id, verbose
+                )
+            except Exception as e:
+                error = e
+        return BatchResult(index, prompt, state, error, time.time() - start, thread_id, summarize(calls))
+    
+    workers = max(1, min(concurrency or config.MAX_CONCURRENCY, len(prompts)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="essay-batch") as pool:
+        # Each run gets a copy of the caller's context (request priority)
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_one, index, prompt)
+            for index, prompt in enumerate(prompts)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Consumer stopped early: don't start the runs still queued
+            for future in futures:
+                future.cancel()
+
+async def arun_essay_generation_batch(
+    prompts: Iterable[str],
+    concurrency: int = None,
+    user_context: str = None,
+    session_id: str = None,
+    verbose: bool = False,
+) -> AsyncIterator[BatchResult]:
+    """
+    Async version of run_essay_generation_batch, on the running event loop.
+    
+    The shared client's connections stay open for other users of the
+    loop; to close them with the batch, run it inside `async with client`.
+    """
+    prompts = list(prompts)
+    checkpointer = get_checkpointer()
+    app = _compiled_workflow(checkpointer)
+    await _warm_up_once()
+    slots = asyncio.Semaphore(max(1, concurrency or config.MAX_CONCURRENCY))
+    
+    async def run_one(index: int, prompt: str) -> BatchResult:
+        async with slots:
+            thread_id = new_thread_id() if checkpointer is not None else None
+            start = time.time()
+            state, error = None, None
+            with get_metrics().collect() as calls:
+                try:
+                    state = await _ainvoke(
+                        app, _initial_state(prompt, user_context, session_id=session_id), thread_id, verbose
+                    )
+                except Exception as e:
+                    error = e
+            return BatchResult(index, prompt, state, error, time.time() - start, thread_id, summarize(calls))
+    
+    tasks = [asyncio.ensure_future(run_one(index, prompt)) for index, prompt in enumerate(prompts)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Let cancelled runs release their streams before returning
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+def resume_essay_generation(thread_id: str) -> dict:
+    """
+    Continue a checkpointed run from the agent that failed or was interrupted.
+    
+    Agents that already finished are not rerun; their saved output is
+    used as is. A run that already completed is returned unchanged.
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        raise ValueError("Checkpoints are disabled (ESSAY_CHECKPOINTS=0)")
+    app = _compiled_workflow(checkpointer)
+    snapshot = app.get_state(thread_config(thread_id))
+    if not snapshot.values:
+        raise ValueError(f"No saved run with id '{thread_id}'")
+    if not snapshot.next:
+        print(f"✅ Run {thread_id} already completed")
+        return snapshot.values
     
-    # Print summary
+    print("\n" + "="*70)
+    print(" ESSAY MENTOR AI - RESUMING RUN")
+    print("="*70)
+    print(f"\nPrompt: {snapshot.values['prompt']}")
+    print(f"🧵 Run id: {thread_id}")
+    done = ", ".join(snapshot.values.get("agent_times", {})) or "none"
+    print(f"♻️  Reusing: {done} | Continuing at: {', '.join(snapshot.next)}\n")
+    
+    load_times = warm_up()
+    with get_metrics().collect() as calls:
+        final_state = _invoke(app, None, thread_id)
+    _print_summary(final_state, load_times, thread_id, calls)
+    return final_state
+
+def list_runs(limit: int = 20) -> list:
+    """
+    Most recent checkpointed runs, newest first.
+    
+    Each entry has thread_id, prompt, next (agents still to run; empty
+    when complete) and saved_at.
+    """
+    checkpointer = get_checkpointer()
+    if checkpointer is None:
+        return []
+    # A run writes one checkpoint per agent plus its input
+    latest = {}
+    for saved in checkpointer.list(None, limit=limit * 8):
+        latest.setdefault(saved.config["configurable"]["thread_id"], saved)
+    
+    app = _compiled_workflow(checkpointer)
+    runs = []
+    for thread_id, saved in list(latest.items())[:limit]:
+        snapshot = app.get_state(thread_config(thread_id))
+        runs.append({
+            "thread_id": thread_id,
+            "prompt": snapshot.values.get("prompt", ""),
+            "next": snapshot.next,
+            "saved_at": saved.checkpoint["ts"],
+        })
+    return runs
+
+def _print_summary(final_state: dict, load_times: dict, thread_id: str = None, calls: list = ()):
+    """Timings, LLM call metrics, word count, cache/hedging stats and state/checkpoint size for a finished run"""
     print("\n" + "="*70)
     print(" WORKFLOW COMPLETE - SUMMARY")
     print("="*70)
@@ -80,10 +458,45 @@ def run_essay_generation(prompt: str, user_context: str = None) -> dict:
     total_time = sum(final_state['agent_times'].values())
     
     print(f"\n⏱️  Total Time: {total_time:.1f}s")
+    if any(load_times.values()):
+        print(f"🔥 Model load (not included above): {sum(load_times.values()):.1f}s")
     print(f"\n📊 Agent Timings:")
     for agent, time_taken in final_state['agent_times'].items():
         print(f"   - {agent.capitalize()}: {time_taken:.1f}s")
+    if final_state.get('reused_nodes'):
+        print(f"♻️  Reused (inputs unchanged): {', '.join(final_state['reused_nodes'])}")
+    
+    llm = summarize(list(calls))
+    if llm['agents']:
+        print(f"\n🔬 LLM calls (prompt → output tokens, prefill / decode tok/s, queue, load):")
+        for agent, stats in llm['agents'].items():
+            prefill = f"{stats['prefill_tps']:.0f}" if stats['prefill_tps'] else "–"
+            decode = f"{stats['decode_tps']:.0f}" if stats['decode_tps'] else "–"
+            print(f"   - {agent.capitalize()}: {stats['prompt_tokens']} → {stats['output_tokens']} tok, "
+                  f"{prefill} / {decode} tok/s, queue {stats['queue_wait']:.1f}s, load {stats['load_seconds']:.1f}s")
+        print("   Time split: " + " | ".join(f"{phase} {share:.0%}" for phase, share in llm['time_shares'].items()))
     
     print(f"\n📝 Essay Word Count: {len(final_state['essay_draft'].split())} words")
+    revisions = final_state.get('revisions')
+    if revisions:
+        kept = [r for r in revisions if r['kept']]
+        print(f"✏️  Revised: {len(revisions)} round(s), {sum(len(r['paragraphs']) for r in kept)} paragraph(s) rewritten, "
+              f"score now {final_state['critique_score']}/10")
+    
+    if config.CACHE_ENABLED:
+        cache_stats = get_cache().stats()
+        print(f"💾 Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+              f"({cache_stats['saved_seconds']:.1f}s of generation saved)")
+    
+    if config.HEDGE_ENABLED:
+        for agent, hedge_stats in get_client().hedging.stats().items():
+            if hedge_stats['hedged']:
+                print(f"🪁 {agent.capitalize()}: hedged {hedge_stats['hedged']}/{hedge_stats['requests']} "
+                      f"requests, backup won {hedge_stats['hedge_wins']} "
+                      f"(threshold {hedge_stats['threshold']:.1f}s)")
     
-    return final_state
\ No newline at end of file
+    storage = storage_report(thread_id, final_state)
+    if storage:
+        print(f"🗄️  State: {storage['state_bytes'] / 1024:.0f} KB in memory | "
+              f"checkpoints: {storage['snapshots']} snapshots, {storage['checkpoint_bytes'] / 1024:.1f} KB "
+              f"+ {storage['blob_bytes'] / 1024:.1f} KB of shared text")
\ No newline at end of file
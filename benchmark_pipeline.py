@@ -0,0 +1,192 @@
+"""
+Offline pipeline benchmark.
+
+Starts one or more fake Ollama servers in-process (agents/fake_ollama.py),
+points the shared client at them and runs the full multi-agent workflow,
+so pipeline overhead and concurrency scaling can be measured repeatably
+without a GPU.
+
+    python benchmark_pipeline.py --essays 8 --concurrency 4 --hosts 2
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from agents import config
+from agents.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from agents.handoff import get_prefetcher
+from agents.hedging import HedgePolicy
+from agents.llm_client import OllamaClient, set_client
+from agents.prompt_library import PromptLibrary, set_prompt_library, warm_library
+from agents.scheduler import RequestScheduler
+from agents.workflow import arun_essay_generation_batch, run_essay_generation_batch
+
+PROMPTS = [
+    "Discuss an accomplishment, event, or realization that sparked a period of personal growth and a new understanding of yourself or others.",
+    "Recount a time when you faced a challenge, setback, or failure. How did it affect you, and what did you learn from the experience?",
+    "Reflect on a time when you questioned or challenged a belief or idea. What prompted your thinking? What was the outcome?",
+    "Describe a topic, idea, or concept you find so engaging that it makes you lose all track of time.",
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+def run_benchmark(args) -> dict:
+    server_config = FakeOllamaConfig(
+        models=(config.MODEL,),
+        load_seconds=args.load_seconds,
+        prefill_tps=args.prefill_tps,
+        decode_tps=args.decode_tps,
+        parallel=args.parallel,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        ramble_tokens=args.ramble_tokens,
+        time_scale=args.time_scale,
+        seed=args.seed,
+    )
+    servers = [FakeOllamaServer(config=server_config).start() for _ in range(args.hosts)]
+    client = OllamaClient(
+        hosts=[s.url for s in servers],
+        scheduler=RequestScheduler(max_concurrency=args.parallel * args.hosts),
+        hedging=HedgePolicy(enabled=args.hedge),
+    )
+    set_client(client)
+    config.CACHE_ENABLED = args.cache
+    config.CHECKPOINT_ENABLED = args.checkpoint
+    config.NODE_MEMO_ENABLED = args.memo
+    config.OVERLAP_ENABLED = args.overlap
+    config.CRITIQUE_SPLIT = args.split_critique
+
+    prompts = [PROMPTS[i % len(PROMPTS)] for i in range(args.essays)]
+    # Memoization only reuses outputs within a session: one per benchmark
+    session_id = f"benchmark-{uuid.uuid4().hex[:8]}" if args.memo else None
+    config.PROMPT_LIBRARY_ENABLED = args.library
+    if args.library:
+        # The offline warm step, untimed and kept out of the real library
+        library_dir = tempfile.mkdtemp()
+        set_prompt_library(PromptLibrary(os.path.join(library_dir, "prompt_library.json")))
+        with contextlib.redirect_stdout(io.StringIO()):
+            warm_library(prompts)
+
+    def collect(item) -> dict:
+        if not item.ok:
+            raise item.error
+        return {"elapsed": item.elapsed, "agent_times": item.state["agent_times"], "time_shares": item.llm["time_shares"]}
+
+    async def all_essays_async() -> list:
+        # One event loop for every run; its connections are closed before the loop is
+        async with client:
+            return [collect(item) async for item in arun_essay_generation_batch(
+                prompts, args.concurrency, session_id=session_id, verbose=args.verbose
+            )]
+
+    # Batch runs are quiet but the warm-up still prints; keep the report readable
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.time()
+    try:
+        with output:
+            if args.use_async:
+                runs = asyncio.run(all_essays_async())
+            else:
+                runs = [collect(item) for item in run_essay_generation_batch(
+                    prompts, args.concurrency, session_id=session_id, verbose=args.verbose
+                )]
+    finally:
+        wall = time.time() - start
+        client.close()
+        for server in servers:
+            server.stop()
+
+    latencies = [r["elapsed"] for r in runs]
+    agents, shares = {}, {}
+    for r in runs:
+        for agent, seconds in r["agent_times"].items():
+            agents.setdefault(agent, []).append(seconds)
+        for phase, share in r["time_shares"].items():
+            shares.setdefault(phase, []).append(share)
+
+    return {
+        "wall": wall,
+        "essays_per_minute": 60 * len(runs) / wall if wall else 0.0,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_max": max(latencies),
+        "agents": {a: statistics.mean(t) for a, t in agents.items()},
+        "time_shares": {p: statistics.mean(s) for p, s in shares.items()},
+        "backends": client.pool.stats(),
+        "requests": sum(s.fake.requests for s in servers),
+        "hedging": client.hedging.stats(),
+        "handoff": get_prefetcher().stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the essay pipeline against fake Ollama servers")
+    parser.add_argument("--essays", type=int, default=4, help="Essays to generate")
+    parser.add_argument("--concurrency", type=int, default=1, help="Essays generated at once")
+    parser.add_argument("--hosts", type=int, default=1, help="Fake Ollama servers to balance across")
+    parser.add_argument("--parallel", type=int, default=4, help="Concurrent requests per server")
+    parser.add_argument("--load-seconds", type=float, default=2.0)
+    parser.add_argument("--prefill-tps", type=float, default=1500.0)
+    parser.add_argument("--decode-tps", type=float, default=400.0)
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="Fraction of requests that stall")
+    parser.add_argument("--stall-seconds", type=float, default=10.0)
+    parser.add_argument("--ramble-tokens", type=int, default=0,
+                        help="Commentary the fake model adds after its last section")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Run essays on one event loop instead of worker threads")
+    parser.add_argument("--hedge", action="store_true", help="Enable hedged requests")
+    parser.add_argument("--time-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="Leave the response cache enabled")
+    parser.add_argument("--checkpoint", action="store_true", help="Save workflow checkpoints")
+    parser.add_argument("--memo", action="store_true", help="Reuse node outputs across the benchmark's runs (one session)")
+    parser.add_argument("--overlap", action="store_true", help="Start agents before the previous one finishes")
+    parser.add_argument("--library", action="store_true",
+                        help="Precompute the prompts' research first (scratch prompt library)")
+    parser.add_argument("--split-critique", action="store_true", help="Request the critique parts concurrently")
+    parser.add_argument("--verbose", action="store_true", help="Show agent output")
+    args = parser.parse_args()
+
+    print("\n" + "="*70)
+    print(" PIPELINE BENCHMARK (fake Ollama)")
+    print("="*70)
+    print(f"\n{args.essays} essays, {args.concurrency} at a time{' (async)' if args.use_async else ''}, "
+          f"{args.hosts} host(s) x {args.parallel} slots, decode {args.decode_tps:.0f} tok/s\n")
+
+    report = run_benchmark(args)
+
+    print(f"⏱️  Wall time: {report['wall']:.1f}s ({report['essays_per_minute']:.1f} essays/min)")
+    print(f"📈 Essay latency: p50 {report['latency_p50']:.1f}s | "
+          f"p95 {report['latency_p95']:.1f}s | max {report['latency_max']:.1f}s")
+    print(f"📨 Requests served: {report['requests']}")
+    print(f"\n📊 Mean agent times:")
+    for agent, seconds in report["agents"].items():
+        print(f"   - {agent.capitalize()}: {seconds:.2f}s")
+    if report["time_shares"]:
+        print("🔬 LLM time split: " + " | ".join(f"{p} {s:.0%}" for p, s in report["time_shares"].items()))
+    if args.hedge:
+        print(f"\n🪁 Hedging:")
+        for agent, stats in report["hedging"].items():
+            print(f"   - {agent.capitalize()}: {stats['hedged']}/{stats['requests']} hedged, "
+                  f"{stats['hedge_wins']} backup wins, threshold {stats['threshold']:.2f}s")
+    if args.overlap:
+        handoff = report["handoff"]
+        print(f"\n⏩ Early starts: {handoff['claimed']}/{handoff['started']} used, {handoff['cancelled']} cancelled")
+    print(f"\n🖥️  Backends:")
+    for backend in report["backends"]:
+        print(f"   - {backend['url']}: {backend['requests']} requests, "
+              f"EWMA {backend['latency_ewma'] or 0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
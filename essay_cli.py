@@ -1,51 +1,194 @@
 import typer
-import requests
 import json
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
 from rich.panel import Panel
+from rich.live import Live
 from rich.table import Table
 from pathlib import Path
 from datetime import datetime
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+import glob
+import os
 import time
+import xxhash
+
+from agents import config
+from agents.cutoff import cutoff_for
+from agents.llm_client import get_client, OllamaError
+from agents.metrics import get_metrics
+from agents.response_cache import get_cache
+from agents.scheduler import request_priority, set_request_priority
+from agents.structured import parse_score
 
 app = typer.Typer(help="EssayMentor AI - Multi-agent essay generation and critique")
 console = Console()
 
-# Ollama configuration
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL = "llama3.1:8b"
-
-def call_ollama(prompt: str, temperature: float = 0.7) -> tuple[str, float]:
-    """Call Ollama API and return response + time taken"""
-    payload = {
-        "model": MODEL,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "top_p": 0.9,
-            "num_predict": 2000  # Allow longer responses
-        }
-    }
+# Single-call prompts for an existing essay (`critique`, `improve` and `batch`)
+CRITIQUE_PROMPT = """As a Harvard admissions essay expert with 20 years of experience, provide a comprehensive critique of this college essay:
+
+{essay_text}
+
+Provide your analysis in this exact format:
+
+## OVERALL ASSESSMENT
+- Score: [X/10]
+- One-sentence summary of the essay's effectiveness
+
+## STRENGTHS (with specific examples from the text)
+1. [Strength with quote/example]
+2. [Strength with quote/example]
+3. [Strength with quote/example]
+
+## WEAKNESSES (with specific examples from the text)
+1. [Weakness with quote/example]
+2. [Weakness with quote/example]
+3. [Weakness with quote/example]
+
+## SPECIFIC IMPROVEMENTS
+1. Opening: [Concrete suggestion]
+2. Body: [Concrete suggestion]
+3. Ending: [Concrete suggestion]
+4. Voice/Style: [Concrete suggestion]
+
+## REVISED OPENING PARAGRAPH
+[Write an improved version of the first paragraph]
+
+## COLLEGE READINESS
+- Would this essay work for: [Top-tier/Competitive/Safety schools]
+- Best fit for colleges that value: [specific qualities]
+
+Be honest, specific, and constructive. Reference actual phrases from the essay."""
+
+IMPROVE_PROMPT = """You are a college essay coach. Take this essay and improve it significantly.
+
+ORIGINAL ESSAY:
+{essay_text}
+
+Provide:
+1. Three specific problems with the current essay (with examples)
+2. Three concrete changes to make (with before/after examples)
+3. A COMPLETE REVISED VERSION that fixes all issues
+
+The revised version should:
+- Keep the same general story/topic
+- Fix weak openings, generic statements, telling vs showing
+- Add specific details and vivid moments
+- Improve pacing and structure
+- Strengthen the voice
+
+Format your response as:
+
+## PROBLEMS IDENTIFIED
+1. [Problem with specific quote]
+2. [Problem with specific quote]
+3. [Problem with specific quote]
+
+## IMPROVEMENTS TO MAKE
+1. [Change with before/after example]
+2. [Change with before/after example]
+3. [Change with before/after example]
+
+## REVISED ESSAY (COMPLETE)
+[Full improved essay here]"""
+
+def call_ollama(prompt: str, temperature: float = 0.7, agent: str = "") -> tuple[str, float]:
+    """Call Ollama through the shared client and return response + time taken"""
+    try:
+        result = get_client().generate(
+            prompt,
+            temperature=temperature,
+            max_tokens=2000,  # Allow longer responses
+            agent=agent,
+            cutoff=cutoff_for(agent)  # Stop once every section is written
+        )
+        return result.text, result.elapsed
+    except OllamaError as e:
+        console.print(f"[red]Error calling Ollama: {e}[/red]")
+        console.print("[yellow]Make sure Ollama is running![/yellow]")
+        raise typer.Exit(1)
+
+def write_critique_report(output_file: Path, essay_text: str, critique_text: str, time_taken: float):
+    """Save an essay and its critique as markdown"""
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(f"# Essay Critique\n\n")
+        f.write(f"**Analyzed:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"**Analysis Time:** {time_taken:.2f}s\n")
+        f.write(f"**Essay Word Count:** {len(essay_text.split())}\n\n")
+        f.write(f"---\n\n## ORIGINAL ESSAY\n\n{essay_text}\n\n")
+        f.write(f"---\n\n## CRITIQUE\n\n{critique_text}\n")
+
+def write_improve_report(output_file: Path, essay_path: Path, essay_text: str, improvements: str):
+    """Save an essay and its improvements/revised version as markdown"""
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(f"# Essay Improvement Report\n\n")
+        f.write(f"**Original File:** {essay_path}\n")
+        f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        f.write(f"---\n\n## ORIGINAL ESSAY\n\n{essay_text}\n\n")
+        f.write(f"---\n\n{improvements}\n")
+
+def stream_ollama_live(prompt: str, temperature: float, title: str, border_style: str, padding=(0, 1), agent: str = ""):
+    """
+    Stream a response into a live-updating panel.
     
-    start = time.time()
+    Returns the finished GenerationStream (text, ttft, decode_tps, elapsed).
+    """
     try:
-        response = requests.post(OLLAMA_URL, json=payload, timeout=120)
-        response.raise_for_status()
-        elapsed = time.time() - start
-        return response.json()['response'], elapsed
-    except requests.exceptions.RequestException as e:
+        stream = get_client().stream(
+            prompt, temperature=temperature, max_tokens=2000, agent=agent, cutoff=cutoff_for(agent)
+        )
+        with Live(
+            Panel("[dim]Waiting for first token...[/dim]", title=title, border_style=border_style, padding=padding),
+            console=console,
+            refresh_per_second=8,
+            vertical_overflow="visible",
+        ) as live:
+            for _ in stream:
+                live.update(Panel(
+                    stream.text,
+                    title=f"{title} ({len(stream.text.split())} words)",
+                    border_style=border_style,
+                    padding=padding
+                ))
+        return stream
+    except OllamaError as e:
         console.print(f"[red]Error calling Ollama: {e}[/red]")
         console.print("[yellow]Make sure Ollama is running![/yellow]")
         raise typer.Exit(1)
 
+def format_stream_timing(stream) -> str:
+    """One-line TTFT / decode speed summary for a finished stream"""
+    ttft = f"{stream.ttft:.2f}s" if stream.ttft is not None else "n/a"
+    decode = f"{stream.decode_tps:.1f} tok/s" if stream.decode_tps else "n/a"
+    return f"First token: {ttft} | Decode: {decode}"
+
+@app.callback()
+def main(
+    ctx: typer.Context,
+    warmup: bool = typer.Option(config.WARMUP_ENABLED, help="Preload the model before running a command"),
+):
+    """EssayMentor AI - Multi-agent essay generation and critique"""
+    # A student is waiting on these calls: serve them ahead of batch jobs
+    set_request_priority("interactive", tenant="cli")
+    # `resume` warms up inside the workflow, and only when there is work left
+    if not warmup or ctx.invoked_subcommand in ("status", "resume"):
+        return
+    try:
+        load_times = get_client().warm_up()
+    except OllamaError:
+        return  # The command itself reports connection problems
+    for model, seconds in load_times.items():
+        if seconds:
+            console.print(f"[dim]🔥 Loaded {model} in {seconds:.1f}s[/dim]")
+
 @app.command()
 def generate(
     prompt: str = typer.Argument(..., help="College essay prompt"),
     words: int = typer.Option(650, help="Target word count"),
     style: str = typer.Option("balanced", help="Style: vulnerable/technical/creative/balanced"),
     save: bool = typer.Option(True, help="Save to outputs/"),
+    stream: bool = typer.Option(True, help="Render the essay live as tokens arrive"),
 ):
     """
     Generate a college essay from scratch
@@ -92,19 +235,25 @@ Write a compelling {words}-word college admissions essay that:
 Write the complete essay now:"""
     
     # Generate essay
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        task = progress.add_task(f"[cyan]Generating {words}-word essay...", total=None)
-        essay, time_taken = call_ollama(full_prompt, temperature=0.75)
-        progress.update(task, completed=True)
-    
-    # Display results
-    word_count = len(essay.split())
-    console.print(Panel(essay, title=f"✨ Generated Essay ({word_count} words)", border_style="green"))
-    console.print(f"\n⏱️  Time: {time_taken:.2f}s | Words: {word_count} | Style: {style}")
+    if stream:
+        result = stream_ollama_live(full_prompt, 0.75, "✨ Generated Essay", "green", agent="cli_generate")
+        essay, time_taken = result.text, result.elapsed
+        word_count = len(essay.split())
+        console.print(f"\n⏱️  Time: {time_taken:.2f}s | {format_stream_timing(result)} | Words: {word_count} | Style: {style}")
+    else:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            task = progress.add_task(f"[cyan]Generating {words}-word essay...", total=None)
+            essay, time_taken = call_ollama(full_prompt, temperature=0.75, agent="cli_generate")
+            progress.update(task, completed=True)
+        
+        # Display results
+        word_count = len(essay.split())
+        console.print(Panel(essay, title=f"✨ Generated Essay ({word_count} words)", border_style="green"))
+        console.print(f"\n⏱️  Time: {time_taken:.2f}s | Words: {word_count} | Style: {style}")
     
     # Save if requested
     if save:
@@ -130,6 +279,7 @@ def critique(
     essay: str = typer.Argument(..., help="Essay text or path to file (.txt, .md)"),
     save: bool = typer.Option(True, help="Save critique to outputs/"),
     detailed: bool = typer.Option(True, help="Include detailed line-by-line suggestions"),
+    stream: bool = typer.Option(True, help="Render the critique live as tokens arrive"),
 ):
     """
     Get expert critique of an existing essay
@@ -152,59 +302,31 @@ def critique(
         console.print(f"[dim]Analyzing text ({len(essay.split())} words)[/dim]\n")
     
     # Create comprehensive critique prompt
-    critique_prompt = f"""As a Harvard admissions essay expert with 20 years of experience, provide a comprehensive critique of this college essay:
-
-{essay_text}
-
-Provide your analysis in this exact format:
-
-## OVERALL ASSESSMENT
-- Score: [X/10]
-- One-sentence summary of the essay's effectiveness
-
-## STRENGTHS (with specific examples from the text)
-1. [Strength with quote/example]
-2. [Strength with quote/example]
-3. [Strength with quote/example]
-
-## WEAKNESSES (with specific examples from the text)
-1. [Weakness with quote/example]
-2. [Weakness with quote/example]
-3. [Weakness with quote/example]
-
-## SPECIFIC IMPROVEMENTS
-1. Opening: [Concrete suggestion]
-2. Body: [Concrete suggestion]
-3. Ending: [Concrete suggestion]
-4. Voice/Style: [Concrete suggestion]
-
-## REVISED OPENING PARAGRAPH
-[Write an improved version of the first paragraph]
-
-## COLLEGE READINESS
-- Would this essay work for: [Top-tier/Competitive/Safety schools]
-- Best fit for colleges that value: [specific qualities]
-
-Be honest, specific, and constructive. Reference actual phrases from the essay."""
+    critique_prompt = CRITIQUE_PROMPT.format(essay_text=essay_text)
     
     # Generate critique
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        task = progress.add_task("[yellow]Analyzing essay quality...", total=None)
-        critique_text, time_taken = call_ollama(critique_prompt, temperature=0.4)
-        progress.update(task, completed=True)
-    
-    # Display critique
-    console.print(Panel(
-        critique_text, 
-        title="📊 Expert Critique", 
-        border_style="yellow",
-        padding=(1, 2)
-    ))
-    console.print(f"\n⏱️  Analysis time: {time_taken:.2f}s")
+    if stream:
+        result = stream_ollama_live(critique_prompt, 0.4, "📊 Expert Critique", "yellow", padding=(1, 2), agent="cli_critique")
+        critique_text, time_taken = result.text, result.elapsed
+        console.print(f"\n⏱️  Analysis time: {time_taken:.2f}s | {format_stream_timing(result)}")
+    else:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            task = progress.add_task("[yellow]Analyzing essay quality...", total=None)
+            critique_text, time_taken = call_ollama(critique_prompt, temperature=0.4, agent="cli_critique")
+            progress.update(task, completed=True)
+        
+        # Display critique
+        console.print(Panel(
+            critique_text, 
+            title="📊 Expert Critique", 
+            border_style="yellow",
+            padding=(1, 2)
+        ))
+        console.print(f"\n⏱️  Analysis time: {time_taken:.2f}s")
     
     # Save if requested
     if save:
@@ -213,92 +335,150 @@ Be honest, specific, and constructive. Reference actual phrases from the essay."
         output_dir.mkdir(exist_ok=True)
         
         output_file = output_dir / f"critique_{timestamp}.md"
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(f"# Essay Critique\n\n")
-            f.write(f"**Analyzed:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"**Analysis Time:** {time_taken:.2f}s\n")
-            f.write(f"**Essay Word Count:** {len(essay_text.split())}\n\n")
-            f.write(f"---\n\n## ORIGINAL ESSAY\n\n{essay_text}\n\n")
-            f.write(f"---\n\n## CRITIQUE\n\n{critique_text}\n")
+        write_critique_report(output_file, essay_text, critique_text, time_taken)
         
         console.print(f"\n💾 [green]Critique saved to: {output_file}[/green]")
 
+# Writing strategies `compare` tries by default (override with --strategies)
+DEFAULT_STRATEGIES = {
+    "Harvard-Trained": """You are trained on successful Harvard essays. 
+Use specific details, authentic voice, show vulnerability and growth.""",
+    
+    "Show-Don't-Tell": """Write using show-don't-tell principle:
+Replace statements with scenes, use sensory details, demonstrate through actions.""",
+    
+    "Storytelling Arc": """Structure as: Hook (specific moment) → Context (brief) → Challenge → Growth → Reflection.
+Focus on one story told deeply, not multiple surface-level anecdotes.""",
+    
+    "Authentic Voice": """Write in a natural, conversational tone like the student is talking to a trusted mentor.
+Avoid essay-speak, flowery language, or trying to sound smart. Be genuine.""",
+}
+
+def load_strategies(path: Path) -> dict:
+    """Strategy set from a JSON file: {"name": "system prompt", ...}"""
+    with open(path, encoding="utf-8") as f:
+        strategies = json.load(f)
+    if not isinstance(strategies, dict) or not strategies or not all(
+        isinstance(name, str) and isinstance(system_prompt, str) for name, system_prompt in strategies.items()
+    ):
+        raise ValueError(f"{path} must map strategy names to system prompts")
+    return strategies
+
+def comparison_table(rows: dict) -> Table:
+    """Strategy table for `compare`, with the strategies still running shown in progress"""
+    table = Table(title="Strategy Comparison Results", show_header=True, header_style="bold magenta")
+    table.add_column("Strategy", style="cyan", width=20)
+    table.add_column("Time", justify="right", style="green", width=10)
+    table.add_column("Words", justify="right", style="yellow", width=10)
+    table.add_column("Preview", style="white", width=50)
+    for name, row in rows.items():
+        if row.get("error"):
+            table.add_row(name, "-", "-", f"[red]{row['error']}[/red]")
+        elif "time" in row:
+            table.add_row(name, f"{row['time']:.1f}s", str(row["words"]), row["preview"])
+        elif row.get("text"):
+            table.add_row(name, "[dim]writing[/dim]", str(len(row["text"].split())), f"[dim]{row['text'][-150:].replace(chr(10), ' ')}[/dim]")
+        else:
+            table.add_row(name, "[dim]queued[/dim]", "", "")
+    return table
+
 @app.command()
 def compare(
     prompt: str = typer.Argument(..., help="Essay prompt to test with multiple strategies"),
     save: bool = typer.Option(True, help="Save comparison results"),
+    strategies_file: Path = typer.Option(None, "--strategies", help='JSON file of {"name": "system prompt"} to compare instead of the built-in set'),
 ):
     """
     Compare different writing strategies for the same prompt
     
+    Strategies run concurrently (up to the backends' parallel slots) and
+    fill the table as they finish.
+    
     Example:
         python essay_cli.py compare "Describe a challenge you overcame"
+        python essay_cli.py compare "Describe a challenge you overcame" --strategies my_strategies.json
     """
     
     console.print("\n[bold magenta]⚡ EssayMentor AI - Strategy Comparison[/bold magenta]")
     console.print(f"Prompt: [italic]{prompt[:80]}...[/italic]\n")
     
-    strategies = {
-        "Harvard-Trained": """You are trained on successful Harvard essays. 
-Use specific details, authentic voice, show vulnerability and growth.""",
-        
-        "Show-Don't-Tell": """Write using show-don't-tell principle:
-Replace statements with scenes, use sensory details, demonstrate through actions.""",
-        
-        "Storytelling Arc": """Structure as: Hook (specific moment) → Context (brief) → Challenge → Growth → Reflection.
-Focus on one story told deeply, not multiple surface-level anecdotes.""",
-        
-        "Authentic Voice": """Write in a natural, conversational tone like the student is talking to a trusted mentor.
-Avoid essay-speak, flowery language, or trying to sound smart. Be genuine.""",
-    }
-    
-    results = {}
-    
-    # Create comparison table
-    table = Table(title="Strategy Comparison Results", show_header=True, header_style="bold magenta")
-    table.add_column("Strategy", style="cyan", width=20)
-    table.add_column("Time", justify="right", style="green", width=10)
-    table.add_column("Words", justify="right", style="yellow", width=10)
-    table.add_column("Preview", style="white", width=50)
+    strategies = DEFAULT_STRATEGIES
+    if strategies_file:
+        try:
+            strategies = load_strategies(strategies_file)
+        except (OSError, ValueError) as e:
+            console.print(f"[red]Error loading strategies: {e}[/red]")
+            raise typer.Exit(1)
+    
+    # The essay prompt goes first and is identical for every strategy, so
+    # the backend prefills it once; only the system prompts differ
+    essay_prompt = f"Essay prompt: {prompt}"
+    instruction = "Write a compelling 200-word opening section:"
+    
+    rows = {name: {} for name in strategies}
+    
+    def run(name: str, system_prompt: str):
+        row = rows[name]
+        stream = get_client().stream(
+            instruction,
+            system_message=system_prompt,
+            shared_prefix=essay_prompt,
+            temperature=0.75,
+            max_tokens=2000,
+            agent="cli_compare"
+        )
+        for _ in stream:
+            row["text"] = stream.text
+        essay = stream.text
+        row.update(
+            essay=essay,
+            time=stream.elapsed,
+            words=len(essay.split()),
+            preview=essay[:150].replace("\n", " ") + "...",
+            system_prompt=system_prompt
+        )
     
-    for name, system_prompt in strategies.items():
-        console.print(f"\n[cyan]Testing: {name}[/cyan]")
-        
-        full_prompt = f"{system_prompt}\n\nEssay prompt: {prompt}\n\nWrite a compelling 200-word opening section:"
-        
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console,
-        ) as progress:
-            task = progress.add_task(f"Generating with {name}...", total=None)
-            essay, time_taken = call_ollama(full_prompt, temperature=0.75)
-            progress.update(task, completed=True)
-        
-        word_count = len(essay.split())
-        preview = essay[:150].replace("\n", " ") + "..."
-        
-        results[name] = {
-            "essay": essay,
-            "time": time_taken,
-            "words": word_count,
-            "system_prompt": system_prompt
+    start = time.time()
+    workers = min(len(strategies), get_client().scheduler.max_concurrency)
+    with ThreadPoolExecutor(workers) as pool, Live(comparison_table(rows), console=console, refresh_per_second=8) as live:
+        # Copy the context so every strategy keeps the CLI's interactive priority
+        futures = {
+            pool.submit(contextvars.copy_context().run, run, name, system_prompt): name
+            for name, system_prompt in strategies.items()
         }
-        
-        table.add_row(name, f"{time_taken:.1f}s", str(word_count), preview)
-    
-    console.print("\n")
-    console.print(table)
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.125, return_when=FIRST_COMPLETED)
+            for future in done:
+                if isinstance(future.exception(), OllamaError):
+                    rows[futures[future]]["error"] = str(future.exception())
+                elif future.exception() is not None:
+                    raise future.exception()
+            live.update(comparison_table(rows))
+    wall_time = time.time() - start
+    
+    results = {name: row for name, row in rows.items() if "time" in row}
+    if len(results) < len(rows):
+        console.print("[yellow]Make sure Ollama is running![/yellow]")
+        if not results:
+            raise typer.Exit(1)
+    console.print(
+        f"\n⏱️  Wall time: {wall_time:.1f}s for {len(results)} strategies "
+        f"({sum(r['time'] for r in results.values()):.1f}s if run one after another)"
+    )
     
     # Save comparison
     if save:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = Path("outputs") / f"comparison_{timestamp}.md"
+        output_dir = Path("outputs")
+        output_dir.mkdir(exist_ok=True)
+        output_file = output_dir / f"comparison_{timestamp}.md"
         
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(f"# Strategy Comparison Results\n\n")
             f.write(f"**Prompt:** {prompt}\n")
-            f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+            f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write(f"**Wall Time:** {wall_time:.2f}s\n\n")
             f.write(f"---\n\n")
             
             for name, data in results.items():
@@ -313,6 +493,7 @@ Avoid essay-speak, flowery language, or trying to sound smart. Be genuine.""",
 @app.command()
 def improve(
     essay_file: str = typer.Argument(..., help="Path to essay file to improve"),
+    stream: bool = typer.Option(True, help="Render the revision live as tokens arrive"),
 ):
     """
     Get specific improvement suggestions and a revised version
@@ -335,92 +516,407 @@ def improve(
     console.print(f"[dim]Improving: {essay_path}[/dim]\n")
     
     # Generate improvements
-    improve_prompt = f"""You are a college essay coach. Take this essay and improve it significantly.
-
-ORIGINAL ESSAY:
-{essay_text}
-
-Provide:
-1. Three specific problems with the current essay (with examples)
-2. Three concrete changes to make (with before/after examples)
-3. A COMPLETE REVISED VERSION that fixes all issues
-
-The revised version should:
-- Keep the same general story/topic
-- Fix weak openings, generic statements, telling vs showing
-- Add specific details and vivid moments
-- Improve pacing and structure
-- Strengthen the voice
+    improve_prompt = IMPROVE_PROMPT.format(essay_text=essay_text)
+    
+    if stream:
+        result = stream_ollama_live(improve_prompt, 0.6, "✨ Improvements & Revised Essay", "cyan", padding=(1, 2), agent="cli_improve")
+        improvements, time_taken = result.text, result.elapsed
+        console.print(f"\n⏱️  Processing time: {time_taken:.2f}s | {format_stream_timing(result)}")
+    else:
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            task = progress.add_task("[cyan]Generating improved version...", total=None)
+            improvements, time_taken = call_ollama(improve_prompt, temperature=0.6, agent="cli_improve")
+            progress.update(task, completed=True)
+        
+        console.print(Panel(
+            improvements,
+            title="✨ Improvements & Revised Essay",
+            border_style="cyan",
+            padding=(1, 2)
+        ))
+        console.print(f"\n⏱️  Processing time: {time_taken:.2f}s")
+    
+    # Save improved version
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_file = Path("outputs") / f"improved_{timestamp}.md"
+    write_improve_report(output_file, essay_path, essay_text, improvements)
+    
+    console.print(f"\n💾 [green]Improved version saved to: {output_file}[/green]")
 
-Format your response as:
+# `batch` tasks: (prompt, temperature) of the single-essay command
+BATCH_TASKS = {
+    "critique": (CRITIQUE_PROMPT, 0.4),
+    "improve": (IMPROVE_PROMPT, 0.6),
+}
+ESSAY_SUFFIXES = (".txt", ".md")
 
-## PROBLEMS IDENTIFIED
-1. [Problem with specific quote]
-2. [Problem with specific quote]
-3. [Problem with specific quote]
+def find_essays(source: str, exclude: tuple = ()) -> list:
+    """
+    Essay files in a directory (recursively) or matching a glob.
+    
+    Files and directories in `exclude` are skipped (directories are not
+    even walked), so a batch whose output sits under its source never
+    picks up its own reports or manifest.
+    """
+    excluded = {p.resolve() for p in exclude}
+    
+    def kept(p: Path) -> bool:
+        resolved = p.resolve()
+        return resolved not in excluded and excluded.isdisjoint(resolved.parents)
+    
+    path = Path(source)
+    if path.is_dir():
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [d for d in dirs if kept(Path(root) / d)]
+            files += [Path(root) / name for name in names if Path(name).suffix in ESSAY_SUFFIXES]
+    else:
+        files = [Path(p) for p in glob.glob(source, recursive=True)]
+    return sorted(p for p in files if p.is_file() and kept(p))
 
-## IMPROVEMENTS TO MAKE
-1. [Change with before/after example]
-2. [Change with before/after example]
-3. [Change with before/after example]
+def read_manifest(path: Path, task: str) -> set:
+    """Content hashes a manifest records as done for task"""
+    done = set()
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if record.get("task") == task and record.get("status") == "ok" and record.get("content_hash"):
+                done.add(record["content_hash"])
+    return done
 
-## REVISED ESSAY (COMPLETE)
-[Full improved essay here]"""
+@app.command()
+def batch(
+    task: str = typer.Argument(..., help="critique or improve"),
+    source: str = typer.Argument(..., help="Directory of essays (.txt, .md) or a glob"),
+    manifest: Path = typer.Option(None, help="JSONL manifest of finished essays (default: outputs/batch_<task>/manifest.jsonl)"),
+    workers: int = typer.Option(None, help="Essays processed at once (default: the backends' parallel slots)"),
+):
+    """
+    Critique or improve every essay in a directory
+    
+    Essays run on a worker pool in one process; each result is saved and
+    recorded in a JSONL manifest as soon as it finishes. Rerunning skips
+    essays whose content the manifest already lists as done, so an
+    interrupted batch picks up where it stopped.
+    
+    Examples:
+        python essay_cli.py batch critique uploads/
+        python essay_cli.py batch improve "uploads/**/*.md" --workers 8
+    """
+    if task not in BATCH_TASKS:
+        console.print(f"[red]Unknown task '{task}' (expected one of {', '.join(BATCH_TASKS)})[/red]")
+        raise typer.Exit(1)
+    template, temperature = BATCH_TASKS[task]
+    agent = f"cli_{task}"
+    
+    console.print(f"\n[bold cyan]📦 EssayMentor AI - Batch {task.capitalize()}[/bold cyan]\n")
+    
+    output_dir = Path("outputs") / f"batch_{task}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = manifest or output_dir / "manifest.jsonl"
+    done = read_manifest(manifest, task)
     
-    with Progress(
+    # Read everything up front: the content hash decides what is left to do
+    files = find_essays(source, exclude=(output_dir, manifest))
+    if not files:
+        console.print(f"[red]No essays (.txt, .md) found in {source}[/red]")
+        raise typer.Exit(1)
+    def error_record(path: Path, error: Exception, content_hash: str = None) -> dict:
+        return {"file": str(path), "content_hash": content_hash, "task": task, "status": "error", "error": str(error)}
+    
+    def record_result(out, record: dict):
+        record["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()  # Recorded as done even if the batch is interrupted next
+    
+    essays, unreadable, skipped = [], [], 0
+    for path in files:
+        try:
+            essay_text = path.read_text(encoding="utf-8")
+        except (OSError, UnicodeDecodeError) as e:
+            # One bad upload doesn't stop the batch; it is recorded as failed
+            unreadable.append((path, e))
+            continue
+        content_hash = xxhash.xxh3_128_hexdigest(essay_text.encode("utf-8"))
+        if not essay_text.strip() or content_hash in done:
+            skipped += 1
+            continue
+        done.add(content_hash)  # Identical copies are processed once
+        essays.append((path, essay_text, content_hash))
+    
+    if unreadable:
+        with open(manifest, "a", encoding="utf-8") as out:
+            for path, e in unreadable:
+                console.print(f"[red]✗ {path}: can't read it as UTF-8 text ({e})[/red]")
+                record_result(out, error_record(path, e))
+    
+    failed = len(unreadable)
+    if not essays:
+        console.print(f"[dim]Nothing to do ({skipped} essays already in {manifest})[/dim]\n")
+        if failed:
+            raise typer.Exit(1)
+        return
+    console.print(f"[dim]{len(essays)} essays to {task}, {skipped} skipped (already in {manifest})[/dim]\n")
+    
+    def process(path: Path, essay_text: str, content_hash: str) -> dict:
+        result = get_client().generate(
+            template.format(essay_text=essay_text),
+            temperature=temperature,
+            max_tokens=2000,
+            agent=agent,
+            cutoff=cutoff_for(agent)
+        )
+        output_file = output_dir / f"{path.stem}-{content_hash[:8]}.md"
+        if task == "critique":
+            write_critique_report(output_file, essay_text, result.text, result.elapsed)
+        else:
+            write_improve_report(output_file, path, essay_text, result.text)
+        record = {
+            "file": str(path),
+            "content_hash": content_hash,
+            "task": task,
+            "status": "ok",
+            "output": str(output_file),
+            "seconds": round(result.elapsed, 2),
+            "output_tokens": result.stats.get("eval_count"),
+            "cached": result.cached,
+        }
+        if task == "critique":
+            record["score"] = parse_score(result.text)
+        return record
+    
+    workers = workers or get_client().scheduler.max_concurrency
+    start = time.time()
+    progress = Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        MofNCompleteColumn(),
+        TimeElapsedColumn(),
+        TextColumn("{task.fields[rate]}"),
         console=console,
-    ) as progress:
-        task = progress.add_task("[cyan]Generating improved version...", total=None)
-        improvements, time_taken = call_ollama(improve_prompt, temperature=0.6)
-        progress.update(task, completed=True)
-    
-    console.print(Panel(
-        improvements,
-        title="✨ Improvements & Revised Essay",
-        border_style="cyan",
-        padding=(1, 2)
-    ))
-    console.print(f"\n⏱️  Processing time: {time_taken:.2f}s")
+    )
+    
+    # Counselor uploads yield to students waiting on interactive calls
+    with request_priority("batch", tenant="cli_batch"), get_metrics().collect() as calls, \
+            ThreadPoolExecutor(workers) as pool, progress, open(manifest, "a", encoding="utf-8") as out:
+        bar = progress.add_task(f"[cyan]{task.capitalize()}...", total=len(essays), rate="")
+        futures = {
+            pool.submit(contextvars.copy_context().run, process, *essay): essay
+            for essay in essays
+        }
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, _, content_hash = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    # Ollama or report write failures fail this essay only
+                    failed += 1
+                    record = error_record(path, e, content_hash)
+                    progress.console.print(f"[red]✗ {path}: {e}[/red]")
+                record_result(out, record)
+                progress.advance(bar)
+            elapsed = time.time() - start
+            completed = len(essays) - len(pending)
+            tokens = sum(call.output_tokens for call in calls)
+            progress.update(bar, rate=f"{60 * completed / elapsed:.1f} essays/min | {tokens / elapsed:.0f} tok/s")
+    
+    elapsed = time.time() - start
+    tokens = sum(call.output_tokens for call in calls)
+    succeeded = len(essays) + len(unreadable) - failed
+    console.print(
+        f"\n✅ {succeeded} done, {skipped} skipped, {failed} failed in {elapsed:.1f}s "
+        f"({60 * succeeded / elapsed:.1f} essays/min, {tokens / elapsed:.0f} tok/s)"
+    )
+    console.print(f"📒 Manifest: {manifest}")
+    if failed:
+        console.print("[yellow]Fix the failed files or make sure Ollama is running, then rerun the same command "
+                      "to retry them[/yellow]")
+        raise typer.Exit(1)
+
+@app.command()
+def resume(
+    run_id: str = typer.Argument(None, help="Run id to resume (omit to list saved runs)"),
+    save: bool = typer.Option(True, help="Save the finished run to outputs/"),
+    prune: bool = typer.Option(False, "--prune", help="Delete saved runs beyond the retention limits instead"),
+):
+    """
+    Resume a multi-agent run that failed or was interrupted
     
-    # Save improved version
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = Path("outputs") / f"improved_{timestamp}.md"
+    Agents that already finished are not rerun. With --prune, delete the
+    runs outside ESSAY_CHECKPOINT_KEEP_RUNS / ESSAY_CHECKPOINT_KEEP_DAYS
+    (run it after nightly batches so the checkpoint files stay bounded).
     
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(f"# Essay Improvement Report\n\n")
-        f.write(f"**Original File:** {essay_path}\n")
-        f.write(f"**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write(f"---\n\n## ORIGINAL ESSAY\n\n{essay_text}\n\n")
-        f.write(f"---\n\n{improvements}\n")
+    Example:
+        python essay_cli.py resume
+        python essay_cli.py resume 20250101-120000-a1b2c3
+        python essay_cli.py resume --prune
+    """
+    from agents.workflow import list_runs, resume_essay_generation
     
-    console.print(f"\n💾 [green]Improved version saved to: {output_file}[/green]")
+    if not config.CHECKPOINT_ENABLED:
+        console.print("[red]Checkpoints are disabled (ESSAY_CHECKPOINTS=0)[/red]")
+        raise typer.Exit(1)
+    
+    if prune:
+        from agents.checkpoints import prune_runs
+        pruned = prune_runs()
+        limits = [f"newest {config.CHECKPOINT_KEEP_RUNS} runs" if config.CHECKPOINT_KEEP_RUNS else "",
+                  f"last {config.CHECKPOINT_KEEP_DAYS:g} days" if config.CHECKPOINT_KEEP_DAYS else ""]
+        console.print(f"\n🧹 Deleted {pruned['runs']} saved runs and {pruned['blobs']} unused texts "
+                      f"({pruned['kept']} runs kept; retention: {', '.join(l for l in limits if l) or 'none'})\n")
+        return
+    
+    if run_id is None:
+        runs = list_runs()
+        if not runs:
+            console.print("\n[dim]No saved runs[/dim]\n")
+            return
+        table = Table(title="🧵 Saved Runs")
+        table.add_column("Run id", style="cyan")
+        table.add_column("Prompt")
+        table.add_column("Next step")
+        table.add_column("Saved", style="dim")
+        for run in runs:
+            next_step = ", ".join(run["next"]) if run["next"] else "[green]complete[/green]"
+            table.add_row(run["thread_id"], run["prompt"][:60], next_step, run["saved_at"][:19].replace("T", " "))
+        console.print()
+        console.print(table)
+        console.print("\nResume one with: [bold]python essay_cli.py resume <run id>[/bold]\n")
+        return
+    
+    try:
+        result = resume_essay_generation(run_id)
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+    except OllamaError as e:
+        console.print(f"[red]Error calling Ollama: {e}[/red]")
+        console.print("[yellow]Make sure Ollama is running, then resume again[/yellow]")
+        raise typer.Exit(1)
+    
+    word_count = len(result['essay_draft'].split())
+    console.print(Panel(result['essay_draft'], title=f"✨ Final Essay ({word_count} words)", border_style="green"))
+    if result.get('critique_score') is not None:
+        console.print(f"\n📊 Critique score: {result['critique_score']}/10")
+    
+    if save:
+        output_dir = Path("outputs")
+        output_dir.mkdir(exist_ok=True)
+        
+        output_file = output_dir / f"multi_agent_run_{run_id}.md"
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(f"# Multi-Agent Essay Generation Result\n\n")
+            f.write(f"**Run:** {run_id}\n")
+            f.write(f"**Prompt:** {result['prompt']}\n\n")
+            f.write(f"---\n\n## Final Essay\n\n{result['essay_draft']}\n\n")
+            f.write(f"---\n\n## Critique\n\n{result['essay_critique']}\n")
+        
+        console.print(f"\n💾 [green]Saved to: {output_file}[/green]")
+
+@app.command("warm-library")
+def warm_library(
+    prompts_file: Path = typer.Option(None, help="Extra prompts to precompute, one per line"),
+    known: bool = typer.Option(True, help="Include the built-in Common App and supplement prompts"),
+):
+    """
+    Precompute research analyses for known prompts (offline step)
+    
+    Runs whose prompt is in the library skip the research agent. Entries
+    are regenerated after agents/prompts/research.py changes.
+    
+    Example:
+        python essay_cli.py warm-library --prompts-file supplements.txt
+    """
+    from agents.prompt_library import KNOWN_PROMPTS, get_prompt_library, warm_library as warm
+    
+    prompts = list(KNOWN_PROMPTS.values()) if known else []
+    if prompts_file:
+        with open(prompts_file, encoding="utf-8") as f:
+            prompts += [line.strip() for line in f if line.strip()]
+    
+    console.print(f"\n[bold blue]📚 Warming the prompt library[/bold blue] [dim]({config.PROMPT_LIBRARY_PATH})[/dim]\n")
+    start = time.time()
+    try:
+        result = warm(prompts)
+    except OllamaError as e:
+        console.print(f"[red]Error calling Ollama: {e}[/red]")
+        console.print("[yellow]Make sure Ollama is running![/yellow]")
+        raise typer.Exit(1)
+    
+    console.print(
+        f"\n✅ {result['generated']} generated, {result['current']} already current, "
+        f"{result['pruned']} stale removed ({time.time() - start:.1f}s)"
+    )
+    console.print(f"📚 {len(get_prompt_library().entries())} prompts in the library\n")
 
 @app.command()
 def status():
     """Check if Ollama is running and model is available"""
     console.print("\n[bold blue]🔧 System Status Check[/bold blue]\n")
     
-    # Check Ollama connection
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            console.print("✅ [green]Ollama is running[/green]")
+    # Check every Ollama backend in the pool
+    client = get_client()
+    for backend in client.pool.backends:
+        host = backend.url
+        try:
+            models = client.tags(host=host)
+            console.print(f"✅ [green]Ollama is running[/green] [dim]({host})[/dim]")
             
             # Check if our model is available
             model_names = [m['name'] for m in models]
-            if MODEL in model_names:
-                console.print(f"✅ [green]Model '{MODEL}' is available[/green]")
+            if config.MODEL in model_names:
+                console.print(f"✅ [green]Model '{config.MODEL}' is available[/green]")
             else:
-                console.print(f"❌ [red]Model '{MODEL}' not found[/red]")
+                console.print(f"❌ [red]Model '{config.MODEL}' not found[/red]")
                 console.print(f"   Available models: {', '.join(model_names)}")
-        else:
-            console.print("❌ [red]Ollama responded but with error[/red]")
-    except requests.exceptions.RequestException:
-        console.print("❌ [red]Ollama is not running[/red]")
-        console.print("   Start it with: ollama serve")
+            
+            # Which models are loaded right now
+            resident = client.loaded_models(host=host)
+            if resident:
+                for m in resident:
+                    vram = m.get('size_vram', 0) / 1024 ** 3
+                    expires = m.get('expires_at', '')[:19].replace('T', ' ')
+                    console.print(f"🔥 [green]Resident: {m['name']}[/green] [dim]({vram:.1f} GB VRAM, until {expires or '?'})[/dim]")
+            else:
+                console.print("💤 [yellow]No models loaded (first request will pay the load time)[/yellow]")
+        except OllamaError:
+            console.print(f"❌ [red]Ollama is not running[/red] [dim]({host})[/dim]")
+            console.print("   Start it with: ollama serve")
+        console.print()
+    
+    # Response cache
+    if config.CACHE_ENABLED:
+        stats = get_cache().stats()
+        console.print(
+            f"💾 Response cache: {stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB, "
+            f"{stats['lifetime_hits']} hits saved {stats['lifetime_saved_seconds']:.0f}s of generation"
+        )
+    else:
+        console.print("💾 Response cache: [dim]disabled (ESSAY_CACHE=0)[/dim]")
+    
+    # Precomputed research
+    if config.PROMPT_LIBRARY_ENABLED:
+        from agents.prompt_library import get_prompt_library, template_version
+        entries = get_prompt_library().entries()
+        current = sum(1 for e in entries if e["template_version"] == template_version() and e["model"] == config.MODEL)
+        console.print(f"📚 Prompt library: {current} current entries" + (
+            f", [yellow]{len(entries) - current} stale (run warm-library)[/yellow]" if current < len(entries) else ""
+        ))
+    else:
+        console.print("📚 Prompt library: [dim]disabled (ESSAY_PROMPT_LIBRARY=0)[/dim]")
     
     console.print()
 
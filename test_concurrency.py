@@ -0,0 +1,298 @@
+import asyncio
+import contextlib
+import io
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from agents import config
+from agents.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from agents.handoff import get_prefetcher, run_scope
+from agents.hedging import HedgePolicy
+from agents.llm_client import OllamaClient, OllamaError, get_client, set_client
+from agents.scheduler import RequestScheduler, request_priority
+from agents.workflow import arun_essay_generation_batch, run_essay_generation_batch
+
+# Offline checks of the concurrency paths against the fake Ollama server
+# (no GPU or Ollama needed):
+#   python test_concurrency.py   or   python -m pytest test_concurrency.py
+
+PROMPT = "Recount a time when you faced a challenge, setback, or failure. What did you learn from the experience?"
+
+
+@contextlib.contextmanager
+def fake_backends(hosts: int = 1, max_concurrency: int = 8, **fake):
+    """Shared client pointed at fresh fake servers; caches, checkpoints and the prompt library off"""
+    fake = {"load_seconds": 0.0, "time_scale": 0.02, **fake}
+    servers = [FakeOllamaServer(config=FakeOllamaConfig(models=(config.MODEL,), **fake)).start() for _ in range(hosts)]
+    client = OllamaClient(hosts=[s.url for s in servers], scheduler=RequestScheduler(max_concurrency=max_concurrency))
+    settings = {name: getattr(config, name) for name in
+                ("CACHE_ENABLED", "CHECKPOINT_ENABLED", "PROMPT_LIBRARY_ENABLED", "NODE_MEMO_ENABLED")}
+    previous = get_client()
+    set_client(client)
+    for name in settings:
+        setattr(config, name, False)
+    try:
+        yield client, servers
+    finally:
+        for name, value in settings.items():
+            setattr(config, name, value)
+        set_client(previous)
+        client.close()
+        for server in servers:
+            server.stop()
+
+
+def test_creative_calls_are_not_coalesced():
+    """Concurrent runs of one prompt share research/critique calls but each gets its own ideas and essay"""
+    with fake_backends() as (client, servers), contextlib.redirect_stdout(io.StringIO()):
+        results = list(run_essay_generation_batch([PROMPT] * 4, concurrency=4))
+    assert all(result.ok for result in results)
+    # Only a flight's leader records the call, so followers don't count here
+    upstream = {}
+    for result in results:
+        for agent, stats in result.llm["agents"].items():
+            upstream[agent] = upstream.get(agent, 0) + stats["calls"]
+    for agent in ("brainstorm", "outline", "draft"):
+        assert upstream.get(agent) == 4, upstream
+    assert client.flights.stats()["coalesced"] <= 4 * 2, client.flights.stats()
+
+
+def _generate_together(client, callers: int, **options) -> list:
+    """client.generate from `callers` threads, each after the previous is in flight; results or errors"""
+    def call():
+        try:
+            return client.generate(PROMPT, agent="research", max_tokens=200, **options).text
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(callers) as pool:
+        futures = []
+        for _ in range(callers):
+            futures.append(pool.submit(call))
+            time.sleep(0.05)
+        return [future.result() for future in futures]
+
+
+def test_single_flight_followers_share_the_leaders_generation():
+    with fake_backends(time_scale=0.2) as (client, servers):
+        texts = _generate_together(client, 4)
+    assert len(set(texts)) == 1 and texts[0]
+    assert servers[0].fake.requests == 1
+    assert client.flights.stats() == {"leaders": 1, "coalesced": 3}
+
+
+def test_single_flight_followers_get_the_leaders_error():
+    # The leader times out long before the (slow) generation would finish
+    with fake_backends(time_scale=1.0) as (client, servers):
+        errors = _generate_together(client, 3, timeout=0.5)
+        assert client.flights.stats() == {"leaders": 1, "coalesced": 2}
+        # The failed flight is gone: the next call leads a new one
+        errors += _generate_together(client, 1, timeout=0.5)
+        assert client.flights.stats() == {"leaders": 2, "coalesced": 2}
+    assert all(isinstance(error, OllamaError) for error in errors), errors
+
+
+def test_cancelled_async_leader_does_not_cancel_its_followers():
+    async def run():
+        leader = asyncio.ensure_future(client.agenerate(PROMPT, agent="research", max_tokens=200))
+        await asyncio.sleep(0.1)
+        follower = asyncio.ensure_future(client.agenerate(PROMPT, agent="research", max_tokens=200))
+        await asyncio.sleep(0.1)
+        leader.cancel()
+        result = await follower
+        await client.aclose()
+        return leader, result
+
+    with fake_backends(time_scale=0.2) as (client, servers):
+        leader, result = asyncio.run(run())
+    assert leader.cancelled()
+    assert result.text
+    # The follower retried as the new leader
+    assert servers[0].fake.requests == 2
+
+
+def test_scheduler_serves_interactive_requests_before_queued_batch_ones():
+    finished = []
+
+    def call(priority: str, index: int):
+        with request_priority(priority):
+            client.generate(f"{PROMPT} ({index})", agent="draft", max_tokens=40)
+        finished.append(priority)
+
+    with fake_backends(max_concurrency=1, time_scale=0.05) as (client, servers):
+        with ThreadPoolExecutor(4) as pool:
+            # Everything queues behind the one slot until it is released
+            with client.scheduler.acquire():
+                for index in range(3):
+                    pool.submit(call, "batch", index)
+                time.sleep(0.05)
+                pool.submit(call, "interactive", 3)
+                time.sleep(0.05)
+    assert finished == ["interactive", "batch", "batch", "batch"], finished
+    assert client.scheduler.stats()["active"] == 0
+
+
+def test_cancelled_queued_request_never_reaches_the_server():
+    async def run():
+        running = asyncio.ensure_future(client.agenerate(PROMPT, agent="draft", max_tokens=100))
+        await asyncio.sleep(0.05)
+        queued = asyncio.ensure_future(client.agenerate(f"{PROMPT} (2)", agent="draft", max_tokens=100))
+        await asyncio.sleep(0.05)
+        assert client.scheduler.stats()["classes"]["normal"]["queued"] == 1
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        assert client.scheduler.stats()["classes"]["normal"]["queued"] == 0
+        await running
+        await client.aclose()
+
+    with fake_backends(max_concurrency=1, time_scale=0.05) as (client, servers):
+        asyncio.run(run())
+        assert servers[0].fake.requests == 1
+        assert client.scheduler.stats()["active"] == 0
+
+
+def test_try_acquire_never_queues_or_takes_reserved_slots():
+    scheduler = RequestScheduler(max_concurrency=2, interactive_reserve=1)
+    with request_priority("batch"):
+        held = scheduler.try_acquire()
+        assert held is not None
+        # The last slot is kept for interactive requests
+        assert scheduler.try_acquire() is None
+    slot = scheduler.try_acquire("interactive")
+    assert slot is not None
+    assert scheduler.try_acquire("interactive") is None
+    held.release()
+    held.release()  # Idempotent
+    assert scheduler.stats()["active"] == 1
+    slot.release()
+    with fake_backends(max_concurrency=1, time_scale=0.05) as (client, servers), ThreadPoolExecutor(1) as pool:
+        # A free slot isn't taken while a request is queued for it
+        holder = client.scheduler.acquire()
+        waiting = pool.submit(client.generate, PROMPT, agent="draft", max_tokens=20)
+        time.sleep(0.05)
+        holder.release()
+        assert client.scheduler.try_acquire() is None
+        waiting.result()
+        slot = client.scheduler.try_acquire()
+        assert slot is not None
+        slot.release()
+
+
+def test_router_fails_over_and_ejects_an_unreachable_backend():
+    async def agenerate():
+        result = await client.agenerate(f"{PROMPT} (async)", agent="draft", max_tokens=20)
+        await client.aclose()
+        return result
+
+    with fake_backends(hosts=2) as (client, servers):
+        dead, alive = client.pool.backends
+        client.pool.eject_seconds = 0.3
+        servers[0].stop()
+        # The first call picks the dead host, fails over; the rest avoid it
+        for index in range(4):
+            assert client.generate(f"{PROMPT} ({index})", agent="draft", max_tokens=20).text
+        assert (dead.requests, dead.errors, dead.available) == (1, 1, False)
+        assert servers[1].fake.requests == 4
+        # Once the ejection expires the host is tried again, and ejected again
+        time.sleep(0.3)
+        assert dead.available
+        assert asyncio.run(agenerate()).host == alive.url
+        assert (dead.requests, dead.errors, dead.available) == (2, 2, False)
+        # Health probes keep it out until it answers again
+        client.pool.probe()
+        assert [backend.healthy for backend in client.pool.backends] == [False, True]
+
+
+def _settled(client, timeout: float = 2.0) -> bool:
+    """Wait until no backend has outstanding requests and every slot is free"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if client.scheduler.stats()["active"] == 0 and all(b.outstanding == 0 for b in client.pool.backends):
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_hedge_wins_and_the_stalled_copy_is_cancelled():
+    async def agenerate():
+        result = await client.agenerate(f"{PROMPT} (async)", agent="draft", max_tokens=20)
+        await client.aclose()
+        return result
+
+    with fake_backends(hosts=2, stall_seconds=100) as (client, servers):
+        stalled, fast = client.pool.backends
+        servers[0].fake.config.stall_rate = 1.0
+        client.hedging = HedgePolicy(enabled=True, min_delay=0.0, fallback_delay=0.1)
+        for generate in (lambda: client.generate(PROMPT, agent="draft", max_tokens=20), lambda: asyncio.run(agenerate())):
+            # Latency ties go to the first host: make that the stalled one
+            for backend in client.pool.backends:
+                backend.ewma_latency = None
+            start = time.time()
+            result = generate()
+            # Won by the backup long before the stalled copy's first token (2s away)
+            assert result.host == fast.url and time.time() - start < 1.5
+            # The loser was closed: its backend and both scheduler slots are free again
+            assert _settled(client, timeout=0.5), (client.scheduler.stats(), client.pool.stats())
+        assert client.hedging.stats()["draft"] == {
+            "requests": 2, "hedged": 2, "hedge_wins": 2, "threshold": 0.1
+        }
+        assert servers[0].fake.requests == 2 and servers[1].fake.requests == 2
+
+
+def test_batch_runs_are_quiet_and_leave_the_client_open():
+    """Batch workers don't print agent progress, and the async batch doesn't close the shared client"""
+    async def batch():
+        # Another user of the loop holds the client's connections across the batch
+        http = client._async_client()
+        results = [result async for result in arun_essay_generation_batch([PROMPT] * 2)]
+        assert not http.is_closed
+        await client.aclose()
+        return results
+
+    output = io.StringIO()
+    with fake_backends() as (client, servers), contextlib.redirect_stdout(output):
+        results = list(run_essay_generation_batch([PROMPT] * 2)) + asyncio.run(batch())
+    assert all(result.ok for result in results)
+    assert "AGENT" not in output.getvalue(), output.getvalue()
+
+
+def test_prefetch_is_scoped_to_its_run_and_cancelled():
+    """Another run never claims an early start; one left unclaimed stops when its run ends"""
+    request = dict(prompt=PROMPT, agent="outline", max_tokens=2000)
+    prefetcher = get_prefetcher()
+    with fake_backends(time_scale=1.0):
+        with run_scope():
+            prefetcher.start(request)
+            with run_scope():
+                assert prefetcher.claim(request) is None
+            future = prefetcher._pending[next(iter(prefetcher._pending))][0].future
+            # Let it start generating, so cancelling has to stop the stream
+            time.sleep(0.3)
+            assert future.running()
+        start = time.time()
+        try:
+            future.result(timeout=5)
+            raise AssertionError("unclaimed early start ran to completion")
+        except CancelledError:
+            pass
+        assert time.time() - start < 1
+        assert not prefetcher._pending
+
+
+def test_node_releases_its_unclaimed_prefetches():
+    request = dict(prompt=PROMPT, agent="outline", max_tokens=2000)
+    prefetcher = get_prefetcher()
+    with fake_backends(), run_scope():
+        prefetcher.start(request)
+        prefetcher.start({**request, "prompt": "another idea"})
+        future = prefetcher.claim(request)
+        prefetcher.release("outline")
+        assert not prefetcher._pending
+        assert future.result(timeout=10)[0]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,160 @@
+import asyncio
+import re
+import time
+
+from agents.cutoff import CUTOFFS, SectionCutoff
+from agents.llm_client import AsyncGenerationStream, GenerationStream
+
+# Offline checks of the section cutoffs (no Ollama needed):
+#   python test_cutoff.py   or   python -m pytest test_cutoff.py
+
+SPACED_WEAKNESSES = """## STRENGTHS
+1. Vivid opening scene
+
+## WEAKNESSES (with specific quotes)
+1. **Vague ending** - "I learned so much" tells instead of shows
+
+2. **Generic middle** - "it was a hard time" could describe any story
+
+3. **Rushed reflection** - the last paragraph skips the turning point
+"""
+
+
+def test_blank_line_separated_list_is_kept():
+    """Blank lines between list items don't end the section"""
+    cutoff = SectionCutoff(["STRENGTHS", "WEAKNESSES"])
+    assert cutoff.end_of(SPACED_WEAKNESSES) is None
+    assert cutoff.trim(SPACED_WEAKNESSES) == SPACED_WEAKNESSES
+    assert "3. **Rushed reflection**" in CUTOFFS["critique_feedback"].trim(SPACED_WEAKNESSES)
+
+
+def test_split_critique_parts_keep_every_item():
+    """Each split critique part ends after its whole list, not its first item"""
+    improvements = """## SPECIFIC IMPROVEMENTS NEEDED
+1. **Opening:** Start in the lab, not with a quote
+
+2. **Details:** Name the circuit that failed
+
+3. **Voice:** Drop the thesaurus words
+4. **Structure:** Shorten the second paragraph
+"""
+    trailing = "\nOverall this is a promising draft.\n"
+    assert CUTOFFS["critique_improvements"].trim(improvements + trailing) == improvements
+    assert CUTOFFS["critique_improvements"].end_of(improvements.split("3.")[0] + trailing) is None
+    assert CUTOFFS["critique_feedback"].trim(SPACED_WEAKNESSES + trailing) == SPACED_WEAKNESSES
+
+
+def test_list_ends_at_heading_or_rule():
+    for boundary in ("## NOTES\nExtra commentary\n", "---\nExtra commentary\n"):
+        trimmed = SectionCutoff(["STRENGTHS", "WEAKNESSES"]).trim(SPACED_WEAKNESSES + "\n" + boundary)
+        assert trimmed == SPACED_WEAKNESSES
+
+
+def test_list_with_items_ends_at_trailing_paragraph():
+    guidelines = """## OPENING
+A hook
+
+## CONCLUSION
+The reflection
+
+## WRITING GUIDELINES
+- Word count target: 650 words
+
+- Voice: reflective
+
+- Details to emphasize: the smell of solder
+- What to avoid: "passion" and "journey"
+
+"""
+    trimmed = CUTOFFS["outline"].trim(guidelines + "I hope this outline helps with your essay!\n")
+    assert trimmed == guidelines.rstrip() + "\n"
+    # Too few items yet: the trailing paragraph might still be part of the list
+    short = guidelines.split("- What to avoid")[0]
+    assert CUTOFFS["outline"].end_of(short + "\nSome more advice\n") is None
+
+
+def test_explained_list_items_are_kept():
+    """Items followed by unindented explanation paragraphs are never cut short"""
+    explained = """## WRITING GUIDELINES
+1. Word count
+
+Aim for 650 words.
+
+2. Voice
+
+Keep it reflective.
+
+3. Details
+
+Use sensory details.
+
+4. Avoid
+
+Cliches about passion.
+
+"""
+    assert CUTOFFS["outline"].end_of(explained + "Good luck!\n") is None
+
+
+def test_prose_section_ends_after_its_paragraph():
+    reply = "## REVISED OPENING PARAGRAPH\nThe soldering iron hissed.\n\nLet me know if you want more.\n"
+    assert CUTOFFS["critique_opening"].trim(reply) == "## REVISED OPENING PARAGRAPH\nThe soldering iron hissed.\n"
+
+
+def test_prose_before_list_is_not_the_end():
+    reply = "## KEY SUCCESS FACTORS\nGreat essays share three things:\n\n1. Specific moments\n\n2. A real change\n"
+    assert SectionCutoff(["KEY SUCCESS FACTORS"]).end_of(reply) is None
+
+
+def _chunks(text: str) -> list:
+    """NDJSON chunks streaming text a word at a time, as Ollama does"""
+    return [{"response": token} for token in re.findall(r"\s*\S+|\s+$", text)] + [{"done": True}]
+
+
+def test_stream_never_yields_past_the_cutoff():
+    """A live consumer only ever sees text the cut reply keeps"""
+    improvements = SPACED_WEAKNESSES.replace("WEAKNESSES (with specific quotes)", "SPECIFIC IMPROVEMENTS NEEDED")
+    improvements += "4. **Structure** - shorten the second paragraph\n"
+    reply = improvements + "\nOverall this is a promising draft, and with a few changes it will shine.\n"
+    stream = GenerationStream(iter(_chunks(reply)), "test", time.time())
+    stream.cutoff = CUTOFFS["critique_improvements"]
+    seen = ""
+    for token in stream:
+        seen += token
+        assert stream.cutoff.trim(reply).startswith(seen), seen
+    assert seen == stream.text == improvements
+    assert stream.stats["done_reason"] == "cutoff"
+
+
+def test_stream_without_cutoff_yields_every_token():
+    reply = SPACED_WEAKNESSES + "\nHope this helps!"
+    tokens = list(GenerationStream(iter(_chunks(reply)), "test", time.time()))
+    assert tokens == [chunk["response"] for chunk in _chunks(reply)[:-1]]
+
+    # A reply that never completes its sections is held back only until it ends
+    stream = GenerationStream(iter(_chunks(reply)), "test", time.time())
+    stream.cutoff = SectionCutoff(["STRENGTHS", "NOT IN THE REPLY"])
+    assert "".join(stream) == stream.text == reply
+
+
+def test_async_stream_never_yields_past_the_cutoff():
+    reply = "## REVISED OPENING PARAGRAPH\nThe soldering iron hissed.\n\nLet me know if you want more.\n"
+
+    async def chunks():
+        for chunk in _chunks(reply):
+            yield chunk
+
+    async def consume():
+        stream = AsyncGenerationStream(chunks(), "test", time.time())
+        stream.cutoff = CUTOFFS["critique_opening"]
+        return "".join([token async for token in stream]), stream.text
+
+    seen, text = asyncio.run(consume())
+    assert seen == text == "## REVISED OPENING PARAGRAPH\nThe soldering iron hissed.\n"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -1,35 +1,23 @@
-import requests
-import json
-import time
+from agents.llm_client import get_client
 
 def chat_with_ollama(prompt, model="llama3.1:8b", temperature=0.7):
     """
     Simple function to chat with your local Ollama model
     """
-    url = "http://localhost:11434/api/generate"
-    
-    payload = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "temperature": temperature,
-            "num_predict": 500,  # Max tokens to generate
-            "top_p": 0.9,
-        }
-    }
-    
-    start_time = time.time()
-    response = requests.post(url, json=payload)
-    elapsed = time.time() - start_time
-    
-    result = response.json()
+    result = get_client().generate(
+        prompt,
+        model=model,
+        temperature=temperature,
+        max_tokens=500,  # Max tokens to generate
+        top_p=0.9,
+    )
+    elapsed = result.elapsed
     
     print(f"⏱️  Generation time: {elapsed:.2f}s")
-    print(f"📊 Tokens: ~{len(result['response'].split())}")
-    print(f"🔥 Tokens/sec: ~{len(result['response'].split())/elapsed:.1f}")
+    print(f"📊 Tokens: ~{len(result.text.split())}")
+    print(f"🔥 Tokens/sec: ~{len(result.text.split())/elapsed:.1f}")
     
-    return result['response']
+    return result.text
 
 # Test 1: Basic generation
 print("=" * 60)